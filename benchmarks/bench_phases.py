@@ -0,0 +1,282 @@
+"""Benchmark each backup and restore phase against synthetic system roots.
+
+For every size a fake root is built with that many app bundles and fonts,
+and a twentieth as many Homebrew formulae, served by stub executables (see
+benchmarks.fixtures). Each phase is timed repeat times and the best and
+median wall times are printed, and written as JSON with --output so runs
+on different commits can be compared.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_phases [--sizes 100,1000] [--repeat N]
+        [--latency SECONDS] [--output results.json]
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import macbac.backup
+import macbac.restore
+from benchmarks.fixtures import FakeRoot
+from macbac.backup import BackupManager
+from macbac.cache import PersistentCache
+from macbac.host_facts import HostFacts
+from macbac.restore import RestoreManager
+from macbac.scanners.appstore_scanner import AppStoreScanner
+from macbac.scanners.dev_env_scanner import DevEnvScanner
+from macbac.scanners.font_scanner import FontScanner
+from macbac.scanners.homebrew_scanner import HomebrewScanner
+from macbac.scanners.manual_app_scanner import ManualAppScanner
+from macbac.storage import StorageManager
+from macbac.verify import verify_backup
+
+RESULTS_FORMAT = "macbac-bench"
+RESULTS_VERSION = 1
+
+# Homebrew formulae per app bundle; every package costs stub process starts
+PACKAGE_RATIO = 20
+
+
+def time_phase(
+    func: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> List[float]:
+    """Return the wall times of repeat runs of func, each after an untimed setup."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def reset_dir(path: Path) -> None:
+    """Empty a directory, creating it if needed."""
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+
+def git_commit() -> Optional[str]:
+    """Return the commit being benchmarked, if run from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def bench_size(
+    root: FakeRoot, work_dir: Path, repeat: int
+) -> Dict[str, Dict[str, Any]]:
+    """Time every phase against one populated fake root.
+
+    Returns the times and item counts of each phase, by phase name.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def run(
+        name: str,
+        func: Callable[[], Any],
+        items: int,
+        setup: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        results[name] = {"items": items, "times": time_phase(func, repeat, setup)}
+
+    apps = len(list(root.applications.iterdir()))
+    fonts = sum(1 for path in root.fonts.rglob("*") if path.is_file())
+
+    with root.activate():
+        scanners: Dict[str, Any] = {
+            "appstore": AppStoreScanner(),
+            "homebrew": HomebrewScanner(),
+            "dev_env": DevEnvScanner(),
+            "fonts": FontScanner(font_dirs=[root.fonts]),
+            "manual_apps": ManualAppScanner(app_dirs=[root.applications]),
+        }
+        backup_data = {name: scanner.scan() for name, scanner in scanners.items()}
+        packages = backup_data["homebrew"]["statistics"]["total_lines"]
+
+        run("scan.appstore", scanners["appstore"].scan, len(root.mas_apps))
+        run("scan.homebrew", scanners["homebrew"].scan, packages)
+        run("scan.dev_env", scanners["dev_env"].scan, len(DevEnvScanner.DEV_TOOLS))
+        run("scan.fonts", scanners["fonts"].scan, fonts)
+        run("scan.manual_apps", scanners["manual_apps"].scan, apps)
+        run(
+            "scan.manual_apps.sequential",
+            ManualAppScanner(app_dirs=[root.applications], parallel=False).scan,
+            apps,
+        )
+        cached = ManualAppScanner(
+            app_dirs=[root.applications],
+            cache=PersistentCache(work_dir / "app_bundles.json", max_entries=20000),
+        )
+        # Warm the cache, so only unchanged bundles are timed
+        cached.scan()
+        run("scan.manual_apps.cached", cached.scan, apps)
+
+        output = work_dir / "store"
+        backup_dir = output / "macbac_backup_bench"
+
+        def store() -> None:
+            storage_manager = StorageManager()
+            storage_manager.set_backup_dir(backup_dir)
+            storage_manager.set_host_facts(HostFacts(datetime.now()))
+            storage_manager.store_backup_data(backup_data)
+            storage_manager.generate_inventory(backup_data)
+            storage_manager.write_checksums()
+
+        def empty_output() -> None:
+            # Emptied as a whole, so font objects aren't shared across runs
+            reset_dir(output)
+            backup_dir.mkdir()
+
+        run("storage.store", store, fonts, setup=empty_output)
+
+        backup_manager = BackupManager(work_dir / "backups", use_cache=False)
+        backup_manager.scanners.update(
+            fonts=scanners["fonts"], manual_apps=scanners["manual_apps"]
+        )
+        run(
+            "backup.full",
+            backup_manager.start_backup,
+            apps + fonts,
+            setup=lambda: reset_dir(work_dir / "backups"),
+        )
+        run(
+            "backup.archive",
+            lambda: backup_manager.archive_backup(str(work_dir / "backup.tar.gz")),
+            apps + fonts,
+        )
+
+        run("verify", lambda: verify_backup(backup_dir), fonts + 2)
+
+    restore_fonts = root.restore_home / "Library" / "Fonts"
+    with root.activate(home=root.restore_home, fresh=True):
+
+        def restore(step: Callable[[RestoreManager], Any]) -> Callable[[], None]:
+            def func() -> None:
+                restore_manager = RestoreManager(backup_dir)
+                try:
+                    step(restore_manager)
+                finally:
+                    restore_manager.close()
+
+            return func
+
+        run(
+            "restore.plan",
+            restore(lambda manager: manager.plan()),
+            len(root.mas_apps) + packages + fonts,
+        )
+        run(
+            "restore.fonts",
+            restore(lambda manager: manager.restore_fonts()),
+            fonts,
+            setup=lambda: reset_dir(restore_fonts),
+        )
+        run(
+            "restore.homebrew",
+            restore(lambda manager: manager.restore_homebrew(retries=0)),
+            packages,
+        )
+        run(
+            "restore.appstore",
+            restore(lambda manager: manager.restore_appstore_apps(retries=0)),
+            len(root.mas_apps),
+        )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="100,1000",
+        help="comma separated numbers of app bundles and fonts",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds each stub brew, mas or tool call sleeps",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write JSON results here")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    # Progress bars and summaries would drown the results
+    macbac.backup.console.quiet = True
+    macbac.restore.console.quiet = True
+
+    entries = []
+    print(f"{'size':>6} {'phase':<28} {'items':>7} {'best':>10} {'median':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="macbac-bench-") as temp_dir:
+            root = FakeRoot(Path(temp_dir) / "root", args.latency, args.seed)
+            root.populate(apps=size, fonts=size, packages=max(1, size // PACKAGE_RATIO))
+            work_dir = Path(temp_dir) / "work"
+            work_dir.mkdir()
+
+            for phase, result in bench_size(root, work_dir, args.repeat).items():
+                best = min(result["times"])
+                median = statistics.median(result["times"])
+                print(
+                    f"{size:>6} {phase:<28} {result['items']:>7} "
+                    f"{best * 1000:>8.1f}ms {median * 1000:>8.1f}ms"
+                )
+                entries.append(
+                    {
+                        "size": size,
+                        "phase": phase,
+                        "items": result["items"],
+                        "best": best,
+                        "median": median,
+                        "times": result["times"],
+                        "fonts_bytes": root.fonts_bytes,
+                    }
+                )
+
+    if args.output is not None:
+        results = {
+            "format": RESULTS_FORMAT,
+            "version": RESULTS_VERSION,
+            "created": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "settings": {
+                "sizes": sizes,
+                "repeat": args.repeat,
+                "latency": args.latency,
+                "seed": args.seed,
+            },
+            "results": entries,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark the selective-key plist reader against plistlib.load.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_plist_reader [--document-types N] [--repeat N]
+"""
+
+import argparse
+import plistlib
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from macbac.scanners.manual_app_scanner import ManualAppScanner
+from macbac.scanners.plist_reader import read_plist_keys
+
+
+def make_info_plist(document_types: int) -> Dict[str, Any]:
+    """Build an Info.plist shaped like a large Electron/Java bundle."""
+    return {
+        "CFBundleDevelopmentRegion": "en",
+        "CFBundleDisplayName": "Synthetic",
+        "CFBundleDocumentTypes": [
+            {
+                "CFBundleTypeExtensions": [f"ext{i}", f"alt{i}"],
+                "CFBundleTypeIconFile": f"document{i}.icns",
+                "CFBundleTypeName": f"Synthetic document {i}",
+                "CFBundleTypeRole": "Editor",
+                "LSHandlerRank": "Alternate",
+                "LSItemContentTypes": [f"com.example.synthetic.type{i}"],
+            }
+            for i in range(document_types)
+        ],
+        "CFBundleExecutable": "Synthetic",
+        "CFBundleIdentifier": "com.example.synthetic",
+        "CFBundleName": "Synthetic",
+        "CFBundleShortVersionString": "1.2.3",
+        "CFBundleVersion": "123",
+        "LSMinimumSystemVersion": "11.0",
+        "NSHighResolutionCapable": True,
+        "com.apple.security.app-sandbox": False,
+    }
+
+
+def best_time(func: Callable[[], Any], repeat: int) -> float:
+    """Return the best wall time of func over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--document-types", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    keys = ManualAppScanner.INFO_PLIST_KEYS
+    plist = make_info_plist(args.document_types)
+
+    print(
+        f"{'format':<8} {'size':>10} {'plistlib':>12} {'selective':>12} {'speedup':>8}"
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for fmt in (plistlib.FMT_XML, plistlib.FMT_BINARY):
+            path = Path(temp_dir) / f"Info-{fmt.name}.plist"
+            path.write_bytes(plistlib.dumps(plist, fmt=fmt))
+
+            def load_full(path: Path = path) -> Any:
+                with open(path, "rb") as f:
+                    return plistlib.load(f)
+
+            def load_selective(path: Path = path) -> Any:
+                return read_plist_keys(path, keys)
+
+            full = best_time(load_full, args.repeat)
+            selective = best_time(load_selective, args.repeat)
+            size_kb = path.stat().st_size / 1024
+            print(
+                f"{fmt.name[4:]:<8} {size_kb:>8.0f}KB {full * 1000:>10.2f}ms "
+                f"{selective * 1000:>10.2f}ms {full / selective:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
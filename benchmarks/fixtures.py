@@ -0,0 +1,271 @@
+"""A synthetic system root for benchmarking macbac on any POSIX machine.
+
+FakeRoot lays out what the scanners and restore steps look at on a Mac:
+
+    Applications/        .app bundles with XML or binary Info.plists, some
+                         with an App Store receipt or a Homebrew bundle id
+    Users/bench/         the home directory backed up, with Library/Fonts
+    Users/restore/       an empty home directory fonts are restored to
+    usr/local/bin/       stub brew, mas and developer tool executables
+    var/                 the cache and state directories macbac writes to
+
+The stubs sleep MACBAC_BENCH_LATENCY seconds before answering, like real
+tools starting up and talking to the network. With MACBAC_BENCH_FRESH=1
+they report nothing as installed, so restores have every item to do.
+"""
+
+import json
+import os
+import plistlib
+import random
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from macbac.scanners.dev_env_scanner import DevEnvScanner
+
+LATENCY_VARIABLE = "MACBAC_BENCH_LATENCY"
+FRESH_VARIABLE = "MACBAC_BENCH_FRESH"
+
+# Font sizes are drawn from a log-normal distribution around ~120KB and
+# clamped to what real font files weigh
+FONT_SIZE_MEDIAN = 120 * 1024
+FONT_SIZE_SIGMA = 1.0
+FONT_SIZE_MIN = 8 * 1024
+FONT_SIZE_MAX = 8 * 1024 * 1024
+FONT_EXTENSIONS = [".ttf", ".ttf", ".otf", ".otf", ".ttc", ".woff2"]
+
+# Fonts installed per family directory
+FONTS_PER_FAMILY = 8
+
+STUB_SOURCE = '''\
+#!{python}
+"""A stand-in for brew, mas and developer tools, chosen by argv[0]."""
+
+import json
+import os
+import sys
+import time
+
+DATA = {data!r}
+
+
+def main():
+    name = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    with open(DATA, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    time.sleep(float(os.environ.get({latency!r}) or data["latency"]))
+    fresh = os.environ.get({fresh!r}) == "1"
+
+    if name == "brew":
+        if args[:2] == ["bundle", "dump"]:
+            print(data["brewfile"])
+        elif args[:1] == ["bundle"]:
+            print("Using " + args[-1])
+        elif args == ["tap"]:
+            if not fresh:
+                print("\\n".join(data["taps"]))
+        elif args[:1] == ["tap"]:
+            print("==> Tapping " + args[1])
+        elif args[:1] == ["list"]:
+            if not fresh:
+                kind = "casks" if "--cask" in args else "formulae"
+                print("\\n".join(data[kind]))
+        elif args[:1] == ["fetch"]:
+            for step in range(0, 101, 25):
+                print("==> Downloading " + args[-1] + " " + str(step) + "%")
+        elif args[:1] == ["install"]:
+            print("==> Pouring " + args[-1])
+            print("==> Summary: " + args[-1] + " installed")
+        return 0
+
+    if name == "mas":
+        if args == ["list"]:
+            if not fresh:
+                for app in data["mas"]:
+                    print(app["id"] + "  " + app["name"] + "  (1.0)")
+        elif args[:1] == ["install"]:
+            print("==> Downloading " + args[1])
+            print("==> Installed " + args[1])
+        return 0
+
+    print(name + " version 1.0.0")
+    return 0
+
+
+sys.exit(main())
+'''
+
+
+def make_info_plist(index: int, bundle_id: str, document_types: int) -> Dict[str, Any]:
+    """Build the Info.plist of a synthetic app bundle."""
+    name = f"Synthetic {index:05d}"
+    return {
+        "CFBundleDevelopmentRegion": "en",
+        "CFBundleDisplayName": name,
+        "CFBundleDocumentTypes": [
+            {
+                "CFBundleTypeExtensions": [f"ext{i}"],
+                "CFBundleTypeName": f"{name} document {i}",
+                "CFBundleTypeRole": "Editor",
+                "LSItemContentTypes": [f"{bundle_id}.type{i}"],
+            }
+            for i in range(document_types)
+        ],
+        "CFBundleExecutable": "Synthetic",
+        "CFBundleIdentifier": bundle_id,
+        "CFBundleName": name,
+        "CFBundleShortVersionString": f"1.{index % 10}.0",
+        "CFBundleVersion": str(index),
+        "LSMinimumSystemVersion": "11.0",
+        "NSHighResolutionCapable": True,
+    }
+
+
+class FakeRoot:
+    """A fake system root under path, filled by populate()."""
+
+    def __init__(self, path: Path, latency: float = 0.0, seed: int = 0) -> None:
+        self.path = path
+        self.applications = path / "Applications"
+        self.home = path / "Users" / "bench"
+        self.fonts = self.home / "Library" / "Fonts"
+        # Where fonts are restored to, so restores find nothing installed
+        self.restore_home = path / "Users" / "restore"
+        self.bin = path / "usr" / "local" / "bin"
+        self.var = path / "var"
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.mas_apps: List[Dict[str, str]] = []
+        self.fonts_bytes = 0
+
+    def populate(self, apps: int, fonts: int, packages: int) -> None:
+        """Create apps bundles, fonts font files and packages Homebrew formulae."""
+        self.make_app_bundles(apps)
+        self.make_fonts(fonts)
+        self.make_stubs(packages)
+        (self.restore_home / "Library" / "Fonts").mkdir(parents=True, exist_ok=True)
+
+    def make_app_bundles(self, count: int) -> None:
+        """Create app bundles, alternating XML and binary Info.plists.
+
+        Every fourth bundle has an App Store receipt and every tenth a
+        Homebrew bundle id, so each scanner filter has work to do.
+        """
+        self.applications.mkdir(parents=True, exist_ok=True)
+        for index in range(count):
+            bundle = self.applications / f"Synthetic {index:05d}.app"
+            contents = bundle / "Contents"
+            (contents / "MacOS").mkdir(parents=True, exist_ok=True)
+            (contents / "MacOS" / "Synthetic").write_bytes(b"\xcf\xfa\xed\xfe" * 256)
+
+            bundle_id = f"com.example.synthetic{index}"
+            if index % 10 == 9:
+                bundle_id = f"org.homebrew.synthetic{index}"
+            plist = make_info_plist(index, bundle_id, self.random.randint(0, 40))
+            fmt = plistlib.FMT_BINARY if index % 2 else plistlib.FMT_XML
+            (contents / "Info.plist").write_bytes(plistlib.dumps(plist, fmt=fmt))
+
+            if index % 4 == 0:
+                (contents / "_MASReceipt").mkdir(exist_ok=True)
+                (contents / "_MASReceipt" / "receipt").write_bytes(
+                    self.random.randbytes(4096)
+                )
+                app_id = str(400000000 + index)
+                self.mas_apps.append({"id": app_id, "name": plist["CFBundleName"]})
+
+    def make_fonts(self, count: int) -> None:
+        """Create font files of realistic sizes, grouped in family folders."""
+        self.fonts.mkdir(parents=True, exist_ok=True)
+        for index in range(count):
+            extension = self.random.choice(FONT_EXTENSIONS)
+            family = self.fonts / f"Family {index // FONTS_PER_FAMILY:04d}"
+            # Some fonts sit directly in the Fonts folder
+            directory = self.fonts if index % 3 == 0 else family
+            directory.mkdir(exist_ok=True)
+            size = int(
+                self.random.lognormvariate(0, FONT_SIZE_SIGMA) * FONT_SIZE_MEDIAN
+            )
+            size = max(FONT_SIZE_MIN, min(FONT_SIZE_MAX, size))
+            path = directory / f"Synthetic-{index:05d}{extension}"
+            path.write_bytes(self.random.randbytes(size))
+            self.fonts_bytes += size
+
+    def make_stubs(self, packages: int) -> None:
+        """Create the stub executables and the data they answer from.
+
+        The Brewfile has packages formulae, a quarter as many casks, a few
+        taps and the App Store apps created by make_app_bundles.
+        """
+        self.bin.mkdir(parents=True, exist_ok=True)
+        formulae = [f"synthetic-formula-{i}" for i in range(packages)]
+        casks = [f"synthetic-cask-{i}" for i in range(packages // 4)]
+        taps = [f"synthetic/tap{i}" for i in range(min(3, packages))]
+        lines = [f'tap "{tap}"' for tap in taps]
+        lines += [f'brew "{name}"' for name in formulae]
+        # brew bundle is needed for entries with options
+        if packages:
+            lines.append('brew "synthetic-head", args: ["HEAD"]')
+        lines += [f'cask "{name}"' for name in casks]
+        lines += [f'mas "{app["name"]}", id: {app["id"]}' for app in self.mas_apps]
+
+        data = {
+            "latency": self.latency,
+            "brewfile": "\n".join(lines),
+            "formulae": formulae,
+            "casks": casks,
+            "taps": taps,
+            "mas": self.mas_apps,
+        }
+        data_path = self.bin / ".stub-data.json"
+        with open(data_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        stub_path = self.bin / ".stub"
+        stub_path.write_text(
+            STUB_SOURCE.format(
+                python=sys.executable,
+                data=str(data_path),
+                latency=LATENCY_VARIABLE,
+                fresh=FRESH_VARIABLE,
+            ),
+            encoding="utf-8",
+        )
+        stub_path.chmod(0o755)
+
+        names = {"brew", "mas"}
+        names.update(tool["command"].split()[0] for tool in DevEnvScanner.DEV_TOOLS)
+        for name in sorted(names):
+            link = self.bin / name
+            if not link.exists():
+                link.symlink_to(stub_path.name)
+
+    @contextmanager
+    def activate(
+        self, home: Optional[Path] = None, fresh: bool = False
+    ) -> Iterator[None]:
+        """Point HOME, PATH and macbac's cache and state into the fake root.
+
+        The stubs come first on PATH, ahead of any real brew or mas. With
+        fresh, they report nothing as installed.
+        """
+        environment = {
+            "HOME": str(home or self.home),
+            "PATH": os.pathsep.join([str(self.bin), os.environ.get("PATH", "")]),
+            "XDG_CACHE_HOME": str(self.var / "cache"),
+            "XDG_STATE_HOME": str(self.var / "state"),
+            LATENCY_VARIABLE: str(self.latency),
+            FRESH_VARIABLE: "1" if fresh else "0",
+        }
+        saved = {name: os.environ.get(name) for name in environment}
+        os.environ.update(environment)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
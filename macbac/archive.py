@@ -0,0 +1,378 @@
+"""Single-file archives of backups."""
+
+import bz2
+import gzip
+import hashlib
+import io
+import itertools
+import lzma
+import os
+import shutil
+import sys
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import IO, Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from .manifest import MANIFEST_NAMES
+from .object_store import HASH_CHUNK_SIZE
+
+# Supported compressions and the file extensions they are recognised by
+COMPRESSIONS: Dict[str, Tuple[str, ...]] = {
+    "gz": (".tar.gz", ".tgz"),
+    "xz": (".tar.xz", ".txz"),
+    "bz2": (".tar.bz2", ".tbz2"),
+    "none": (".tar",),
+}
+
+DEFAULT_COMPRESSION = "gz"
+
+
+def compression_for(name: str) -> str:
+    """Return the compression implied by an archive file name."""
+    lowered = name.lower()
+    for compression, extensions in COMPRESSIONS.items():
+        if lowered.endswith(extensions):
+            return compression
+    return DEFAULT_COMPRESSION
+
+
+class ArchiveWriter:
+    """Streams a backup into a tar archive.
+
+    Members are written one after another as they are added and nothing is
+    staged on disk, so the output can be a pipe. Every member is stored
+    under prefix, the name of the backup, so extracting the archive
+    recreates the backup directory.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        prefix: str,
+        compression: str = DEFAULT_COMPRESSION,
+        level: Optional[int] = None,
+    ) -> None:
+        self.prefix = prefix
+        self._compressor = self._open_compressor(fileobj, compression, level)
+        self._tar = tarfile.open(
+            fileobj=self._compressor or fileobj,
+            mode="w|",
+            format=tarfile.PAX_FORMAT,
+        )
+
+    def _open_compressor(
+        self, fileobj: BinaryIO, compression: str, level: Optional[int]
+    ) -> Optional[Any]:
+        """Wrap fileobj in a compressing writer, or return None for "none"."""
+        if compression == "none":
+            return None
+        if compression == "gz":
+            return gzip.GzipFile(
+                fileobj=fileobj,
+                mode="wb",
+                compresslevel=self._check_level(level, 6, 0),
+                mtime=0,
+            )
+        if compression == "xz":
+            return lzma.LZMAFile(fileobj, "wb", preset=self._check_level(level, 6, 0))
+        if compression == "bz2":
+            return bz2.BZ2File(
+                fileobj, "wb", compresslevel=self._check_level(level, 9, 1)
+            )
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    def _check_level(self, level: Optional[int], default: int, minimum: int) -> int:
+        if level is None:
+            return default
+        if not minimum <= level <= 9:
+            raise ValueError(
+                f"Compression level must be between {minimum} and 9, got {level}"
+            )
+        return level
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        """Add a member with the given contents."""
+        info = tarfile.TarInfo(self._member_name(name))
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def add_file(self, name: str, path: Path) -> Tuple[int, str]:
+        """Stream a file into the archive and return its size and digest.
+
+        The SHA-256 digest is taken of the bytes as they are archived, so it
+        matches the member even if the file changes meanwhile.
+        """
+        with open(path, "rb") as f:
+            info = self._tar.gettarinfo(fileobj=f, arcname=self._member_name(name))
+            # Ownership is meaningless on the restoring machine
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            reader = _HashingReader(f)
+            self._tar.addfile(info, reader)
+        return info.size, reader.digest.hexdigest()
+
+    def _member_name(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def close(self) -> None:
+        """Finish the archive. The underlying file object is left open."""
+        self._tar.close()
+        if self._compressor is not None:
+            self._compressor.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class _HashingReader:
+    """Hashes the data read through it."""
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self._fileobj = fileobj
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self.digest.update(data)
+        return data
+
+
+@contextmanager
+def open_archive_output(target: str) -> Iterator[BinaryIO]:
+    """Open the file an archive is written to, with "-" meaning stdout."""
+    if target == "-":
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+        return
+
+    # A partial archive is useless, so it's removed if the backup fails
+    path = Path(target).expanduser()
+    try:
+        with open(path, "wb") as f:
+            yield f
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+
+class ArchiveReader(ABC):
+    """Reads the members of a backup archive on demand.
+
+    Members are addressed by their name inside the backup, e.g.
+    "manifest.jsonl" or "fonts/Font.ttf", whatever directory the backup was
+    archived under. Subclasses find members through an index of the
+    archive's member headers.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Directory the backup is stored under inside the archive, and the
+        # name of its manifest there
+        self._root: Optional[str] = None
+        self._manifest_name = ""
+
+    def has(self, name: str) -> bool:
+        """Check whether the backup contains a member."""
+        return self._find(self._member_name(name)) is not None
+
+    def size(self, name: str) -> int:
+        """Return the uncompressed size of a member."""
+        member = self._find(self._member_name(name))
+        if member is None:
+            raise FileNotFoundError(f"{name} not found in {self.path}")
+        return self._member_size(member)
+
+    def read(self, name: str) -> bytes:
+        """Return the contents of a member."""
+        with self.open(name) as f:
+            return f.read()
+
+    def open(self, name: str) -> IO[bytes]:
+        """Open a member for reading."""
+        member = self._find(self._member_name(name))
+        if member is None:
+            raise FileNotFoundError(f"{name} not found in {self.path}")
+        return self._open_member(member)
+
+    def extract(self, name: str, target: Path) -> int:
+        """Copy a member to target and return the number of bytes written."""
+        member = self._find(self._member_name(name))
+        if member is None:
+            raise FileNotFoundError(f"{name} not found in {self.path}")
+
+        try:
+            with self._open_member(member) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+        mtime = self._member_mtime(member)
+        os.utime(target, (mtime, mtime))
+        return target.stat().st_size
+
+    def _member_name(self, name: str) -> str:
+        check_member_name(name)
+        if self._root is None:
+            self._root, _, self._manifest_name = self._find_manifest().rpartition("/")
+        return f"{self._root}/{name}" if self._root else name
+
+    @property
+    def manifest_name(self) -> str:
+        """Return the name of the backup's manifest file."""
+        self._member_name("")
+        return self._manifest_name
+
+    @abstractmethod
+    def _find_manifest(self) -> str:
+        """Return the member name of the backup's manifest."""
+
+    @abstractmethod
+    def _find(self, member_name: str) -> Any:
+        """Return the header of a member, or None if there is no such member."""
+
+    @abstractmethod
+    def _open_member(self, member: Any) -> IO[bytes]:
+        """Open the member with the given header for reading."""
+
+    @abstractmethod
+    def _member_mtime(self, member: Any) -> float:
+        """Return the modification time of a member."""
+
+    @abstractmethod
+    def _member_size(self, member: Any) -> int:
+        """Return the uncompressed size of a member."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the archive."""
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class TarArchiveReader(ArchiveReader):
+    """Reads backups from tar archives, compressed or not.
+
+    Member headers are indexed as the archive is walked, and the walk stops
+    at the requested member, so reading the manifest at the start of an
+    archive doesn't touch the fonts after it. Uncompressed archives skip
+    member data by seeking.
+    """
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._tar = tarfile.open(path, "r:*")
+        self._index: Dict[str, tarfile.TarInfo] = {}
+        self._indexed_all = False
+
+    def _walk(self) -> Iterator[tarfile.TarInfo]:
+        """Yield members not indexed yet, adding them to the index."""
+        while not self._indexed_all:
+            member = self._tar.next()
+            if member is None:
+                self._indexed_all = True
+                return
+            self._index.setdefault(member.name, member)
+            yield member
+
+    def _find_manifest(self) -> str:
+        for member in itertools.chain(list(self._index.values()), self._walk()):
+            if member.isfile() and _is_manifest_name(member.name):
+                return member.name.strip("/")
+        raise FileNotFoundError(f"Manifest file not found in {self.path}")
+
+    def _find(self, member_name: str) -> Optional[tarfile.TarInfo]:
+        if member_name in self._index:
+            return self._index[member_name]
+        for member in self._walk():
+            if member.name == member_name:
+                return member
+        return None
+
+    def _open_member(self, member: tarfile.TarInfo) -> IO[bytes]:
+        f = self._tar.extractfile(member)
+        if f is None:
+            raise FileNotFoundError(f"{member.name} is not a file in {self.path}")
+        return f
+
+    def _member_mtime(self, member: tarfile.TarInfo) -> float:
+        return float(member.mtime)
+
+    def _member_size(self, member: tarfile.TarInfo) -> int:
+        return member.size
+
+    def close(self) -> None:
+        self._tar.close()
+
+
+class ZipArchiveReader(ArchiveReader):
+    """Reads backups from zip archives through their central directory."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(path)
+
+    def _find_manifest(self) -> str:
+        for name in self._zip.namelist():
+            if _is_manifest_name(name):
+                return name.strip("/")
+        raise FileNotFoundError(f"Manifest file not found in {self.path}")
+
+    def _find(self, member_name: str) -> Optional[zipfile.ZipInfo]:
+        try:
+            return self._zip.getinfo(member_name)
+        except KeyError:
+            return None
+
+    def _open_member(self, member: zipfile.ZipInfo) -> IO[bytes]:
+        return self._zip.open(member)
+
+    def _member_mtime(self, member: zipfile.ZipInfo) -> float:
+        return time.mktime((*member.date_time, 0, 0, -1))
+
+    def _member_size(self, member: zipfile.ZipInfo) -> int:
+        return member.file_size
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def check_member_name(name: str) -> None:
+    """Refuse a name inside a backup that is absolute or leads out of it.
+
+    Names come from manifests, which may be in archives from anywhere.
+    """
+    if name.startswith(("/", "\\")) or ".." in PurePosixPath(name).parts:
+        raise ValueError(f"Unsafe path in backup: {name}")
+
+
+def _is_manifest_name(name: str) -> bool:
+    """Check whether a member is a manifest at the top of a backup."""
+    parts = name.strip("/").split("/")
+    return parts[-1] in MANIFEST_NAMES and len(parts) <= 2
+
+
+def is_backup_archive(path: Path) -> bool:
+    """Check whether path is an archive rather than a backup directory."""
+    return path.is_file() and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+
+def open_backup_archive(path: Path) -> ArchiveReader:
+    """Open a tar or zip backup archive for reading."""
+    if zipfile.is_zipfile(path):
+        return ZipArchiveReader(path)
+    if tarfile.is_tarfile(path):
+        return TarArchiveReader(path)
+    raise ValueError(f"Not a backup archive: {path}")
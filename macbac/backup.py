@@ -1,11 +1,18 @@
 """Core backup management functionality."""
 
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional
 
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TaskID, TextColumn
 
+from .archive import ArchiveWriter, compression_for, open_archive_output
+from .cache import PersistentCache, default_cache_dir
+from .host_facts import HostFacts
+from .manifest import BACKUP_DIR_PREFIX, find_latest_backup
 from .scanners.appstore_scanner import AppStoreScanner
 from .scanners.dev_env_scanner import DevEnvScanner
 from .scanners.font_scanner import FontScanner
@@ -19,63 +26,237 @@ console = Console()
 class BackupManager:
     """Manages the backup process by coordinating scanners and storage."""
 
-    def __init__(self, output_path: Path):
+    def __init__(
+        self,
+        output_path: Path,
+        max_workers: Optional[int] = None,
+        use_cache: bool = True,
+        parallel_app_scan: bool = True,
+        incremental: bool = False,
+        copy_workers: int = 8,
+    ):
         self.output_path = output_path
-        self.storage_manager = StorageManager()
+        if copy_workers < 1:
+            raise ValueError("copy_workers must be at least 1")
+        self.storage_manager = StorageManager(copy_workers=copy_workers)
+
+        # Persistent caches let unchanged items skip expensive probes
+        cache_dir = default_cache_dir()
+        dev_tools_cache = (
+            PersistentCache(cache_dir / "dev_tools.json") if use_cache else None
+        )
+        app_bundles_cache = (
+            PersistentCache(cache_dir / "app_bundles.json", max_entries=20000)
+            if use_cache
+            else None
+        )
 
         # Initialize scanners
         self.scanners = {
             "appstore": AppStoreScanner(),
             "homebrew": HomebrewScanner(),
-            "dev_env": DevEnvScanner(),
+            "dev_env": DevEnvScanner(cache=dev_tools_cache),
             "fonts": FontScanner(),
-            "manual_apps": ManualAppScanner(),
+            "manual_apps": ManualAppScanner(
+                cache=app_bundles_cache, parallel=parallel_app_scan
+            ),
         }
 
+        # Incremental backups only record changes since the latest backup
+        self.incremental = incremental
+
+        # Number of scanners allowed to run at the same time; None runs all
+        # of them at once and 1 falls back to the sequential behaviour.
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+
     def start_backup(self) -> Path:
         """Start the backup process and return the backup directory path."""
         # Create timestamped backup directory
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = self.output_path / f"macbac_backup_{timestamp}"
+        started = datetime.now()
+        timestamp = started.strftime("%Y%m%d_%H%M%S")
+        backup_dir = self.output_path / f"{BACKUP_DIR_PREFIX}{timestamp}"
+
+        parent_backup = None
+        if self.incremental:
+            parent_backup = find_latest_backup(self.output_path, exclude=backup_dir)
+            if parent_backup is None:
+                console.print(
+                    "[yellow]No previous backup found, creating a full backup.[/yellow]"
+                )
+            else:
+                console.print(
+                    f"[cyan]Incremental backup of {parent_backup.name}[/cyan]"
+                )
+
         backup_dir.mkdir(parents=True, exist_ok=True)
 
         # Initialize storage manager with backup directory
         self.storage_manager.set_backup_dir(backup_dir)
-
-        # Collect all backup data
-        backup_data = {}
+        self.storage_manager.set_parent_backup(parent_backup)
 
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             console=console,
         ) as progress:
-            for scanner_name, scanner in self.scanners.items():
-                task = progress.add_task(
-                    f"Scanning {scanner_name.replace('_', ' ')}...", total=None
-                )
-
-                try:
-                    data = scanner.scan()  # type: ignore
-                    backup_data[scanner_name] = data
-                    scanner_display = scanner_name.replace("_", " ")
-                    progress.update(task, description=f"✅ {scanner_display} completed")
-                except Exception as e:
-                    console.print(
-                        f"[yellow]⚠️  Warning: {scanner_name} scan failed: {e}[/yellow]"
-                    )
-                    backup_data[scanner_name] = {"error": str(e)}
-                    scanner_display = scanner_name.replace("_", " ")
-                    progress.update(task, description=f"⚠️  {scanner_display} failed")
+            # Collect all backup data
+            backup_data = self._scan(progress, started)
 
             # Store backup data
             storage_task = progress.add_task("Storing backup data...", total=None)
-            self.storage_manager.store_backup_data(backup_data)
+            self.storage_manager.store_backup_data(
+                backup_data, self._storage_progress(progress, storage_task)
+            )
             progress.update(storage_task, description="✅ Backup data stored")
 
             # Generate inventory
             inventory_task = progress.add_task("Generating inventory...", total=None)
             self.storage_manager.generate_inventory(backup_data)
+            # Written last, once every file of the backup is known
+            self.storage_manager.write_checksums()
             progress.update(inventory_task, description="✅ Inventory generated")
 
         return backup_dir
+
+    def archive_backup(
+        self,
+        target: str,
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+    ) -> str:
+        """Stream a backup into a single archive file, or stdout for "-".
+
+        Nothing is written to the output directory. The compression defaults
+        to the one implied by the target's extension.
+        """
+        if self.incremental:
+            raise ValueError("Incremental backups can't be written to an archive")
+
+        started = datetime.now()
+        timestamp = started.strftime("%Y%m%d_%H%M%S")
+        backup_name = f"{BACKUP_DIR_PREFIX}{timestamp}"
+        if compression is None:
+            compression = compression_for(target)
+
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            # Collect all backup data
+            backup_data = self._scan(progress, started)
+
+            # Stream backup data
+            archive_task = progress.add_task("Writing archive...", total=None)
+            with open_archive_output(target) as output:
+                with ArchiveWriter(output, backup_name, compression, level) as archive:
+                    self.storage_manager.write_archive(
+                        backup_data,
+                        archive,
+                        self._storage_progress(
+                            progress, archive_task, "Writing archive..."
+                        ),
+                    )
+            progress.update(archive_task, description="✅ Archive written")
+
+        return "<stdout>" if target == "-" else str(Path(target).expanduser())
+
+    def _scan(self, progress: Progress, started: datetime) -> Dict[str, Any]:
+        """Run the scanners while taking the host snapshot for this backup."""
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="macbac-host"
+        ) as executor:
+            host_facts = executor.submit(HostFacts.collect, started)
+            backup_data = self._run_scanners(progress)
+            self.storage_manager.set_host_facts(host_facts.result())
+        return backup_data
+
+    def _storage_progress(
+        self,
+        progress: Progress,
+        task: TaskID,
+        description: str = "Storing backup data...",
+    ) -> Callable[[int], None]:
+        """Return a callback showing font storage throughput on a task row."""
+        started = time.monotonic()
+        stored = {"fonts": 0, "bytes": 0}
+
+        def on_font_stored(size: int) -> None:
+            stored["fonts"] += 1
+            stored["bytes"] += size
+            elapsed = max(time.monotonic() - started, 1e-6)
+            rate = stored["bytes"] / elapsed / (1024 * 1024)
+            progress.update(
+                task,
+                description=(
+                    f"Storing backup data... {stored['fonts']} fonts, {rate:.1f} MB/s"
+                ),
+            )
+
+        return on_font_stored
+
+    def _run_scanners(self, progress: Progress) -> Dict[str, Any]:
+        """Run all scanners, concurrently unless limited to a single worker."""
+        tasks: Dict[str, TaskID] = {}
+        for scanner_name in self.scanners:
+            tasks[scanner_name] = progress.add_task(
+                f"Scanning {scanner_name.replace('_', ' ')}...", total=None
+            )
+
+        results: Dict[str, Any] = {}
+
+        if self.max_workers == 1:
+            for scanner_name, scanner in self.scanners.items():
+                try:
+                    results[scanner_name] = scanner.scan()  # type: ignore
+                    failed = False
+                except Exception as e:
+                    results[scanner_name] = self._scanner_failed(scanner_name, e)
+                    failed = True
+                self._mark_scanner_done(
+                    progress, tasks[scanner_name], scanner_name, failed
+                )
+        else:
+            # Scanners spend nearly all of their time waiting on subprocesses
+            # and the filesystem, so threads overlap them without contention.
+            workers = self.max_workers or len(self.scanners)
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="macbac-scan"
+            ) as executor:
+                futures = {
+                    executor.submit(scanner.scan): scanner_name  # type: ignore
+                    for scanner_name, scanner in self.scanners.items()
+                }
+                for future in as_completed(futures):
+                    scanner_name = futures[future]
+                    try:
+                        results[scanner_name] = future.result()
+                        failed = False
+                    except Exception as e:
+                        results[scanner_name] = self._scanner_failed(scanner_name, e)
+                        failed = True
+                    self._mark_scanner_done(
+                        progress, tasks[scanner_name], scanner_name, failed
+                    )
+
+        # Keep the scanner order stable regardless of completion order
+        return {scanner_name: results[scanner_name] for scanner_name in self.scanners}
+
+    def _scanner_failed(self, scanner_name: str, error: Exception) -> Dict[str, Any]:
+        """Report a failed scanner and return its error placeholder."""
+        console.print(
+            f"[yellow]⚠️  Warning: {scanner_name} scan failed: {error}[/yellow]"
+        )
+        return {"error": str(error)}
+
+    def _mark_scanner_done(
+        self, progress: Progress, task: TaskID, scanner_name: str, failed: bool
+    ) -> None:
+        """Update the progress row of a finished scanner."""
+        scanner_display = scanner_name.replace("_", " ")
+        if failed:
+            progress.update(task, description=f"⚠️  {scanner_display} failed")
+        else:
+            progress.update(task, description=f"✅ {scanner_display} completed")
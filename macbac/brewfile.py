@@ -0,0 +1,124 @@
+"""Parsing of Brewfiles as written by `brew bundle dump`."""
+
+import re
+from typing import Dict, List, Optional
+
+# Entry types brew bundle understands, in the order it installs them
+ENTRY_KINDS = ("tap", "brew", "cask", "mas", "whalebrew", "vscode")
+
+_ENTRY_RE = re.compile(r'^(?P<kind>[a-z_]+)\s+"(?P<name>[^"]+)"(?P<options>.*)$')
+_OPTION_RE = re.compile(
+    r"(?P<key>[a-z_]+):\s*(?P<value>\"[^\"]*\"|\[[^\]]*\]|\{[^}]*\}|\S+?)(?:,|$)"
+)
+
+
+class BrewfileEntry:
+    """A single line of a Brewfile, such as `brew "git"`."""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        line: str,
+        options: Optional[Dict[str, str]] = None,
+        option_text: str = "",
+    ) -> None:
+        self.kind = kind
+        self.name = name
+        # The line as written, so entries can be written back unchanged
+        self.line = line
+        self.options = options or {}
+        # Everything after the name, including options _OPTION_RE can't parse
+        self.option_text = option_text
+
+    @property
+    def short_name(self) -> str:
+        """Return the name without its tap, e.g. "git" for "homebrew/core/git"."""
+        return self.name.rsplit("/", 1)[-1]
+
+    @property
+    def mas_id(self) -> Optional[str]:
+        """Return the App Store ID of a mas entry."""
+        value = self.options.get("id")
+        return value.strip('"') if value else None
+
+    def __repr__(self) -> str:
+        return f"BrewfileEntry({self.line!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, BrewfileEntry) and self.line == other.line
+
+    def __hash__(self) -> int:
+        return hash(self.line)
+
+
+def parse_brewfile(content: str) -> List[BrewfileEntry]:
+    """Parse a Brewfile into its entries, skipping comments and blank lines.
+
+    Lines that aren't recognised entries are skipped as well.
+    """
+    entries = []
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _ENTRY_RE.match(line)
+        if match is None:
+            continue
+        option_text = match["options"].lstrip(", ").strip()
+        options = {
+            option["key"]: option["value"]
+            for option in _OPTION_RE.finditer(option_text)
+        }
+        entries.append(
+            BrewfileEntry(match["kind"], match["name"], line, options, option_text)
+        )
+    return entries
+
+
+def render_brewfile(entries: List[BrewfileEntry]) -> str:
+    """Return Brewfile content holding the given entries."""
+    return "".join(f"{entry.line}\n" for entry in entries)
+
+
+def install_order(entries: List[BrewfileEntry]) -> List[BrewfileEntry]:
+    """Sort entries into the order brew bundle installs them.
+
+    Taps come first, as formulae and casks may come from them. Entries of
+    the same kind keep their order in the Brewfile.
+    """
+    return sorted(
+        entries,
+        key=lambda entry: (
+            ENTRY_KINDS.index(entry.kind)
+            if entry.kind in ENTRY_KINDS
+            else len(ENTRY_KINDS)
+        ),
+    )
+
+
+def fetch_command(entry: BrewfileEntry) -> Optional[List[str]]:
+    """Return the command downloading an entry ahead of installing it, if any."""
+    if entry.kind == "brew":
+        return ["brew", "fetch", "--formula", entry.name]
+    if entry.kind == "cask":
+        return ["brew", "fetch", "--cask", entry.name]
+    return None
+
+
+def install_command(entry: BrewfileEntry) -> Optional[List[str]]:
+    """Return the command installing an entry on its own.
+
+    Returns None for entries only brew bundle knows how to install, such as
+    those with options or of other kinds. Options are judged by the text
+    after the name, so ones that can't be parsed aren't dropped either.
+    """
+    if entry.option_text:
+        return None
+    if entry.kind == "tap":
+        return ["brew", "tap", entry.name]
+    if entry.kind == "brew":
+        return ["brew", "install", "--formula", entry.name]
+    if entry.kind == "cask":
+        return ["brew", "install", "--cask", entry.name]
+    return None
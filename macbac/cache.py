@@ -0,0 +1,150 @@
+"""Persistent on-disk caches shared between backup runs."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def default_cache_dir() -> Path:
+    """Return the macbac cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get("XDG_CACHE_HOME") or "~/.cache"
+    return Path(base).expanduser() / "macbac"
+
+
+def file_fingerprint(path: str) -> Optional[List[int]]:
+    """Return an identity fingerprint (inode, size, mtime) for a file."""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return [stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns]
+
+
+class PersistentCache:
+    """JSON-backed key/value cache validated by file fingerprints.
+
+    Entries are kept in least-recently-used order. An entry is only returned
+    while its fingerprint matches and it is younger than max_age seconds, and
+    the oldest entries are evicted once more than max_entries are stored.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 1000,
+        max_age: float = 7 * 24 * 60 * 60,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self._load()
+
+    def _load(self) -> None:
+        """Load cache entries from disk, starting empty if that fails."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return
+
+        entries = data.get("entries", {})
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def get(self, key: str, fingerprint: Optional[List[int]]) -> Optional[Any]:
+        """Return the cached value for key if it is still valid."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expired = time.time() - entry.get("stored_at", 0) > self.max_age
+            if (
+                fingerprint is None
+                or entry.get("fingerprint") != fingerprint
+                or expired
+            ):
+                del self._entries[key]
+                self._dirty = True
+                return None
+
+            # Move to the most-recently-used end. A hit alone doesn't make the
+            # cache dirty, so warm runs don't rewrite it; the new order is
+            # saved along with the next change
+            self._entries[key] = self._entries.pop(key)
+            return entry.get("value")
+
+    def put(self, key: str, fingerprint: Optional[List[int]], value: Any) -> None:
+        """Store a value for key, evicting the least recently used entries."""
+        if fingerprint is None:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                "fingerprint": fingerprint,
+                "stored_at": time.time(),
+                "value": value,
+            }
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._dirty = True
+
+    def retain(self, keys: Iterable[str]) -> None:
+        """Drop every entry whose key is not in keys."""
+        keep = set(keys)
+        with self._lock:
+            for key in [key for key in self._entries if key not in keep]:
+                del self._entries[key]
+                self._dirty = True
+
+    def keys(self) -> List[str]:
+        """Return the keys of all stored entries."""
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed.
+
+        The cache is only an optimisation, so failures to write it are ignored.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": self.VERSION, "entries": self._entries}
+
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Write to a temporary file first so readers never see a
+                # partially written cache
+                fd, temp_path = tempfile.mkstemp(
+                    dir=self.path.parent, prefix=f".{self.path.name}."
+                )
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(data, f, ensure_ascii=False)
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    Path(temp_path).unlink(missing_ok=True)
+                    raise
+            except (OSError, TypeError, ValueError):
+                # Unwritable location or a value that isn't JSON serialisable
+                return
+
+            self._dirty = False
@@ -1,12 +1,19 @@
 """Command-line interface for macbac."""
 
+import sys
 from pathlib import Path
+from typing import Optional
 
 import click
 from rich.console import Console
 
+from .archive import COMPRESSIONS
 from .backup import BackupManager
+from .backup import console as backup_console
+from .journal import RestoreJournal, journal_path
+from .manifest import BACKUP_DIR_PREFIX, find_manifest
 from .restore import RestoreManager
+from .verify import verify_backup
 
 console = Console()
 
@@ -24,8 +31,76 @@ def cli() -> None:
     default="~/macbac_backups",
     help="The directory to store the backup files.",
 )
-def backup(output: str) -> None:
+@click.option(
+    "-j",
+    "--jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of scanners to run concurrently (default: all at once).",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Don't reuse or update the persistent scan caches.",
+)
+@click.option(
+    "--no-parallel-apps",
+    is_flag=True,
+    help="Parse application bundles in this process even for large directories.",
+)
+@click.option(
+    "-i",
+    "--incremental",
+    is_flag=True,
+    help="Only record changes since the latest backup in the output directory.",
+)
+@click.option(
+    "--copy-jobs",
+    default=8,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of font files copied concurrently.",
+)
+@click.option(
+    "-a",
+    "--archive",
+    default=None,
+    metavar="PATH",
+    help="Stream the backup into a single tar archive instead, '-' for stdout.",
+)
+@click.option(
+    "--compression",
+    type=click.Choice(sorted(COMPRESSIONS)),
+    default=None,
+    help="Archive compression (default: from the archive extension, else gz).",
+)
+@click.option(
+    "--compression-level",
+    type=click.IntRange(min=0, max=9),
+    default=None,
+    help="Archive compression level.",
+)
+def backup(
+    output: str,
+    jobs: Optional[int],
+    no_cache: bool,
+    no_parallel_apps: bool,
+    incremental: bool,
+    copy_jobs: int,
+    archive: Optional[str],
+    compression: Optional[str],
+    compression_level: Optional[int],
+) -> None:
     """Starts the backup process for applications and configurations."""
+    if archive is not None and incremental:
+        raise click.UsageError("--archive can't be combined with --incremental")
+    if archive == "-":
+        if sys.stdout.isatty():
+            raise click.UsageError("Refusing to write an archive to a terminal")
+        # stdout carries the archive, so messages go to stderr
+        console.stderr = True
+        backup_console.stderr = True
+
     console.print("[bold green]Starting macbac backup process...[/bold green]")
 
     # Expand user path
@@ -33,13 +108,26 @@ def backup(output: str) -> None:
 
     try:
         # Create output directory if it doesn't exist
-        output_path.mkdir(parents=True, exist_ok=True)
+        if archive is None:
+            output_path.mkdir(parents=True, exist_ok=True)
 
         # Initialize backup manager
-        backup_manager = BackupManager(output_path)
+        backup_manager = BackupManager(
+            output_path,
+            max_workers=jobs,
+            use_cache=not no_cache,
+            parallel_app_scan=not no_parallel_apps,
+            incremental=incremental,
+            copy_workers=copy_jobs,
+        )
 
         # Start backup process
-        backup_path = backup_manager.start_backup()
+        if archive is not None:
+            backup_path = backup_manager.archive_backup(
+                archive, compression, compression_level
+            )
+        else:
+            backup_path = str(backup_manager.start_backup())
 
         console.print("[bold green]✅ Backup completed successfully![/bold green]")
         console.print(f"[cyan]Backup location: {backup_path}[/cyan]")
@@ -54,10 +142,28 @@ def backup(output: str) -> None:
     "-s",
     "--source",
     required=True,
-    help="The backup directory to restore from.",
+    help="The backup directory or archive (tar or zip) to restore from.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Show what would be restored and what is already installed.",
+)
+@click.option(
+    "--log",
+    "log_output",
+    is_flag=True,
+    help="Write the output of install commands to restore.log next to the backup.",
+)
+@click.option(
+    "--fresh",
+    is_flag=True,
+    help="Ignore what earlier restores of this backup completed and start over.",
 )
 @click.pass_context
-def restore(ctx: click.Context, source: str) -> None:
+def restore(
+    ctx: click.Context, source: str, dry_run: bool, log_output: bool, fresh: bool
+) -> None:
     """Restore applications and configurations from a backup."""
     # Expand user path
     source_path = Path(source).expanduser().resolve()
@@ -70,15 +176,29 @@ def restore(ctx: click.Context, source: str) -> None:
 
     try:
         # Initialize restore manager
-        restore_manager = RestoreManager(source_path)
+        # Completed actions are journaled, so an interrupted restore resumes.
+        # A fresh dry run ignores the journal without discarding it.
+        journal: Optional[RestoreJournal] = None
+        if not (fresh and dry_run):
+            journal = RestoreJournal(journal_path(source_path))
+            if fresh:
+                journal.reset()
+        restore_manager = RestoreManager(
+            source_path, log_output=log_output, journal=journal
+        )
+        ctx.call_on_close(restore_manager.close)
 
         # Store restore manager in context for subcommands
         ctx.ensure_object(dict)
         ctx.obj["restore_manager"] = restore_manager
+        ctx.obj["dry_run"] = dry_run
 
-        # If no subcommand is provided, show backup summary
+        # If no subcommand is provided, show backup summary or the full plan
         if ctx.invoked_subcommand is None:
-            restore_manager.show_backup_summary()
+            if dry_run:
+                restore_manager.show_plan()
+            else:
+                restore_manager.show_backup_summary()
 
     except Exception as e:
         console.print(f"[bold red]❌ Failed to load backup: {e}[/bold red]")
@@ -86,41 +206,109 @@ def restore(ctx: click.Context, source: str) -> None:
 
 
 @restore.command()
+@click.option(
+    "-j",
+    "--jobs",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of apps installed concurrently.",
+)
+@click.option(
+    "--timeout",
+    default=1800,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Seconds to wait for a single app to install.",
+)
+@click.option(
+    "--retries",
+    default=2,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Times to retry an install that failed with a transient error.",
+)
 @click.pass_context
-def appstore(ctx: click.Context) -> None:
+def appstore(ctx: click.Context, jobs: int, timeout: int, retries: int) -> None:
     """Restore App Store applications."""
     restore_manager = ctx.obj["restore_manager"]
     try:
-        restore_manager.restore_appstore_apps()
+        if ctx.obj["dry_run"]:
+            restore_manager.show_plan(["appstore"])
+            return
+        restore_manager.restore_appstore_apps(
+            max_workers=jobs, timeout=timeout, retries=retries
+        )
     except Exception as e:
         console.print(f"[bold red]❌ App Store restore failed: {e}[/bold red]")
         raise click.ClickException(str(e)) from e
 
 
 @restore.command()
+@click.option(
+    "-j",
+    "--jobs",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of packages downloaded concurrently.",
+)
 @click.pass_context
-def homebrew(ctx: click.Context) -> None:
+def homebrew(ctx: click.Context, jobs: int) -> None:
     """Restore Homebrew packages and casks."""
     restore_manager = ctx.obj["restore_manager"]
     try:
-        restore_manager.restore_homebrew()
+        if ctx.obj["dry_run"]:
+            restore_manager.show_plan(["homebrew"])
+            return
+        restore_manager.restore_homebrew(fetch_workers=jobs)
     except Exception as e:
         console.print(f"[bold red]❌ Homebrew restore failed: {e}[/bold red]")
         raise click.ClickException(str(e)) from e
 
 
 @restore.command()
+@click.option(
+    "-j",
+    "--jobs",
+    default=8,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of fonts copied concurrently.",
+)
 @click.pass_context
-def fonts(ctx: click.Context) -> None:
+def fonts(ctx: click.Context, jobs: int) -> None:
     """Restore custom fonts."""
     restore_manager = ctx.obj["restore_manager"]
     try:
-        restore_manager.restore_fonts()
+        if ctx.obj["dry_run"]:
+            restore_manager.show_plan(["fonts"])
+            return
+        restore_manager.restore_fonts(max_workers=jobs)
     except Exception as e:
         console.print(f"[bold red]❌ Font restore failed: {e}[/bold red]")
         raise click.ClickException(str(e)) from e
 
 
+@restore.command(name="all")
+@click.pass_context
+def restore_all(ctx: click.Context) -> None:
+    """Restore every category, overlapping those that can run together."""
+    restore_manager = ctx.obj["restore_manager"]
+    try:
+        if ctx.obj["dry_run"]:
+            restore_manager.show_plan()
+            return
+        results = restore_manager.restore_all()
+    except Exception as e:
+        console.print(f"[bold red]❌ Restore failed: {e}[/bold red]")
+        raise click.ClickException(str(e)) from e
+
+    failed = [name for name, result in results.items() if not result.ok]
+    if failed:
+        raise click.ClickException(f"Not restored: {', '.join(failed)}")
+
+
 @restore.command()
 @click.pass_context
 def summary(ctx: click.Context) -> None:
@@ -133,5 +321,75 @@ def summary(ctx: click.Context) -> None:
         raise click.ClickException(str(e)) from e
 
 
+@cli.command()
+@click.option(
+    "-s",
+    "--source",
+    required=True,
+    help="A backup directory, or an output directory to verify every backup in.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=8,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files hashed concurrently.",
+)
+@click.option(
+    "--strict",
+    is_flag=True,
+    help="Treat unexpected files in a backup as damage instead of a warning.",
+)
+def verify(source: str, jobs: int, strict: bool) -> None:
+    """Check that backups are intact against their recorded checksums."""
+    source_path = Path(source).expanduser().resolve()
+    if not source_path.is_dir():
+        raise click.ClickException(f"Backup directory not found: {source_path}")
+
+    if find_manifest(source_path).exists():
+        backup_dirs = [source_path]
+    else:
+        backup_dirs = sorted(
+            path
+            for path in source_path.glob(f"{BACKUP_DIR_PREFIX}*")
+            if find_manifest(path).exists()
+        )
+    if not backup_dirs:
+        raise click.ClickException(f"No backups found in {source_path}")
+
+    damaged = []
+    for backup_dir in backup_dirs:
+        try:
+            report = verify_backup(backup_dir, max_workers=jobs, strict=strict)
+        except Exception as e:
+            console.print(f"[bold red]❌ {backup_dir.name}: {e}[/bold red]")
+            damaged.append(backup_dir.name)
+            continue
+
+        size = report.verified_bytes / (1024 * 1024)
+        if report.ok:
+            console.print(
+                f"[green]✅ {backup_dir.name}: {report.verified} files "
+                f"({size:.1f} MB) intact[/green]"
+            )
+        else:
+            console.print(f"[bold red]❌ {backup_dir.name}:[/bold red]")
+            for path in report.missing:
+                console.print(f"  [red]missing: {path}[/red]")
+            for path, problem in report.corrupt:
+                console.print(f"  [red]corrupt: {path} ({problem})[/red]")
+            damaged.append(backup_dir.name)
+        for path in report.extra:
+            console.print(f"  [yellow]unexpected: {path}[/yellow]")
+        if report.legacy:
+            console.print(
+                "  [yellow]No checksums recorded; only fonts were checked.[/yellow]"
+            )
+
+    if damaged:
+        raise click.ClickException(f"Damaged backups: {', '.join(damaged)}")
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,269 @@
+"""Deltas between backup manifests, used by incremental backups.
+
+A delta describes how to turn one JSON value into another:
+
+- ``{"list": ops}`` edits a list, where ops is a sequence of ``["=", n]``
+  (keep n items), ``["-", n]`` (drop n items) and ``["+", items]`` (insert
+  items);
+- ``{"lines": ops}`` edits a multi-line string with the same ops on its lines,
+  which is how Brewfile changes are recorded;
+- ``{"dict": {"set": ..., "unset": ..., "patch": ...}}`` edits a dict, with
+  nested deltas under "patch";
+- ``{"value": new}`` replaces a value outright.
+
+Sections that are unchanged are left out entirely, so the delta between two
+identical manifests is empty.
+"""
+
+import copy
+import difflib
+import json
+from typing import Any, Dict, List, Optional
+
+# The manifest section describing the backup itself is never diffed
+BACKUP_INFO_KEY = "backup_info"
+
+
+def diff_manifests(parent: Dict[str, Any], child: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the delta manifest turning parent into child.
+
+    The caller is responsible for recording the parent in backup_info.
+    """
+    sections: Dict[str, Any] = {}
+    for key, value in child.items():
+        if key == BACKUP_INFO_KEY:
+            continue
+        if key not in parent:
+            sections[key] = {"value": value}
+            continue
+        section_delta = diff_values(parent[key], value)
+        if section_delta is not None:
+            sections[key] = section_delta
+
+    removed = [key for key in parent if key not in child and key != BACKUP_INFO_KEY]
+
+    return {
+        BACKUP_INFO_KEY: copy.deepcopy(child.get(BACKUP_INFO_KEY, {})),
+        "delta": sections,
+        "removed_sections": removed,
+    }
+
+
+def diff_values(old: Any, new: Any) -> Optional[Dict[str, Any]]:
+    """Return the delta turning old into new, or None if they are equal."""
+    if old == new:
+        return None
+
+    if isinstance(old, list) and isinstance(new, list):
+        return {"list": _diff_sequences(old, new)}
+
+    if isinstance(old, str) and isinstance(new, str) and ("\n" in old or "\n" in new):
+        return {"lines": _diff_sequences(old.split("\n"), new.split("\n"))}
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        set_values: Dict[str, Any] = {}
+        patches: Dict[str, Any] = {}
+        for key, value in new.items():
+            if key not in old:
+                set_values[key] = value
+                continue
+            value_delta = diff_values(old[key], value)
+            if value_delta is None:
+                continue
+            if "value" in value_delta:
+                set_values[key] = value
+            else:
+                patches[key] = value_delta
+
+        dict_delta: Dict[str, Any] = {}
+        if set_values:
+            dict_delta["set"] = set_values
+        unset = [key for key in old if key not in new]
+        if unset:
+            dict_delta["unset"] = unset
+        if patches:
+            dict_delta["patch"] = patches
+        return {"dict": dict_delta}
+
+    return {"value": new}
+
+
+def apply_value_delta(old: Any, value_delta: Dict[str, Any]) -> Any:
+    """Apply a delta produced by diff_values to old."""
+    if "value" in value_delta:
+        return copy.deepcopy(value_delta["value"])
+
+    if "list" in value_delta:
+        return _apply_ops(old or [], value_delta["list"])
+
+    if "lines" in value_delta:
+        return "\n".join(_apply_ops((old or "").split("\n"), value_delta["lines"]))
+
+    if "dict" in value_delta:
+        dict_delta = value_delta["dict"]
+        result = dict(old or {})
+        for key in dict_delta.get("unset", []):
+            result.pop(key, None)
+        for key, patch in dict_delta.get("patch", {}).items():
+            result[key] = apply_value_delta(result.get(key), patch)
+        result.update(copy.deepcopy(dict_delta.get("set", {})))
+        return result
+
+    raise ValueError(f"Unknown delta: {sorted(value_delta)}")
+
+
+def describe_changes(
+    parent: Dict[str, Any], child: Dict[str, Any]
+) -> Dict[str, Dict[str, List[Any]]]:
+    """Return what was added, removed and changed in each changed section.
+
+    Lists are compared item by item, matching items by their path or id, and
+    multi-line strings (such as the Brewfile) line by line. Dicts are
+    compared by key, and changed items are described as ``old → new``.
+    """
+    changes: Dict[str, Dict[str, List[Any]]] = {}
+    for key in list(parent) + [key for key in child if key not in parent]:
+        if key == BACKUP_INFO_KEY or parent.get(key) == child.get(key):
+            continue
+        changes[key] = _describe_value(parent.get(key), child.get(key))
+    return changes
+
+
+def _describe_value(old: Any, new: Any) -> Dict[str, List[Any]]:
+    """Describe the difference between two section values."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        description: Dict[str, List[Any]] = {
+            "added": [key for key in new if key not in old],
+            "removed": [key for key in old if key not in new],
+            "changed": [],
+        }
+        for key, value in new.items():
+            if key not in old or old[key] == value:
+                continue
+            if _is_multiline(old[key], value):
+                lines = _describe_items(_lines(old[key]), _lines(value))
+                description["added"].extend(lines["added"])
+                description["removed"].extend(lines["removed"])
+            else:
+                description["changed"].append(_describe_change(key, old[key], value))
+        return description
+
+    if _is_multiline(old, new):
+        return _describe_items(_lines(old), _lines(new))
+
+    if isinstance(old, list) or isinstance(new, list):
+        return _describe_items(
+            old if isinstance(old, list) else [], new if isinstance(new, list) else []
+        )
+
+    if old is None or new is None:
+        return _describe_items(
+            [] if old is None else [old], [] if new is None else [new]
+        )
+
+    return {"added": [], "removed": [], "changed": [f"{old} → {new}"]}
+
+
+def _describe_items(old: List[Any], new: List[Any]) -> Dict[str, List[Any]]:
+    """Return the items added to, removed from and changed between two lists.
+
+    Items with the same identity in both lists but different contents are
+    reported as changed rather than as an addition and a removal.
+    """
+    old_items = {_item_identity(item): item for item in old}
+    new_identities = {_item_identity(item) for item in new}
+    description: Dict[str, List[Any]] = {"added": [], "removed": [], "changed": []}
+    for item in new:
+        identity = _item_identity(item)
+        if identity not in old_items:
+            description["added"].append(item)
+        elif old_items[identity] != item:
+            description["changed"].append(
+                _describe_item_change(old_items[identity], item)
+            )
+    description["removed"] = [
+        item for item in old if _item_identity(item) not in new_identities
+    ]
+    return description
+
+
+def _is_multiline(old: Any, new: Any) -> bool:
+    """Check whether two values are strings, at least one of several lines."""
+    if not all(isinstance(value, str) or value is None for value in (old, new)):
+        return False
+    return "\n" in (old or "") or "\n" in (new or "")
+
+
+def _lines(value: Optional[str]) -> List[str]:
+    """Split a string that may be missing into its lines."""
+    return (value or "").splitlines()
+
+
+def _item_identity(item: Any) -> str:
+    """Return what identifies a list item across backups.
+
+    Apps are identified by their path or App Store id, so an upgraded app is
+    the same item. Anything else is identified by its whole value.
+    """
+    if isinstance(item, dict):
+        for key in ("path", "id"):
+            if item.get(key) not in (None, "unknown"):
+                return f"{key}:{item[key]}"
+    return json.dumps(item, sort_keys=True)
+
+
+def _describe_change(key: str, old: Any, new: Any) -> str:
+    """Describe a changed dict value as ``key: old → new``."""
+    if isinstance(old, (dict, list)) or isinstance(new, (dict, list)):
+        return key
+    return f"{key}: {old} → {new}"
+
+
+def _describe_item_change(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    """Describe the fields that changed between two versions of a list item."""
+    fields = [
+        f"{key} {old.get(key)} → {new.get(key)}"
+        for key in list(old) + [key for key in new if key not in old]
+        if old.get(key) != new.get(key)
+    ]
+    name = old.get("name") or _item_identity(old)
+    return f"{name}: {', '.join(fields)}"
+
+
+def _diff_sequences(old: List[Any], new: List[Any]) -> List[List[Any]]:
+    """Return edit ops turning the old sequence into the new one."""
+    # Items can be dicts, so they are compared by their canonical JSON form
+    old_keys = [json.dumps(item, sort_keys=True) for item in old]
+    new_keys = [json.dumps(item, sort_keys=True) for item in new]
+    matcher = difflib.SequenceMatcher(a=old_keys, b=new_keys, autojunk=False)
+
+    ops: List[List[Any]] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(["-", i2 - i1])
+        if j2 > j1:
+            ops.append(["+", new[j1:j2]])
+    return ops
+
+
+def _apply_ops(old: List[Any], ops: List[List[Any]]) -> List[Any]:
+    """Apply edit ops produced by _diff_sequences."""
+    result: List[Any] = []
+    position = 0
+    for op, argument in ops:
+        if op == "=":
+            result.extend(old[position : position + argument])
+            position += argument
+        elif op == "-":
+            position += argument
+        elif op == "+":
+            result.extend(copy.deepcopy(argument))
+        else:
+            raise ValueError(f"Unknown delta op: {op}")
+
+    if position != len(old):
+        raise ValueError("Delta does not match its parent backup")
+    return result
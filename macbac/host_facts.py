@@ -0,0 +1,87 @@
+"""Facts about the machine being backed up."""
+
+import getpass
+import platform
+import socket
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+UNKNOWN = "Unknown"
+
+
+class HostFacts:
+    """A snapshot of the host, taken once per backup.
+
+    The manifest and the inventory are both written from the same snapshot,
+    so they agree on when the backup was taken and what it was taken on.
+    """
+
+    def __init__(
+        self,
+        timestamp: datetime,
+        os_version: str = UNKNOWN,
+        model: str = UNKNOWN,
+        hostname: str = UNKNOWN,
+        user: str = UNKNOWN,
+        architecture: str = UNKNOWN,
+    ) -> None:
+        self.timestamp = timestamp
+        self.os_version = os_version
+        self.model = model
+        self.hostname = hostname
+        self.user = user
+        self.architecture = architecture
+
+    @classmethod
+    def collect(cls, timestamp: Optional[datetime] = None) -> "HostFacts":
+        """Gather facts about this machine, defaulting to the current time."""
+        return cls(
+            timestamp=timestamp or datetime.now(),
+            os_version=_macos_version(),
+            model=_command_output(["sysctl", "-n", "hw.model"]) or UNKNOWN,
+            hostname=socket.gethostname() or UNKNOWN,
+            user=_user_name(),
+            architecture=platform.machine() or UNKNOWN,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the facts recorded in a manifest's backup_info."""
+        return {
+            "date": self.timestamp.isoformat(),
+            "macos_version": self.os_version,
+            "model": self.model,
+            "hostname": self.hostname,
+            "user": self.user,
+            "architecture": self.architecture,
+        }
+
+
+def _macos_version() -> str:
+    """Return the macOS version, spawning sw_vers only if it isn't known."""
+    # platform reads SystemVersion.plist without starting a process
+    version = platform.mac_ver()[0]
+    if version:
+        return version
+    return _command_output(["sw_vers", "-productVersion"]) or UNKNOWN
+
+
+def _command_output(command: List[str]) -> Optional[str]:
+    """Return a command's stripped output, or None if it can't be run."""
+    try:
+        return subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=5,
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return None
+
+
+def _user_name() -> str:
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        return UNKNOWN
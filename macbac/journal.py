@@ -0,0 +1,135 @@
+"""A journal of completed restore actions, so interrupted restores resume.
+
+Each completed action is appended to a JSON Lines file as it finishes. The
+file is flushed after every action, so it survives the process being
+killed, and synced to disk in batches, so a long restore doesn't wait on
+the disk for every package. A rerun loads the journal into a set and skips
+what it holds.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Optional, Set, Tuple
+
+# Actions written before the journal is synced to disk
+SYNC_EVERY = 32
+
+# Seconds after which pending actions are synced regardless
+SYNC_INTERVAL = 2.0
+
+
+def default_state_dir() -> Path:
+    """Return the macbac state directory, honouring XDG_STATE_HOME."""
+    base = os.environ.get("XDG_STATE_HOME") or "~/.local/state"
+    return Path(base).expanduser() / "macbac"
+
+
+def journal_path(backup_dir: Path, state_dir: Optional[Path] = None) -> Path:
+    """Return the journal of restores from a backup.
+
+    Journals are kept in the state directory rather than next to the
+    backup, which may be an archive or on read-only storage.
+    """
+    key = hashlib.sha256(str(backup_dir.resolve()).encode("utf-8")).hexdigest()
+    directory = (state_dir or default_state_dir()) / "journals"
+    return directory / f"{backup_dir.name}-{key[:16]}.jsonl"
+
+
+class RestoreJournal:
+    """The restore actions completed so far, by category and item."""
+
+    def __init__(
+        self,
+        path: Path,
+        sync_every: int = SYNC_EVERY,
+        sync_interval: float = SYNC_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._done: Set[Tuple[str, str]] = set()
+        # Whether the last line was cut short and must be ended before appending
+        self._torn = False
+        self._file: Optional[IO[str]] = None
+        self._pending = 0
+        self._synced_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self) -> None:
+        """Read the completed actions, ignoring a line cut short by a crash."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                        self._done.add((record["category"], record["item"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            return
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, category: str, item: str) -> bool:
+        """Check whether an action was completed by an earlier restore."""
+        return (category, item) in self._done
+
+    def record(self, category: str, item: str) -> None:
+        """Record that an action completed."""
+        line = json.dumps({"category": category, "item": item}, ensure_ascii=False)
+        with self._lock:
+            if (category, item) in self._done:
+                return
+            self._done.add((category, item))
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._torn:
+                    self._file.write("\n")
+                    self._torn = False
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._pending += 1
+            if (
+                self._pending >= self.sync_every
+                or time.monotonic() - self._synced_at >= self.sync_interval
+            ):
+                self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def sync(self) -> None:
+        """Write recorded actions through to the disk."""
+        with self._lock:
+            self._sync()
+
+    def reset(self) -> None:
+        """Forget every completed action, starting the journal over."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._done.clear()
+            self._torn = False
+            self._pending = 0
+            self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Sync and close the journal."""
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
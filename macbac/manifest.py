@@ -0,0 +1,376 @@
+"""Reading and writing backup manifests, including incremental backup chains.
+
+Manifests are stored as JSON Lines. The first line is a small header with
+the backup_info and an index of the sections that follow, one per line, with
+their byte offset and length (relative to the end of the header line), item
+count and SHA-256 checksum. Each section is decoded only when it is used:
+showing a summary reads the header alone.
+
+Backups made before this format have a single JSON manifest.json, which is
+still read.
+"""
+
+import hashlib
+import json
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .delta import BACKUP_INFO_KEY, apply_value_delta
+
+MANIFEST_NAME = "manifest.jsonl"
+LEGACY_MANIFEST_NAME = "manifest.json"
+# Manifest file names in order of preference
+MANIFEST_NAMES = (MANIFEST_NAME, LEGACY_MANIFEST_NAME)
+INVENTORY_NAME = "inventory.md"
+CHECKSUMS_NAME = "checksums.json"
+# Font digests of archived backups, written after the fonts they describe
+FONT_HASHES_NAME = "font_hashes.json"
+BACKUP_DIR_PREFIX = "macbac_backup_"
+
+MANIFEST_FORMAT = "macbac-manifest"
+MANIFEST_VERSION = 2
+
+
+def encode_manifest(manifest: Dict[str, Any]) -> bytes:
+    """Serialise a full or delta manifest in the sectioned format."""
+    delta = is_delta_manifest(manifest)
+    if delta:
+        sections = manifest["delta"]
+    else:
+        sections = {k: v for k, v in manifest.items() if k != BACKUP_INFO_KEY}
+
+    index: Dict[str, Dict[str, Any]] = {}
+    body: List[bytes] = []
+    offset = 0
+    for name, value in sections.items():
+        data = _dump(value) + b"\n"
+        entry: Dict[str, Any] = {
+            "offset": offset,
+            "length": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+        # Counts of a delta's sections would describe the changes only
+        if not delta:
+            entry["count"] = count_items(value)
+        index[name] = entry
+        body.append(data)
+        offset += len(data)
+
+    header: Dict[str, Any] = {
+        "format": MANIFEST_FORMAT,
+        "version": MANIFEST_VERSION,
+        BACKUP_INFO_KEY: manifest.get(BACKUP_INFO_KEY, {}),
+        "sections": index,
+    }
+    if delta:
+        header["delta"] = True
+        header["removed_sections"] = manifest.get("removed_sections", [])
+
+    return _dump(header) + b"\n" + b"".join(body)
+
+
+def _dump(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_manifest(manifest_path: Path, manifest: Dict[str, Any]) -> bytes:
+    """Write a manifest in the sectioned format, returning the bytes written."""
+    data = encode_manifest(manifest)
+    with open(manifest_path, "wb") as f:
+        f.write(data)
+    return data
+
+
+def count_items(value: Any) -> int:
+    """Return the number of items in a manifest section.
+
+    Lists count their entries, strings such as a Brewfile their non-empty
+    lines and dicts the items of their values.
+    """
+    if isinstance(value, list):
+        return len(value)
+    if isinstance(value, str):
+        return sum(1 for line in value.splitlines() if line.strip())
+    if isinstance(value, dict):
+        return sum(count_items(item) for item in value.values())
+    return 0 if value is None else 1
+
+
+class ManifestFile:
+    """A single stored manifest, decoding its sections on demand.
+
+    For delta manifests the sections hold the delta of each changed section.
+    """
+
+    def __init__(
+        self,
+        header: Dict[str, Any],
+        read_range: Optional[Callable[[int, int], bytes]] = None,
+        sections: Optional[Dict[str, Any]] = None,
+        source: str = "",
+    ) -> None:
+        self.header = header
+        self.source = source
+        self.backup_info: Dict[str, Any] = header.get(BACKUP_INFO_KEY, {})
+        self.is_delta = bool(header.get("delta"))
+        self.removed_sections: List[str] = header.get("removed_sections", [])
+        self._index: Dict[str, Dict[str, Any]] = header.get("sections", {})
+        self._read_range = read_range
+        # Decoded sections; legacy manifests are decoded up front
+        self._sections: Dict[str, Any] = dict(sections or {})
+        self.section_names: List[str] = list(sections or self._index)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, source: str = "") -> "ManifestFile":
+        """Parse a manifest held in memory, in either format."""
+        header_line, _, body = data.partition(b"\n")
+        header = _parse_header(header_line)
+        if header is None:
+            return cls._from_legacy(_parse_json(data), source)
+        return cls(
+            header,
+            read_range=lambda offset, length: body[offset : offset + length],
+            source=source,
+        )
+
+    @classmethod
+    def open(cls, manifest_path: Path) -> "ManifestFile":
+        """Read a manifest file's header, leaving its sections on disk."""
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Manifest file not found: {manifest_path}")
+
+        with open(manifest_path, "rb") as f:
+            header_line = f.readline()
+            body_offset = f.tell()
+            header = _parse_header(header_line)
+            if header is None:
+                f.seek(0)
+                return cls._from_legacy(_parse_json(f.read()), str(manifest_path))
+
+        def read_range(offset: int, length: int) -> bytes:
+            with open(manifest_path, "rb") as f:
+                f.seek(body_offset + offset)
+                return f.read(length)
+
+        return cls(header, read_range=read_range, source=str(manifest_path))
+
+    @classmethod
+    def _from_legacy(cls, manifest: Any, source: str) -> "ManifestFile":
+        if not isinstance(manifest, dict):
+            raise ValueError("Invalid manifest file: expected a JSON object")
+        header: Dict[str, Any] = {BACKUP_INFO_KEY: manifest.get(BACKUP_INFO_KEY, {})}
+        if is_delta_manifest(manifest):
+            header["delta"] = True
+            header["removed_sections"] = manifest.get("removed_sections", [])
+            sections = manifest["delta"]
+        else:
+            sections = {k: v for k, v in manifest.items() if k != BACKUP_INFO_KEY}
+        return cls(header, sections=sections, source=source)
+
+    def has(self, name: str) -> bool:
+        """Check whether the manifest holds a section."""
+        return name in self.section_names
+
+    def count(self, name: str) -> Optional[int]:
+        """Return a section's item count without decoding it, if recorded."""
+        if name in self._sections:
+            return None if self.is_delta else count_items(self._sections[name])
+        count = self._index.get(name, {}).get("count")
+        return count if isinstance(count, int) else None
+
+    def section(self, name: str) -> Any:
+        """Decode and return a section."""
+        if name in self._sections:
+            return self._sections[name]
+        if name not in self._index or self._read_range is None:
+            raise KeyError(name)
+
+        entry = self._index[name]
+        data = self._read_range(entry["offset"], entry["length"])
+        if hashlib.sha256(data).hexdigest() != entry.get("sha256"):
+            raise ValueError(
+                f"Invalid manifest file: section {name} of {self.source} is corrupt"
+            )
+        value = _parse_json(data)
+        self._sections[name] = value
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode every section into a manifest dict as diffed and patched."""
+        sections = {name: self.section(name) for name in self.section_names}
+        manifest: Dict[str, Any] = {BACKUP_INFO_KEY: self.backup_info}
+        if self.is_delta:
+            manifest["delta"] = sections
+            manifest["removed_sections"] = self.removed_sections
+        else:
+            manifest.update(sections)
+        return manifest
+
+
+def _parse_header(line: bytes) -> Optional[Dict[str, Any]]:
+    """Return the header of a sectioned manifest, or None for a legacy one."""
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("format") != MANIFEST_FORMAT:
+        return None
+    if header.get("version") != MANIFEST_VERSION:
+        raise ValueError(
+            f"Invalid manifest file: unsupported version {header.get('version')}"
+        )
+    return header
+
+
+def _parse_json(data: bytes) -> Any:
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise ValueError(f"Invalid manifest file: {e}") from e
+
+
+class BackupManifest(Mapping[str, Any]):
+    """The full manifest of a backup, decoding sections as they are used.
+
+    manifests is the chain the backup is built from, newest first and ending
+    with a full manifest. A section's value is the full manifest's, patched
+    by every delta after it.
+    """
+
+    def __init__(self, manifests: List[ManifestFile]) -> None:
+        self.manifests = manifests
+        self._values: Dict[str, Any] = {}
+        self._names = self._section_names()
+
+    def _section_names(self) -> List[str]:
+        names: List[str] = []
+        for manifest in reversed(self.manifests):
+            removed = set(manifest.removed_sections)
+            names = [name for name in names if name not in removed]
+            names.extend(name for name in manifest.section_names if name not in names)
+        return names
+
+    @property
+    def backup_info(self) -> Dict[str, Any]:
+        return self.manifests[0].backup_info
+
+    def __getitem__(self, key: str) -> Any:
+        if key == BACKUP_INFO_KEY:
+            return self.backup_info
+        if key not in self._names:
+            raise KeyError(key)
+        if key not in self._values:
+            self._values[key] = self._resolve(key)
+        return self._values[key]
+
+    def _resolve(self, key: str) -> Any:
+        value: Any = None
+        for manifest in reversed(self.manifests):
+            if not manifest.is_delta:
+                value = manifest.section(key) if manifest.has(key) else None
+            elif key in manifest.removed_sections:
+                value = None
+            elif manifest.has(key):
+                value = apply_value_delta(value, manifest.section(key))
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key == BACKUP_INFO_KEY or key in self._names
+
+    def __iter__(self) -> Iterator[str]:
+        yield BACKUP_INFO_KEY
+        yield from self._names
+
+    def __len__(self) -> int:
+        return len(self._names) + 1
+
+    def count(self, key: str) -> int:
+        """Return the number of items in a section, decoding it only if needed."""
+        if key not in self._names:
+            return 0
+        if len(self.manifests) == 1:
+            count = self.manifests[0].count(key)
+            if count is not None:
+                return count
+        return count_items(self[key])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode every section."""
+        return {key: self[key] for key in self}
+
+
+def find_manifest(backup_dir: Path) -> Path:
+    """Return the manifest file of a backup directory.
+
+    Falls back to the current format's name if the backup has none.
+    """
+    for name in MANIFEST_NAMES:
+        path = backup_dir / name
+        if path.is_file():
+            return path
+    return backup_dir / MANIFEST_NAME
+
+
+def read_manifest(manifest_path: Path) -> Dict[str, Any]:
+    """Read a single manifest file as stored on disk."""
+    return ManifestFile.open(manifest_path).to_dict()
+
+
+def is_delta_manifest(manifest: Dict[str, Any]) -> bool:
+    """Check whether a manifest only holds changes against a parent backup."""
+    return "delta" in manifest
+
+
+def open_backup_manifest(backup_dir: Path) -> Tuple[BackupManifest, List[Path]]:
+    """Open the full manifest of a backup, following incremental parents.
+
+    Only manifest headers are read; sections are decoded as they are used.
+    Returns the manifest and the chain of backup directories it is built
+    from, newest first.
+    """
+    chain: List[Path] = []
+    manifests: List[ManifestFile] = []
+    current = backup_dir
+
+    while True:
+        if current in chain:
+            raise ValueError(f"Backup chain loops back to {current.name}")
+        manifest = ManifestFile.open(find_manifest(current))
+        chain.append(current)
+        manifests.append(manifest)
+
+        if not manifest.is_delta:
+            break
+
+        parent_name = manifest.backup_info.get("parent")
+        if not parent_name:
+            raise ValueError(f"Incremental backup without a parent: {current.name}")
+        current = current.parent / parent_name
+        if not current.is_dir():
+            raise FileNotFoundError(f"Parent backup not found: {current}")
+
+    return BackupManifest(manifests), chain
+
+
+def load_backup_manifest(backup_dir: Path) -> Tuple[Dict[str, Any], List[Path]]:
+    """Load the full manifest of a backup, following incremental parents.
+
+    Returns the materialised manifest and the chain of backup directories it
+    was built from, newest first.
+    """
+    manifest, chain = open_backup_manifest(backup_dir)
+    return manifest.to_dict(), chain
+
+
+def find_latest_backup(
+    output_dir: Path, exclude: Optional[Path] = None
+) -> Optional[Path]:
+    """Return the most recent backup directory in an output directory."""
+    candidates = [
+        path
+        for path in output_dir.glob(f"{BACKUP_DIR_PREFIX}*")
+        if path != exclude and any((path / name).is_file() for name in MANIFEST_NAMES)
+    ]
+    # Timestamped names sort chronologically
+    return max(candidates, key=lambda path: path.name, default=None)
@@ -0,0 +1,115 @@
+"""Content-addressed storage shared by all backups in an output directory."""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import List
+
+from .cache import PersistentCache, file_fingerprint
+from .fastcopy import copy_file
+
+# Name of the object store directory inside a backup output directory
+OBJECTS_DIR_NAME = "objects"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ObjectStore:
+    """Stores file contents once, named by their SHA-256 digest.
+
+    Blobs live in <root>/<first two hex digits>/<digest>. Backups reference
+    blobs by digest and hardlink them into their own directory, so content
+    that is already stored is never written again. The digests of source
+    files are cached by file identity, which lets an unchanged file be
+    stored without even being read. Files can be added from several threads
+    at once.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.digest_cache = PersistentCache(
+            root / "index.json", max_entries=100000, max_age=30 * 24 * 60 * 60
+        )
+
+    def object_path(self, digest: str) -> Path:
+        """Return the path of the blob for a digest."""
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        """Check whether a blob is stored."""
+        return self.object_path(digest).exists()
+
+    def add_file(self, src: Path) -> str:
+        """Store the contents of a file and return its digest.
+
+        Files are hashed first, so content that is already stored is
+        skipped without being copied.
+        """
+        key = str(src)
+        fingerprint = file_fingerprint(key)
+        if fingerprint is None:
+            raise FileNotFoundError(f"Source file not found: {src}")
+
+        digest = self.digest_cache.get(key, fingerprint)
+        if not isinstance(digest, str):
+            digest = hash_file(src)
+        if not self.has(digest):
+            digest = self._write_blob(src, digest, fingerprint)
+
+        self.digest_cache.put(key, fingerprint, digest)
+        return digest
+
+    def _write_blob(self, src: Path, digest: str, fingerprint: List[int]) -> str:
+        """Copy a file into the store under its digest, returning the digest."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        os.close(fd)
+        temp_path = Path(temp_name)
+
+        try:
+            copy_file(src, temp_path)
+            # The source changed while it was being stored, so the copy may
+            # not match the digest computed earlier
+            if file_fingerprint(str(src)) != fingerprint:
+                digest = hash_file(temp_path)
+
+            blob_path = self.object_path(digest)
+            if blob_path.exists():
+                return digest
+            blob_path.parent.mkdir(exist_ok=True)
+            # Never replace a blob another thread just stored, since backups
+            # may already be linked to it
+            try:
+                os.link(temp_path, blob_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                os.replace(temp_path, blob_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+        return digest
+
+    def link_to(self, digest: str, dst: Path) -> None:
+        """Materialise a stored blob at dst, hardlinking it when possible."""
+        blob_path = self.object_path(digest)
+        dst.unlink(missing_ok=True)
+        try:
+            os.link(blob_path, dst)
+        except OSError:
+            # Filesystems without hardlinks get a regular copy
+            copy_file(blob_path, dst)
+
+    def save(self) -> None:
+        """Persist the source digest index."""
+        self.digest_cache.save()
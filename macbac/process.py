@@ -0,0 +1,217 @@
+"""Running long commands while streaming their output.
+
+Installs can run for many minutes and print a lot. Their output is read
+line by line as it is written, instead of being buffered until the command
+exits: each line can update the progress display, only the last lines are
+kept in memory for error reports, and the full output can be written to a
+log file.
+"""
+
+import os
+import re
+import selectors
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Callable, Deque, Dict, List, Optional, Tuple
+
+# Lines of output kept for error reports
+TAIL_LINES = 50
+
+# Longest line kept whole; longer ones are split, so memory stays bounded
+MAX_LINE_LENGTH = 64 * 1024
+
+READ_SIZE = 64 * 1024
+
+_ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_LINE_END_RE = re.compile(rb"\r\n|\r|\n")
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+# brew and mas both announce each step with "==> "
+_STEP_PREFIX = "==> "
+
+
+class ProcessLog:
+    """A log file that the output of several commands is written to.
+
+    Lines from commands running at the same time are interleaved, so each
+    is prefixed with the command it came from.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+
+    def start(self, command: List[str]) -> None:
+        """Record that a command is being run."""
+        self._write(f"$ {' '.join(command)}\n")
+
+    def write(self, command: List[str], line: str) -> None:
+        """Record a line of a command's output."""
+        self._write(f"[{_command_name(command)}] {line}\n")
+
+    def finish(self, command: List[str], returncode: int) -> None:
+        """Record how a command exited."""
+        self._write(f"[{_command_name(command)}] exit status {returncode}\n")
+
+    def _write(self, text: str) -> None:
+        with self._lock:
+            if self._file is None:
+                # Line buffered, so the log can be followed while restoring
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(text)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _command_name(command: List[str]) -> str:
+    return " ".join(command[:3])
+
+
+class ProcessResult:
+    """How a command exited, with the last lines of its output."""
+
+    def __init__(self, command: List[str], returncode: int, tail: List[str]) -> None:
+        self.command = command
+        self.returncode = returncode
+        # stdout and stderr, interleaved in the order they were read
+        self.tail = tail
+
+    @property
+    def output(self) -> str:
+        return "\n".join(self.tail)
+
+    @property
+    def error(self) -> Optional[str]:
+        """Return None on success, else the last line of output."""
+        if self.returncode == 0:
+            return None
+        for line in reversed(self.tail):
+            if line.strip():
+                return line.strip()
+        return f"exit status {self.returncode}"
+
+
+def run_streaming(
+    command: List[str],
+    on_line: Optional[Callable[[str], None]] = None,
+    log: Optional[ProcessLog] = None,
+    timeout: Optional[float] = None,
+    tail_lines: int = TAIL_LINES,
+) -> ProcessResult:
+    """Run a command, handling its output a line at a time as it arrives.
+
+    Carriage returns end a line too, so progress bars redrawn in place are
+    seen as they update. Raises subprocess.TimeoutExpired, after killing the
+    command, if it runs for longer than timeout seconds.
+    """
+    tail: Deque[str] = deque(maxlen=tail_lines)
+
+    def handle(raw: bytes) -> None:
+        line = _ANSI_ESCAPE_RE.sub("", raw.decode("utf-8", errors="replace"))
+        tail.append(line)
+        if log is not None:
+            log.write(command, line)
+        if on_line is not None:
+            on_line(line)
+
+    if log is not None:
+        log.start(command)
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        _pump(process, handle, deadline)
+        returncode = process.wait(timeout=_remaining(deadline))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise subprocess.TimeoutExpired(
+            command, timeout or 0, output="\n".join(tail)
+        ) from None
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        for stream in (process.stdout, process.stderr):
+            if stream is not None:
+                stream.close()
+
+    if log is not None:
+        log.finish(command, returncode)
+    return ProcessResult(command, returncode, list(tail))
+
+
+def _pump(
+    process: "subprocess.Popen[bytes]",
+    handle: Callable[[bytes], None],
+    deadline: Optional[float],
+) -> None:
+    """Read stdout and stderr until both are closed, passing on whole lines."""
+    pending: Dict[int, bytes] = {}
+    with selectors.DefaultSelector() as selector:
+        for stream in (process.stdout, process.stderr):
+            if stream is not None:
+                os.set_blocking(stream.fileno(), False)
+                selector.register(stream.fileno(), selectors.EVENT_READ)
+                pending[stream.fileno()] = b""
+
+        while selector.get_map():
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, 0)
+            for key, _ in selector.select(timeout=remaining):
+                fd = key.fd
+                try:
+                    chunk = os.read(fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    selector.unregister(fd)
+                    if pending[fd]:
+                        handle(pending[fd])
+                    continue
+                lines, pending[fd] = _split_lines(pending[fd] + chunk)
+                for line in lines:
+                    handle(line)
+
+
+def _split_lines(data: bytes) -> Tuple[List[bytes], bytes]:
+    """Split data into complete lines and the unfinished rest."""
+    parts = _LINE_END_RE.split(data)
+    rest = parts.pop()
+    # A trailing "\r" may be the first half of "\r\n"
+    if data.endswith(b"\r"):
+        rest = parts.pop() + b"\r"
+    lines = [part for part in parts if part]
+    while len(rest) > MAX_LINE_LENGTH:
+        lines.append(rest[:MAX_LINE_LENGTH])
+        rest = rest[MAX_LINE_LENGTH:]
+    return lines, rest
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def parse_progress(line: str) -> Tuple[Optional[str], Optional[float]]:
+    """Return the step a line of brew or mas output starts, and its percentage.
+
+    Either is None if the line doesn't have one.
+    """
+    step = line[len(_STEP_PREFIX) :].strip() if line.startswith(_STEP_PREFIX) else None
+    match = _PERCENT_RE.search(line)
+    percent = float(match.group(1)) if match else None
+    if percent is not None and percent > 100:
+        percent = None
+    return step, percent
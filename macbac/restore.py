@@ -1,45 +1,339 @@
 """Core restore management functionality."""
 
 import json
-import shutil
+import os
 import subprocess
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 from rich.console import Console
 from rich.progress import (
     BarColumn,
     Progress,
     SpinnerColumn,
+    TaskID,
     TaskProgressColumn,
     TextColumn,
 )
 
+from .archive import (
+    ArchiveReader,
+    check_member_name,
+    is_backup_archive,
+    open_backup_archive,
+)
+from .brewfile import (
+    BrewfileEntry,
+    fetch_command,
+    install_command,
+    install_order,
+    render_brewfile,
+)
+from .cache import default_cache_dir
+from .fastcopy import copy_file
+from .journal import RestoreJournal
+from .manifest import (
+    FONT_HASHES_NAME,
+    BackupManifest,
+    ManifestFile,
+    find_manifest,
+    open_backup_manifest,
+)
+from .object_store import hash_file
+from .process import ProcessLog, parse_progress, run_streaming
+from .restore_plan import (
+    RESTORE_CATEGORIES,
+    RESTORE_DEPENDENCIES,
+    CategoryPlan,
+    HostState,
+    plan_appstore,
+    plan_fonts,
+    plan_homebrew,
+)
+from .scheduler import SKIPPED, JobResult, Scheduler
+
 console = Console()
 
 
+@contextmanager
+def progress_display(progress: Optional[Progress] = None) -> Iterator[Progress]:
+    """Use a shared progress display, or show one until the block ends."""
+    if progress is not None:
+        yield progress
+        return
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        console=console,
+    ) as own_progress:
+        yield own_progress
+
+
+# Name of the file install output is logged to
+RESTORE_LOG = "restore.log"
+
+# Output of mas failures worth retrying, such as dropped connections
+TRANSIENT_MAS_ERRORS = (
+    "network",
+    "connection",
+    "timed out",
+    "timeout",
+    "temporarily",
+    "nsurlerrordomain",
+    "try again",
+)
+
+
+class MissingToolError(RuntimeError):
+    """A tool a restore step needs, such as brew or mas, isn't installed."""
+
+
 class RestoreManager:
     """Manages the restore process by reading backup data and executing restore operations."""  # noqa: E501
 
-    def __init__(self, backup_dir: Path):
+    def __init__(
+        self,
+        backup_dir: Path,
+        log_output: bool = False,
+        journal: Optional[RestoreJournal] = None,
+    ):
         self.backup_dir = backup_dir
-        self.manifest_path = backup_dir / "manifest.json"
-        self.manifest_data: Dict[str, Any] = {}
+        self.manifest_path = find_manifest(backup_dir)
+        # Sections are decoded the first time a restore step uses them
+        self.manifest_data = BackupManifest([])
+        # Font digests stored outside the manifest, read when first needed
+        self._archived_font_hashes: Optional[Dict[str, str]] = None
+        # Backup directories the manifest was built from, newest first
+        self.backup_chain: List[Path] = []
+        # Backups can be read straight from an archive without extracting it
+        self.archive: Optional[ArchiveReader] = None
+        if is_backup_archive(backup_dir):
+            self.archive = open_backup_archive(backup_dir)
+        # What is already installed, gathered once and shared by every plan
+        self.host_state = HostState(
+            font_cache_path=default_cache_dir() / "installed_fonts.json"
+        )
+
+        # Actions completed by earlier restores, which are not repeated
+        self.journal = journal
+        # Output of install commands, written next to the backup if asked for
+        self.log: Optional[ProcessLog] = None
+        if log_output:
+            self.log = ProcessLog(self.log_path())
 
         # Load manifest data
         self._load_manifest()
 
     def _load_manifest(self) -> None:
-        """Load the manifest.json file."""
-        if not self.manifest_path.exists():
-            raise FileNotFoundError(f"Manifest file not found: {self.manifest_path}")
+        """Load the manifest header, following incremental backups."""
+        if self.archive is None:
+            self.manifest_data, self.backup_chain = open_backup_manifest(
+                self.backup_dir
+            )
+            return
 
+        manifest_name = self.archive.manifest_name
+        manifest = ManifestFile.from_bytes(
+            self.archive.read(manifest_name), manifest_name
+        )
+        if manifest.is_delta:
+            raise ValueError("Incremental backups can't be restored from an archive")
+        self.manifest_data = BackupManifest([manifest])
+        self.backup_chain = [self.backup_dir]
+
+    def log_path(self) -> Path:
+        """Return the file install output is logged to."""
+        if self.archive is not None:
+            return self.backup_dir.with_name(f"{self.backup_dir.name}.{RESTORE_LOG}")
+        return self.backup_dir / RESTORE_LOG
+
+    def close(self) -> None:
+        """Release the backup archive, the log and the journal, if used."""
+        if self.archive is not None:
+            self.archive.close()
+        if self.log is not None:
+            self.log.close()
+        if self.journal is not None:
+            self.journal.close()
+
+    def _font_source(self, font_name: str) -> Optional[Path]:
+        """Return the stored copy of a font.
+
+        Incremental backups only hold fonts that changed, so the newest backup
+        in the chain that has the font holds its current version.
+        """
+        for backup_dir in self.backup_chain or [self.backup_dir]:
+            source_path = backup_dir / "fonts" / font_name
+            if source_path.exists():
+                return source_path
+        return None
+
+    def _has_font(self, font_name: str) -> bool:
+        """Check whether the backup holds a font.
+
+        Fonts whose names lead out of the backup are treated as missing.
+        """
         try:
-            with open(self.manifest_path, "r", encoding="utf-8") as f:
-                self.manifest_data = json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid manifest file: {e}") from e
+            check_member_name(font_name)
+        except ValueError:
+            return False
+        if self.archive is not None:
+            return self.archive.has(f"fonts/{font_name}")
+        return self._font_source(font_name) is not None
+
+    def _copy_font(self, font_name: str, target_path: Path) -> int:
+        """Copy a font out of the backup, preserving its modification time.
+
+        Returns the number of bytes copied.
+        """
+        if self.archive is not None:
+            return self.archive.extract(f"fonts/{font_name}", target_path)
+
+        source_path = self._font_source(font_name)
+        if source_path is None:
+            raise FileNotFoundError(f"Font file not found: {font_name}")
+        return copy_file(source_path, target_path)
+
+    def _font_size(self, font_name: str) -> int:
+        """Return the size of a font in the backup, or 0 if it is unknown."""
+        try:
+            if self.archive is not None:
+                return self.archive.size(f"fonts/{font_name}")
+            source_path = self._font_source(font_name)
+            return source_path.stat().st_size if source_path else 0
+        except OSError:
+            return 0
+
+    def _fonts_dir(self) -> Path:
+        """Return the directory fonts are restored to."""
+        return Path("~/Library/Fonts").expanduser()
+
+    def _font_hashes(self) -> Dict[str, str]:
+        """Return the content digests of the backup's fonts, by name.
+
+        Archived backups record them after the fonts, in a member of their
+        own, as the fonts are hashed while they are archived.
+        """
+        if "font_hashes" in self.manifest_data:
+            return dict(self.manifest_data["font_hashes"] or {})
+        if self._archived_font_hashes is None:
+            self._archived_font_hashes = {}
+            try:
+                if self.archive is not None:
+                    data = self.archive.read(FONT_HASHES_NAME)
+                else:
+                    data = (self.backup_dir / FONT_HASHES_NAME).read_bytes()
+            except FileNotFoundError:
+                return self._archived_font_hashes
+            try:
+                font_hashes = json.loads(data)
+            except ValueError as e:
+                raise ValueError(f"Invalid {FONT_HASHES_NAME}: {e}") from e
+            if isinstance(font_hashes, dict):
+                self._archived_font_hashes = font_hashes
+        return self._archived_font_hashes
+
+    def plan(
+        self, categories: Iterable[str] = RESTORE_CATEGORIES
+    ) -> Dict[str, CategoryPlan]:
+        """Compare the backup with this machine and plan each category.
+
+        The machine's state is gathered concurrently for all categories.
+        """
+        categories = list(categories)
+        target_dir = self._fonts_dir()
+
+        # Installed fonts only need hashing if the backup has font digests
+        state_categories = categories
+        if "fonts" in categories and not self._font_hashes():
+            state_categories = [c for c in categories if c != "fonts"]
+        self.host_state.prefetch(state_categories, target_dir)
+
+        return {
+            category: self._plan_category(category, target_dir)
+            for category in categories
+        }
+
+    def _plan_category(self, category: str, target_dir: Path) -> CategoryPlan:
+        if category == "appstore":
+            return self._skip_journaled(
+                plan_appstore(self.manifest_data.get("appstore", []), self.host_state)
+            )
+        if category == "homebrew":
+            brewfile = self.manifest_data.get("homebrew", {}).get("brewfile", "")
+            return self._skip_journaled(plan_homebrew(brewfile, self.host_state))
+        if category == "fonts":
+            return plan_fonts(
+                self.manifest_data.get("fonts", []),
+                self._font_hashes(),
+                target_dir,
+                self.host_state,
+                self._has_font,
+                self._font_size,
+            )
+        raise ValueError(f"Unknown restore category: {category}")
+
+    def _skip_journaled(self, plan: CategoryPlan) -> CategoryPlan:
+        """Move the actions an earlier restore completed to plan.skipped."""
+        if self.journal is None or not len(self.journal):
+            return plan
+        actions = []
+        for item in plan.actions:
+            if self.journal.is_done(plan.category, self._journal_key(item)):
+                plan.skip(item, "restored earlier")
+            else:
+                actions.append(item)
+        plan.actions = actions
+        return plan
+
+    def _journal_key(self, item: Any) -> str:
+        if isinstance(item, dict):
+            return str(item.get("id"))
+        if isinstance(item, BrewfileEntry):
+            return item.line
+        return str(item)
+
+    def _record(self, category: str, item: Any) -> None:
+        """Record in the journal that an action completed."""
+        if self.journal is not None:
+            self.journal.record(category, self._journal_key(item))
+
+    def show_plan(self, categories: Iterable[str] = RESTORE_CATEGORIES) -> None:
+        """Display what restoring categories would do, without doing it."""
+        console.print("[bold blue]📋 Restore Plan (dry run)[/bold blue]")
+        console.print()
+
+        for category, plan in self.plan(categories).items():
+            line = (
+                f"  [cyan]{category}[/cyan] - {len(plan.actions)} to restore, "
+                f"{len(plan.skipped)} skipped"
+            )
+            if plan.replacing:
+                line += f", {len(plan.replacing)} replacing changed files"
+            if plan.work_bytes:
+                line += f", {plan.work_bytes / (1024 * 1024):.1f} MB to copy"
+            console.print(line)
+            for item, reason in plan.skipped:
+                if reason not in ("already installed", "restored earlier"):
+                    console.print(
+                        f"    [yellow]{self._item_name(item)}: {reason}[/yellow]"
+                    )
+
+        console.print()
+        console.print("[yellow]Nothing was changed.[/yellow]")
+
+    def _item_name(self, item: Any) -> str:
+        if isinstance(item, dict):
+            return str(item.get("name", "Unknown"))
+        if isinstance(item, BrewfileEntry):
+            return item.line
+        return str(item)
 
     def show_backup_summary(self) -> None:
         """Display a summary of the backup contents."""
@@ -54,22 +348,28 @@ class RestoreManager:
         console.print(
             f"[cyan]macbac Version:[/cyan] {backup_info.get('macbac_version', 'Unknown')}"  # noqa: E501
         )
+        if backup_info.get("incremental"):
+            console.print(
+                f"[cyan]Incremental Backup Of:[/cyan] {backup_info.get('parent')} "
+                f"({len(self.backup_chain)} backups in chain)"
+            )
         console.print()
 
         # Show available restore categories
         console.print("[bold green]Available restore categories:[/bold green]")
 
-        if self.manifest_data.get("appstore"):
-            app_count = len(self.manifest_data["appstore"])
+        # Counts come from the manifest header, so no section is decoded
+        app_count = self.manifest_data.count("appstore")
+        if app_count:
             console.print(
                 f"  🍎 [cyan]appstore[/cyan] - {app_count} App Store applications"
             )
 
-        if self.manifest_data.get("homebrew", {}).get("brewfile"):
+        if self.manifest_data.count("homebrew"):
             console.print("  🍺 [cyan]homebrew[/cyan] - Homebrew packages and casks")
 
-        if self.manifest_data.get("fonts"):
-            font_count = len(self.manifest_data["fonts"])
+        font_count = self.manifest_data.count("fonts")
+        if font_count:
             console.print(f"  ✍️  [cyan]fonts[/cyan] - {font_count} custom fonts")
 
         console.print()
@@ -77,8 +377,69 @@ class RestoreManager:
             "[yellow]Use 'macbac restore --source <backup_dir> <category>' to restore specific categories.[/yellow]"  # noqa: E501
         )
 
-    def restore_appstore_apps(self) -> None:
-        """Restore App Store applications using mas-cli."""
+    def restore_all(
+        self, categories: Iterable[str] = RESTORE_CATEGORIES
+    ) -> Dict[str, JobResult]:
+        """Restore several categories, overlapping independent ones.
+
+        Fonts are copied while Homebrew packages install, and App Store apps
+        are installed once Homebrew, which may install mas, has finished.
+        Returns the result of each category.
+        """
+        categories = list(categories)
+        console.print(
+            f"[bold green]🚀 Restoring {', '.join(categories)}...[/bold green]"
+        )
+
+        with progress_display() as progress:
+            restores: Dict[str, Callable[[], None]] = {
+                "homebrew": lambda: self.restore_homebrew(progress=progress),
+                "appstore": lambda: self.restore_appstore_apps(progress=progress),
+                "fonts": lambda: self.restore_fonts(progress=progress),
+            }
+            scheduler = Scheduler()
+            for category in categories:
+                dependencies = RESTORE_DEPENDENCIES.get(category, ())
+                scheduler.add(
+                    category,
+                    restores[category],
+                    after=[d for d in dependencies if d in categories],
+                )
+            results = scheduler.run()
+
+        console.print()
+        console.print("[bold blue]📋 Restore Results[/bold blue]")
+        for category, result in results.items():
+            if result.ok:
+                console.print(
+                    f"  [green]✅ {category}[/green] - done in {result.duration:.1f}s"
+                )
+            elif result.status == SKIPPED:
+                console.print(
+                    f"  [yellow]⏭️  {category}[/yellow] - skipped ({result.error})"
+                )
+            else:
+                console.print(
+                    f"  [red]❌ {category}[/red] - failed after "
+                    f"{result.duration:.1f}s: {result.error}"
+                )
+        return results
+
+    def restore_appstore_apps(
+        self,
+        max_workers: int = 3,
+        timeout: Optional[float] = 1800,
+        retries: int = 2,
+        backoff: float = 5.0,
+        progress: Optional[Progress] = None,
+    ) -> None:
+        """Restore App Store applications using mas-cli.
+
+        Up to max_workers apps are installed at the same time. An install
+        that times out or fails with a transient error is retried up to
+        retries times, waiting backoff seconds and doubling that each time.
+        Raises MissingToolError if mas isn't installed.
+        """
         apps = self.manifest_data.get("appstore", [])
 
         if not apps:
@@ -88,49 +449,145 @@ class RestoreManager:
         # Check if mas is installed
         try:
             subprocess.run(["which", "mas"], check=True, capture_output=True)
-        except subprocess.CalledProcessError:
+        except subprocess.CalledProcessError as e:
+            console.print("[yellow]Install mas-cli first with:[/yellow]")
+            console.print("[cyan]brew install mas[/cyan]")
+            raise MissingToolError("mas-cli is not installed") from e
+
+        self.host_state.prefetch(["appstore"], self._fonts_dir())
+        plan = self._plan_category("appstore", self._fonts_dir())
+        if not plan.actions:
             console.print(
-                "[red]❌ mas-cli is not installed. Please install it first:[/red]"
+                f"[green]✅ All {len(apps)} App Store applications are already installed.[/green]"  # noqa: E501
             )
-            console.print("[cyan]brew install mas[/cyan]")
             return
+        skipped_count = len(plan.skipped)
+        apps = plan.actions
 
         console.print(
             f"[bold green]🍎 Restoring {len(apps)} App Store applications...[/bold green]"  # noqa: E501
         )
 
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            console=console,
-        ) as progress:
+        failed: List[str] = []
+        with progress_display(progress) as progress:
             task = progress.add_task("Installing apps...", total=len(apps))
 
-            for app in apps:
-                app_id = app.get("id")
-                app_name = app.get("name", "Unknown")
-
-                progress.update(task, description=f"Installing {app_name}...")
-
-                try:
-                    subprocess.run(
-                        ["mas", "install", app_id],
-                        check=True,
-                        capture_output=True,
-                        text=True,
+            with ThreadPoolExecutor(
+                max_workers=max(1, max_workers), thread_name_prefix="macbac-mas"
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        self._install_app_with_progress,
+                        app,
+                        progress,
+                        timeout,
+                        retries,
+                        backoff,
+                    ): app
+                    for app in apps
+                }
+                for future in as_completed(futures):
+                    app = futures[future]
+                    app_name = app.get("name", "Unknown")
+                    error = future.result()
+                    if error is None:
+                        console.print(f"[green]✅ Installed: {app_name}[/green]")
+                        self._record("appstore", app)
+                    else:
+                        console.print(
+                            f"[red]❌ Failed to install {app_name}: {error}[/red]"
+                        )
+                        failed.append(app_name)
+
+                    progress.advance(task)
+                    done = int(progress.tasks[task].completed)
+                    progress.update(
+                        task, description=f"Installed {done}/{len(apps)} apps..."
                     )
-                    console.print(f"[green]✅ Installed: {app_name}[/green]")
-                except subprocess.CalledProcessError as e:
-                    console.print(f"[red]❌ Failed to install {app_name}: {e}[/red]")
 
-                progress.advance(task)
+        console.print(
+            f"[bold green]🍎 App Store restoration completed! Installed: {len(apps) - len(failed)}, Failed: {len(failed)}, Already installed: {skipped_count}[/bold green]"  # noqa: E501
+        )
+        if failed:
+            console.print(f"[red]Failed apps: {', '.join(sorted(failed))}[/red]")
+
+    def _install_app_with_progress(
+        self,
+        app: Dict[str, Any],
+        progress: Progress,
+        timeout: Optional[float],
+        retries: int,
+        backoff: float,
+    ) -> Optional[str]:
+        """Install an App Store app, showing its download while it runs."""
+        app_name = app.get("name", "Unknown")
+        task = progress.add_task(f"  {app_name}", total=100)
+
+        def on_line(line: str) -> None:
+            step, percent = parse_progress(line)
+            if step is not None:
+                progress.update(task, description=f"  {app_name}: {step}")
+            if percent is not None:
+                progress.update(task, completed=percent)
 
-        console.print("[bold green]🍎 App Store restoration completed![/bold green]")
+        try:
+            return self._install_app(
+                str(app.get("id")), timeout, retries, backoff, on_line
+            )
+        finally:
+            progress.remove_task(task)
+
+    def _install_app(
+        self,
+        app_id: str,
+        timeout: Optional[float],
+        retries: int,
+        backoff: float,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> Optional[str]:
+        """Install one App Store app, returning None or the final error."""
+        for attempt in range(retries + 1):
+            try:
+                result = run_streaming(
+                    ["mas", "install", app_id],
+                    on_line=on_line,
+                    log=self.log,
+                    timeout=timeout,
+                )
+            except subprocess.TimeoutExpired:
+                error = f"timed out after {timeout:g}s"
+                transient = True
+            else:
+                if result.error is None:
+                    return None
+                error = result.error
+                transient = any(
+                    pattern in result.output.lower() for pattern in TRANSIENT_MAS_ERRORS
+                )
 
-    def restore_homebrew(self) -> None:
-        """Restore Homebrew packages using brew bundle."""
+            if not transient or attempt == retries:
+                return error
+            time.sleep(backoff * 2**attempt)
+
+        return None
+
+    def restore_homebrew(
+        self,
+        fetch_workers: int = 4,
+        timeout: Optional[float] = 1800,
+        retries: int = 2,
+        backoff: float = 5.0,
+        progress: Optional[Progress] = None,
+    ) -> None:
+        """Restore Homebrew packages from the backed up Brewfile.
+
+        Only entries that aren't installed yet are restored. Downloads for
+        formulae and casks run up to fetch_workers at a time first; the
+        entries are then installed one by one, taps first. timeout, retries
+        and backoff apply to Mac App Store entries, as for
+        restore_appstore_apps. Raises MissingToolError if brew isn't
+        installed.
+        """
         homebrew_data = self.manifest_data.get("homebrew", {})
         brewfile_content = homebrew_data.get("brewfile")
 
@@ -141,54 +598,156 @@ class RestoreManager:
         # Check if brew is installed
         try:
             subprocess.run(["which", "brew"], check=True, capture_output=True)
-        except subprocess.CalledProcessError:
+        except subprocess.CalledProcessError as e:
+            console.print("[yellow]Install Homebrew first with:[/yellow]")
             console.print(
-                "[red]❌ Homebrew is not installed. Please install it first:[/red]"
+                '[cyan]/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"[/cyan]'
             )
+            raise MissingToolError("Homebrew is not installed") from e
+
+        self.host_state.prefetch(["homebrew"], self._fonts_dir())
+        plan = self._plan_category("homebrew", self._fonts_dir())
+        if not plan.actions:
             console.print(
-                '[cyan]/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"[/cyan]'
+                "[green]✅ All Homebrew packages are already installed.[/green]"
             )
             return
 
-        console.print("[bold green]🍺 Restoring Homebrew packages...[/bold green]")
+        entries = install_order(plan.actions)
+        console.print(
+            f"[bold green]🍺 Restoring {len(entries)} Homebrew packages "
+            f"({len(plan.skipped)} already installed)...[/bold green]"
+        )
 
-        # Create temporary Brewfile
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".Brewfile", delete=False
-        ) as f:
-            f.write(brewfile_content)
-            temp_brewfile = f.name
+        failed: List[str] = []
+        with progress_display(progress) as progress:
+            # Taps are installed before downloading, as formulae may need them
+            taps = [entry for entry in entries if entry.kind == "tap"]
+            others = [entry for entry in entries if entry.kind != "tap"]
+            task = progress.add_task("Installing packages...", total=len(entries))
+            failed += self._install_brew_entries(
+                taps, progress, task, timeout, retries, backoff
+            )
+            self._fetch_brew_entries(others, progress, fetch_workers)
+            failed += self._install_brew_entries(
+                others, progress, task, timeout, retries, backoff
+            )
+        # Later plans, such as the App Store's, must see what was installed
+        self.host_state.forget("homebrew")
 
-        try:
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console,
-            ) as progress:
-                task = progress.add_task("Running brew bundle...", total=None)
-
-                result = subprocess.run(
-                    ["brew", "bundle", "--file", temp_brewfile],
-                    capture_output=True,
-                    text=True,
-                )
+        console.print(
+            f"[bold green]🍺 Homebrew restoration completed! Installed: {len(entries) - len(failed)}, Failed: {len(failed)}, Already installed: {len(plan.skipped)}[/bold green]"  # noqa: E501
+        )
+        if failed:
+            console.print(f"[red]Failed packages: {', '.join(failed)}[/red]")
+
+    def _fetch_brew_entries(
+        self, entries: List[BrewfileEntry], progress: Progress, max_workers: int
+    ) -> None:
+        """Download formulae and casks concurrently, ahead of installing them.
+
+        A failed download is only reported; installing the entry downloads
+        it again and reports the error if it still fails.
+        """
+        commands = [
+            (entry, command)
+            for entry in entries
+            if (command := fetch_command(entry)) is not None
+        ]
+        if not commands:
+            return
 
-                if result.returncode == 0:
+        task = progress.add_task("Downloading packages...", total=len(commands))
+        with ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="macbac-brew-fetch"
+        ) as executor:
+            futures = {
+                executor.submit(self._run_brew, command): entry
+                for entry, command in commands
+            }
+            for future in as_completed(futures):
+                error = future.result()
+                if error is not None:
                     console.print(
-                        "[green]✅ Homebrew restoration completed successfully![/green]"
+                        f"[yellow]⚠️  Failed to download {futures[future].name}: "
+                        f"{error}[/yellow]"
                     )
+                progress.advance(task)
+        progress.remove_task(task)
+
+    def _install_brew_entries(
+        self,
+        entries: List[BrewfileEntry],
+        progress: Progress,
+        task: TaskID,
+        timeout: Optional[float],
+        retries: int,
+        backoff: float,
+    ) -> List[str]:
+        """Install entries in order, returning the names of those that failed."""
+        failed = []
+        for entry in entries:
+            description = f"Installing {entry.kind} {entry.name}"
+            progress.update(task, description=f"{description}...")
+
+            def on_line(line: str, description: str = description) -> None:
+                # Show the step brew is on, such as downloading or pouring
+                step, _ = parse_progress(line)
+                if step is not None:
+                    progress.update(task, description=f"{description}: {step}")
+
+            if entry.kind == "mas" and entry.mas_id:
+                error = self._install_app(
+                    entry.mas_id, timeout, retries, backoff, on_line
+                )
+            else:
+                command = install_command(entry)
+                if command is None:
+                    error = self._bundle_entry(entry, on_line)
                 else:
-                    console.print("[red]❌ Homebrew restoration failed:[/red]")
-                    console.print(result.stderr)
-
-                progress.update(task, description="✅ Homebrew restoration completed")
+                    error = self._run_brew(command, on_line)
+
+            if error is None:
+                console.print(f"[green]✅ Installed: {entry.line}[/green]")
+                self._record("homebrew", entry)
+            else:
+                console.print(f"[red]❌ Failed to install {entry.line}: {error}[/red]")
+                failed.append(entry.name)
+            progress.advance(task)
+        return failed
+
+    def _bundle_entry(
+        self, entry: BrewfileEntry, on_line: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """Install an entry through a one-line Brewfile, keeping its options."""
+        with tempfile.NamedTemporaryFile(
+            mode="w", suffix=".Brewfile", delete=False
+        ) as f:
+            f.write(render_brewfile([entry]))
+            temp_brewfile = f.name
 
+        try:
+            return self._run_brew(["brew", "bundle", "--file", temp_brewfile], on_line)
         finally:
             # Clean up temporary file
             Path(temp_brewfile).unlink(missing_ok=True)
 
-    def restore_fonts(self) -> None:
-        """Restore custom fonts to ~/Library/Fonts."""
+    def _run_brew(
+        self, command: List[str], on_line: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """Run a brew command, returning None or the last line of its output."""
+        return run_streaming(command, on_line=on_line, log=self.log).error
+
+    def restore_fonts(
+        self, max_workers: int = 8, progress: Optional[Progress] = None
+    ) -> None:
+        """Restore custom fonts to ~/Library/Fonts.
+
+        Fonts that are missing, or whose installed copy differs from the
+        backup, are copied up to max_workers at a time. Each is written to a
+        temporary file, checked against its recorded digest and renamed into
+        place, so an interrupted restore never leaves a truncated font.
+        """
         fonts = self.manifest_data.get("fonts", [])
 
         if not fonts:
@@ -196,55 +755,114 @@ class RestoreManager:
             return
 
         fonts_backup_dir = self.backup_dir / "fonts"
-        if not fonts_backup_dir.exists():
+        if self.archive is None and not fonts_backup_dir.exists():
             console.print("[red]❌ Fonts backup directory not found.[/red]")
             return
 
         # Ensure target directory exists
-        target_dir = Path("~/Library/Fonts").expanduser()
+        target_dir = self._fonts_dir()
         target_dir.mkdir(parents=True, exist_ok=True)
 
+        font_hashes = self._font_hashes()
+        plan = plan_fonts(
+            fonts,
+            font_hashes,
+            target_dir,
+            self.host_state,
+            self._has_font,
+            self._font_size,
+        )
+
         console.print(
             f"[bold green]✍️ Restoring {len(fonts)} custom fonts...[/bold green]"
         )
 
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            console=console,
-        ) as progress:
+        copied_count = 0
+        replaced_count = 0
+        skipped_count = 0
+        failed_count = 0
+        copied_bytes = 0
+        with progress_display(progress) as progress:
             task = progress.add_task("Copying fonts...", total=len(fonts))
 
-            copied_count = 0
-            skipped_count = 0
-
-            for font_name in fonts:
-                progress.update(task, description=f"Copying {font_name}...")
-
-                source_path = fonts_backup_dir / font_name
-                target_path = target_dir / font_name
-
-                if not source_path.exists():
+            for font_name, reason in plan.skipped:
+                if reason == "not found in backup":
                     console.print(f"[red]❌ Font file not found: {font_name}[/red]")
                     continue
+                console.print(f"[yellow]⚠️  Skipped ({reason}): {font_name}[/yellow]")
+                skipped_count += 1
+                progress.advance(task)
 
-                if target_path.exists():
-                    console.print(
-                        f"[yellow]⚠️  Skipped (already exists): {font_name}[/yellow]"
-                    )
-                    skipped_count += 1
-                else:
+            # Members of a tar archive are read from a single stream
+            workers = max(1, max_workers) if self.archive is None else 1
+            started = time.monotonic()
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="macbac-font-restore"
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        self._restore_font,
+                        font_name,
+                        target_dir,
+                        font_hashes.get(font_name),
+                    ): font_name
+                    for font_name in plan.actions
+                }
+                for future in as_completed(futures):
+                    font_name = futures[future]
                     try:
-                        shutil.copy2(source_path, target_path)
-                        console.print(f"[green]✅ Copied: {font_name}[/green]")
-                        copied_count += 1
+                        copied_bytes += future.result()
                     except Exception as e:
                         console.print(f"[red]❌ Failed to copy {font_name}: {e}[/red]")
-
-                progress.advance(task)
+                        failed_count += 1
+                    else:
+                        if font_name in plan.replacing:
+                            console.print(f"[green]✅ Replaced: {font_name}[/green]")
+                            replaced_count += 1
+                        else:
+                            console.print(f"[green]✅ Copied: {font_name}[/green]")
+                            copied_count += 1
+
+                    progress.advance(task)
+                    elapsed = max(time.monotonic() - started, 1e-6)
+                    rate = copied_bytes / elapsed / (1024 * 1024)
+                    progress.update(
+                        task, description=f"Copying fonts... {rate:.1f} MB/s"
+                    )
+            elapsed = time.monotonic() - started
 
         console.print(
-            f"[bold green]✍️ Font restoration completed! Copied: {copied_count}, Skipped: {skipped_count}[/bold green]"  # noqa: E501
+            f"[bold green]✍️ Font restoration completed! Copied: {copied_count}, Replaced: {replaced_count}, Skipped: {skipped_count}, Failed: {failed_count}[/bold green]"  # noqa: E501
         )
+        if copied_bytes:
+            rate = copied_bytes / max(elapsed, 1e-6) / (1024 * 1024)
+            console.print(
+                f"[cyan]Copied {copied_bytes / (1024 * 1024):.1f} MB in "
+                f"{elapsed:.1f}s ({rate:.1f} MB/s)[/cyan]"
+            )
+
+    def _restore_font(
+        self, font_name: str, target_dir: Path, digest: Optional[str]
+    ) -> int:
+        """Install a font atomically, returning the number of bytes copied.
+
+        Font names come from the manifest, so one that resolves outside
+        target_dir is refused.
+        """
+        check_member_name(font_name)
+        target_path = target_dir / font_name
+        if not target_path.resolve().is_relative_to(target_dir.resolve()):
+            raise ValueError(f"Unsafe path in backup: {font_name}")
+        # Fonts from subdirectories keep their relative path
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        # Hidden, so neither macOS nor a later plan takes it for a font
+        temp_path = target_path.with_name(f".{target_path.name}.macbac-tmp")
+        try:
+            size = self._copy_font(font_name, temp_path)
+            if digest is not None and hash_file(temp_path) != digest:
+                raise ValueError("content doesn't match the backup's checksum")
+            os.replace(temp_path, target_path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return size
@@ -0,0 +1,269 @@
+"""Planning restores against what is already installed on this machine.
+
+The current state of the machine is gathered once and compared with the
+backup, so a restore only does the work that is left, e.g. after an earlier
+restore failed halfway.
+"""
+
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .brewfile import BrewfileEntry, parse_brewfile
+from .cache import PersistentCache, file_fingerprint
+from .object_store import hash_file
+
+# Restore categories in the order they are restored
+RESTORE_CATEGORIES = ("homebrew", "appstore", "fonts")
+
+# Categories that must be restored before others, e.g. Homebrew installs mas,
+# which App Store apps are installed with
+RESTORE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {"appstore": ("homebrew",)}
+
+# Seconds to wait for a command listing installed software
+LIST_TIMEOUT = 120
+
+# Installed fonts whose digests are cached between restores
+FONT_CACHE_ENTRIES = 20000
+
+
+class HostState:
+    """What is installed on this machine, gathered on first use.
+
+    Each kind of fact is gathered at most once, so planning several
+    categories, or planning and then restoring, doesn't list the same
+    software twice.
+    """
+
+    def __init__(
+        self, font_cache_path: Optional[Path] = None, max_workers: int = 8
+    ) -> None:
+        # Digests of installed fonts are cached in this file, which is only
+        # opened once fonts are hashed
+        self.font_cache_path = font_cache_path
+        self.font_cache: Optional[PersistentCache] = None
+        self.max_workers = max_workers
+        self._facts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._facts:
+                return self._facts[key]
+        value = loader()
+        with self._lock:
+            return self._facts.setdefault(key, value)
+
+    def forget(self, category: str) -> None:
+        """Drop the facts about a category, after restoring it changed them."""
+        keys = {
+            "appstore": ("mas",),
+            "homebrew": ("formulae", "casks", "taps", "mas"),
+        }.get(category, ())
+        with self._lock:
+            for key in list(self._facts):
+                if key in keys or (category == "fonts" and key.startswith("fonts:")):
+                    del self._facts[key]
+
+    def app_store_ids(self) -> Set[str]:
+        """Return the IDs of installed App Store apps, as listed by mas."""
+        return set(self._get("mas", self._list_app_store_ids))
+
+    def formulae(self) -> Set[str]:
+        """Return the short names of installed Homebrew formulae."""
+        return set(self._get("formulae", lambda: self._list(["--formula"])))
+
+    def casks(self) -> Set[str]:
+        """Return the names of installed Homebrew casks."""
+        return set(self._get("casks", lambda: self._list(["--cask"])))
+
+    def taps(self) -> Set[str]:
+        """Return the names of tapped Homebrew repositories."""
+        return set(self._get("taps", lambda: _command_lines(["brew", "tap"])))
+
+    def installed_fonts(self, font_dir: Path) -> Dict[str, str]:
+        """Return the digest of each font in font_dir, by its relative path."""
+        return dict(self._get(f"fonts:{font_dir}", lambda: self._hash_fonts(font_dir)))
+
+    def font_hashes(self, font_dir: Path) -> Set[str]:
+        """Return the content digests of the fonts installed in font_dir."""
+        return set(self.installed_fonts(font_dir).values())
+
+    def prefetch(self, categories: Iterable[str], font_dir: Path) -> None:
+        """Gather the facts needed to plan categories, concurrently."""
+        loaders: List[Callable[[], Any]] = []
+        for category in categories:
+            if category == "appstore":
+                loaders.append(self.app_store_ids)
+            elif category == "homebrew":
+                loaders += [self.formulae, self.casks, self.taps, self.app_store_ids]
+            elif category == "fonts":
+                loaders.append(lambda: self.installed_fonts(font_dir))
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(loaders)), thread_name_prefix="macbac-state"
+        ) as executor:
+            for future in [executor.submit(loader) for loader in loaders]:
+                future.result()
+
+    def _list_app_store_ids(self) -> Set[str]:
+        # Lines look like "497799835  Xcode  (15.0)"
+        ids = set()
+        for line in _command_lines(["mas", "list"]):
+            app_id = line.split(maxsplit=1)[0]
+            if app_id.isdigit():
+                ids.add(app_id)
+        return ids
+
+    def _list(self, kind: List[str]) -> Set[str]:
+        return _command_lines(["brew", "list", *kind, "-1"])
+
+    def _hash_fonts(self, font_dir: Path) -> Dict[str, str]:
+        """Hash every file under font_dir, reusing digests of unchanged files."""
+        with self._lock:
+            if self.font_cache is None and self.font_cache_path is not None:
+                self.font_cache = PersistentCache(
+                    self.font_cache_path, max_entries=FONT_CACHE_ENTRIES
+                )
+        paths = [
+            Path(root) / name
+            for root, _, names in os.walk(font_dir)
+            for name in names
+            if not name.startswith(".")
+        ]
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="macbac-font-hash"
+        ) as executor:
+            digests = {
+                path.relative_to(font_dir).as_posix(): digest
+                for path, digest in zip(paths, executor.map(self._font_digest, paths))
+                if digest is not None
+            }
+        if self.font_cache is not None:
+            self.font_cache.save()
+        return digests
+
+    def _font_digest(self, path: Path) -> Optional[str]:
+        fingerprint = file_fingerprint(str(path))
+        if fingerprint is None:
+            return None
+        if self.font_cache is not None:
+            cached = self.font_cache.get(str(path), fingerprint)
+            if isinstance(cached, str):
+                return cached
+        try:
+            digest = hash_file(path)
+        except OSError:
+            return None
+        if self.font_cache is not None:
+            self.font_cache.put(str(path), fingerprint, digest)
+        return digest
+
+
+def _command_lines(command: List[str]) -> Set[str]:
+    """Return the non-empty output lines of a command, or nothing if it fails."""
+    try:
+        result = subprocess.run(
+            command, capture_output=True, text=True, check=True, timeout=LIST_TIMEOUT
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return set()
+    return {line.strip() for line in str(result.stdout).splitlines() if line.strip()}
+
+
+class CategoryPlan:
+    """The actions restoring one category takes, and what it leaves alone.
+
+    skipped holds (item, reason) pairs, and replacing the actions that
+    overwrite something already there. work_bytes estimates the data the
+    actions copy, where that is known.
+    """
+
+    def __init__(self, category: str) -> None:
+        self.category = category
+        self.actions: List[Any] = []
+        self.skipped: List[Tuple[Any, str]] = []
+        self.replacing: List[Any] = []
+        self.work_bytes = 0
+
+    def skip(self, item: Any, reason: str) -> None:
+        self.skipped.append((item, reason))
+
+
+def plan_appstore(apps: List[Dict[str, Any]], state: HostState) -> CategoryPlan:
+    """Plan installing the App Store apps that aren't installed yet."""
+    plan = CategoryPlan("appstore")
+    installed = state.app_store_ids()
+    for app in apps:
+        if str(app.get("id")) in installed:
+            plan.skip(app, "already installed")
+        else:
+            plan.actions.append(app)
+    return plan
+
+
+def plan_homebrew(brewfile: str, state: HostState) -> CategoryPlan:
+    """Plan installing the Brewfile entries that aren't installed yet.
+
+    Entries whose state can't be checked, such as VS Code extensions, are
+    always planned; brew bundle skips them if they are installed.
+    """
+    plan = CategoryPlan("homebrew")
+    for entry in parse_brewfile(brewfile):
+        if _is_installed(entry, state):
+            plan.skip(entry, "already installed")
+        else:
+            plan.actions.append(entry)
+    return plan
+
+
+def _is_installed(entry: BrewfileEntry, state: HostState) -> bool:
+    if entry.kind == "tap":
+        return entry.name in state.taps()
+    if entry.kind == "brew":
+        return entry.short_name in state.formulae()
+    if entry.kind == "cask":
+        return entry.short_name in state.casks()
+    if entry.kind == "mas":
+        return entry.mas_id in state.app_store_ids()
+    return False
+
+
+def plan_fonts(
+    fonts: List[str],
+    font_hashes: Dict[str, str],
+    target_dir: Path,
+    state: HostState,
+    has_font: Callable[[str], bool],
+    font_size: Callable[[str], int],
+) -> CategoryPlan:
+    """Plan copying the fonts that aren't installed yet.
+
+    Fonts are compared by content: one is installed if a file with its
+    digest is at its path, or anywhere in target_dir if its path is free. A
+    file at its path with other content is replaced. Fonts without a
+    recorded digest, from older backups, are only compared by name.
+    """
+    plan = CategoryPlan("fonts")
+    installed = state.installed_fonts(target_dir) if font_hashes else {}
+    installed_digests = set(installed.values())
+    for font_name in fonts:
+        digest = font_hashes.get(font_name)
+        exists = font_name in installed or (target_dir / font_name).exists()
+        if not has_font(font_name):
+            plan.skip(font_name, "not found in backup")
+        elif digest is None and exists:
+            plan.skip(font_name, "already exists")
+        elif digest is not None and installed.get(font_name) == digest:
+            plan.skip(font_name, "already installed")
+        elif digest is not None and not exists and digest in installed_digests:
+            plan.skip(font_name, "already installed")
+        else:
+            plan.actions.append(font_name)
+            plan.work_bytes += font_size(font_name)
+            if exists:
+                plan.replacing.append(font_name)
+    return plan
@@ -1,7 +1,12 @@
 """Scanner for development environment tools."""
 
+import os
 import subprocess
-from typing import Any, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..cache import PersistentCache, file_fingerprint
 
 
 class DevEnvScanner:
@@ -65,18 +70,43 @@ class DevEnvScanner:
         {"name": "az", "command": "az version", "description": "Azure CLI"},
     ]
 
+    # Directories of launcher stubs that run whichever toolchain is selected,
+    # such as macOS's xcrun and JavaVM stubs in /usr/bin
+    STUB_DIRS = ["/usr/bin"]
+    # Version managers (pyenv, rbenv, asdf, mise) put shims on PATH
+    SHIM_DIR_NAME = "shims"
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        probe_timeout: float = 5,
+        deadline: float = 10,
+        cache: Optional[PersistentCache] = None,
+    ) -> None:
+        # At most max_workers version commands run at once, each one is killed
+        # after probe_timeout seconds and the whole scan gives up on tools it
+        # has not finished probing once deadline seconds have passed.
+        self.max_workers = max_workers
+        self.probe_timeout = probe_timeout
+        self.deadline = deadline
+        # Version output of unchanged binaries is reused from this cache
+        self.cache = cache
+
     def scan(self) -> Dict[str, Any]:
         """Scan for installed development tools."""
         installed_tools = []
         missing_tools = []
 
-        for tool in self.DEV_TOOLS:
-            tool_info = self._check_tool_installed(tool)
+        path_index = self._build_path_index()
+        for tool_info in self._probe_tools(self.DEV_TOOLS, path_index):
             if tool_info["installed"]:
                 installed_tools.append(tool_info)
             else:
                 missing_tools.append(tool_info)
 
+        if self.cache is not None:
+            self.cache.save()
+
         return {
             "installed_tools": installed_tools,
             "missing_tools": missing_tools,
@@ -85,38 +115,183 @@ class DevEnvScanner:
             "total_count": len(self.DEV_TOOLS),
         }
 
-    def _check_tool_installed(self, tool: Dict[str, str]) -> Dict[str, Any]:
+    def _build_path_index(self) -> Dict[str, str]:
+        """Map every file name found on PATH to its first absolute path.
+
+        Each PATH entry is listed exactly once, so looking up a tool afterwards
+        costs nothing and tools that are not installed never reach fork/exec.
+        """
+        index: Dict[str, str] = {}
+        seen_dirs = set()
+
+        for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+            # An empty entry means the current directory, which is not where
+            # installed toolchains live
+            if not directory or directory in seen_dirs:
+                continue
+            seen_dirs.add(directory)
+
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        # Earlier PATH entries win, just like the shell
+                        index.setdefault(entry.name, os.path.abspath(entry.path))
+            except OSError:
+                # Skip PATH entries that don't exist or can't be listed
+                continue
+
+        return index
+
+    def _resolve_binary(self, name: str, path_index: Dict[str, str]) -> Optional[str]:
+        """Resolve an executable name against the PATH index."""
+        binary_path = path_index.get(name)
+        if binary_path is None:
+            return None
+
+        if os.path.isfile(binary_path) and os.access(binary_path, os.X_OK):
+            return binary_path
+
+        return None
+
+    def _probe_tools(
+        self, tools: List[Dict[str, str]], path_index: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """Probe tools concurrently, returning results in the order given."""
+        results: List[Optional[Dict[str, Any]]] = []
+        pending = []
+
+        # Tools whose binary is not on PATH are missing without spawning, and
+        # tools whose binary hasn't changed since the last probe are cached
+        for tool in tools:
+            binary_path = self._resolve_binary(tool["command"].split()[0], path_index)
+            if binary_path is None:
+                results.append(self._tool_result(tool, installed=False))
+                continue
+
+            version_info = self._cached_version(tool, binary_path)
+            if version_info is not None:
+                cached = self._tool_result(
+                    tool, installed=True, version_info=version_info, path=binary_path
+                )
+                results.append(cached)
+            else:
+                results.append(None)
+                pending.append((len(results) - 1, tool, binary_path))
+
+        if not pending:
+            return [result for result in results if result is not None]
+
+        deadline = time.monotonic() + self.deadline
+
+        def probe(item: Tuple[int, Dict[str, str], str]) -> None:
+            position, tool, binary_path = item
+            # Probes that only get a worker late are given what is left of the
+            # overall budget, so the scan never outlives the deadline.
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                results[position] = self._tool_result(tool, installed=False)
+            else:
+                results[position] = self._check_tool_installed(
+                    tool, binary_path, timeout=min(self.probe_timeout, remaining)
+                )
+
+        workers = max(1, min(self.max_workers, len(pending)))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="macbac-devenv"
+        ) as executor:
+            list(executor.map(probe, pending))
+
+        return [result for result in results if result is not None]
+
+    def _check_tool_installed(
+        self,
+        tool: Dict[str, str],
+        binary_path: str,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
         """Check if a development tool is installed."""
+        if timeout is None:
+            timeout = self.probe_timeout
+
+        # Run the resolved binary directly so exec doesn't search PATH again
+        command = [binary_path] + tool["command"].split()[1:]
+
         try:
             result = subprocess.run(
-                tool["command"].split(), capture_output=True, text=True, timeout=5
+                command, capture_output=True, text=True, timeout=timeout
             )
 
             if result.returncode == 0:
                 # Extract version info from output
                 version_output = result.stdout.strip() or result.stderr.strip()
-                return {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "installed": True,
-                    "version_info": version_output.split("\n")[0],  # First line only
-                }
+                version_info = version_output.split("\n")[0]  # First line only
+                self._store_version(tool, binary_path, version_info)
+                return self._tool_result(
+                    tool, installed=True, version_info=version_info, path=binary_path
+                )
             else:
-                return {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "installed": False,
-                    "version_info": None,
-                }
+                return self._tool_result(tool, installed=False)
 
         except (
             subprocess.CalledProcessError,
             subprocess.TimeoutExpired,
             FileNotFoundError,
         ):
-            return {
-                "name": tool["name"],
-                "description": tool["description"],
-                "installed": False,
-                "version_info": None,
-            }
+            return self._tool_result(tool, installed=False)
+
+    def _cache_key(self, tool: Dict[str, str], binary_path: str) -> Tuple[str, str]:
+        """Return the cache key and the real path of a tool's binary."""
+        real_path = os.path.realpath(binary_path)
+        # Symlinks such as Homebrew's bin/ entries are resolved, so an upgrade
+        # that repoints them into a new Cellar directory changes the key.
+        args = " ".join(tool["command"].split()[1:])
+        return f"{real_path} {args}", real_path
+
+    def _is_launcher(self, binary_path: str) -> bool:
+        """Check whether a binary is a stub or shim for another toolchain.
+
+        Upgrading the toolchain behind a launcher doesn't change the launcher
+        itself, so its version can't be cached by the launcher's identity.
+        """
+        for path in (binary_path, os.path.realpath(binary_path)):
+            directory = os.path.dirname(path)
+            if directory in self.STUB_DIRS:
+                return True
+            if self.SHIM_DIR_NAME in directory.split(os.sep):
+                return True
+        return False
+
+    def _cached_version(self, tool: Dict[str, str], binary_path: str) -> Optional[str]:
+        """Return the cached version info of a tool if its binary is unchanged."""
+        if self.cache is None or self._is_launcher(binary_path):
+            return None
+
+        key, real_path = self._cache_key(tool, binary_path)
+        version_info = self.cache.get(key, file_fingerprint(real_path))
+        return version_info if isinstance(version_info, str) else None
+
+    def _store_version(
+        self, tool: Dict[str, str], binary_path: str, version_info: str
+    ) -> None:
+        """Remember the version info of a tool keyed by its binary identity."""
+        if self.cache is None or self._is_launcher(binary_path):
+            return
+
+        key, real_path = self._cache_key(tool, binary_path)
+        self.cache.put(key, file_fingerprint(real_path), version_info)
+
+    def _tool_result(
+        self,
+        tool: Dict[str, str],
+        installed: bool,
+        version_info: Optional[str] = None,
+        path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build the result entry for a probed tool."""
+        return {
+            "name": tool["name"],
+            "description": tool["description"],
+            "installed": installed,
+            "version_info": version_info,
+            "path": path,
+        }
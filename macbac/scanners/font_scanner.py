@@ -1,7 +1,8 @@
 """Scanner for custom fonts."""
 
+import os
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 
 class FontScanner:
@@ -24,27 +25,30 @@ class FontScanner:
         ".snf": "Server Normal Format",
     }
 
+    def __init__(self, font_dirs: Optional[List[Path]] = None) -> None:
+        # User fonts directory by default
+        if font_dirs is None:
+            font_dirs = [Path("~/Library/Fonts").expanduser()]
+        self.font_dirs = font_dirs
+
     def scan(self) -> Dict[str, Any]:
         """Scan for custom fonts in user font directories."""
         font_files = []
         total_size = 0
+        fonts_by_type: Dict[str, List[Dict[str, Any]]] = {}
+        scanned_directories = []
 
-        # Scan user fonts directory
-        user_fonts_dir = Path("~/Library/Fonts").expanduser()
-        if user_fonts_dir.exists():
-            font_files.extend(self._scan_directory(user_fonts_dir))
-
-        # Calculate total size
-        for font in font_files:
-            total_size += font["size_bytes"]
+        for font_dir in self.font_dirs:
+            if not font_dir.exists():
+                scanned_directories.append(f"{font_dir} (not found)")
+                continue
+            scanned_directories.append(str(font_dir))
 
-        # Group fonts by type
-        fonts_by_type: Dict[str, List[Dict[str, Any]]] = {}
-        for font in font_files:
-            font_type = font["type"]
-            if font_type not in fonts_by_type:
-                fonts_by_type[font_type] = []
-            fonts_by_type[font_type].append(font)
+            # Calculate total size and group fonts by type as they are found
+            for font in self._scan_directory(font_dir):
+                font_files.append(font)
+                total_size += font["size_bytes"]
+                fonts_by_type.setdefault(font["type"], []).append(font)
 
         return {
             "font_files": font_files,
@@ -52,39 +56,60 @@ class FontScanner:
             "total_size_bytes": total_size,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
             "fonts_by_type": fonts_by_type,
-            "scanned_directories": [
-                str(user_fonts_dir)
-                if user_fonts_dir.exists()
-                else f"{user_fonts_dir} (not found)"
-            ],
+            "scanned_directories": scanned_directories,
         }
 
-    def _scan_directory(self, directory: Path) -> List[Dict[str, Any]]:
-        """Scan a directory for font files."""
-        fonts = []
+    def _scan_directory(self, directory: Path) -> Iterator[Dict[str, Any]]:
+        """Recursively yield the font files below a directory.
 
-        try:
-            for file_path in directory.rglob("*"):
-                if file_path.is_file():
-                    extension = file_path.suffix.lower()
-                    if extension in self.FONT_EXTENSIONS:
+        The walk uses os.scandir so file types come from the directory listing,
+        entries are filtered by extension before anything else is done with
+        them, and only font files are stat'ed.
+        """
+        # (absolute path, path relative to the scanned directory) pairs
+        pending = [(str(directory), "")]
+
+        while pending:
+            current, relative_dir = pending.pop()
+            subdirectories = []
+
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
                         try:
-                            file_size = file_path.stat().st_size
-                            fonts.append(
-                                {
-                                    "name": file_path.name,
-                                    "path": str(file_path),
-                                    "extension": extension,
-                                    "type": self.FONT_EXTENSIONS[extension],
-                                    "size_bytes": file_size,
-                                    "size_kb": round(file_size / 1024, 2),
-                                }
-                            )
+                            # Like Path.rglob, don't descend into symlinked dirs
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirectories.append(
+                                    (entry.path, relative_dir + entry.name + "/")
+                                )
+                                continue
+                        except OSError:
+                            continue
+
+                        extension = os.path.splitext(entry.name)[1].lower()
+                        if extension not in self.FONT_EXTENSIONS:
+                            continue
+
+                        try:
+                            if not entry.is_file():
+                                continue
+                            file_size = entry.stat().st_size
                         except OSError:
                             # Skip files that can't be accessed
                             continue
-        except PermissionError:
-            # Skip directories that can't be accessed
-            pass
 
-        return fonts
+                        yield {
+                            "name": entry.name,
+                            "path": entry.path,
+                            "relative_path": relative_dir + entry.name,
+                            "extension": extension,
+                            "type": self.FONT_EXTENSIONS[extension],
+                            "size_bytes": file_size,
+                            "size_kb": round(file_size / 1024, 2),
+                        }
+            except OSError:
+                # Skip directories that can't be accessed
+                continue
+
+            # Visit subdirectories in listing order
+            pending.extend(reversed(subdirectories))
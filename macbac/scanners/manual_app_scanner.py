@@ -1,150 +1,297 @@
 """Scanner for manually installed applications."""
 
+import multiprocessing
+import os
 import plistlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..cache import PersistentCache, file_fingerprint
+from .plist_reader import read_plist_keys
 
 
 class ManualAppScanner:
     """Scans for manually installed applications (non-App Store, non-Homebrew)."""
 
+    # Symlink targets and bundle identifier fragments that mark Homebrew casks
+    HOMEBREW_PREFIXES = ["/opt/homebrew/", "/usr/local/"]
+    HOMEBREW_BUNDLE_ID_INDICATORS = ["org.homebrew.", "homebrew."]
+
+    # The only Info.plist keys the scanner looks at
+    INFO_PLIST_KEYS = [
+        "CFBundleName",
+        "CFBundleIdentifier",
+        "CFBundleShortVersionString",
+        "CFBundleDisplayName",
+        "com.apple.security.app-sandbox",
+    ]
+
+    def __init__(
+        self,
+        app_dirs: Optional[List[Path]] = None,
+        cache: Optional[PersistentCache] = None,
+        parallel: bool = True,
+        parallel_threshold: int = 500,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 64,
+    ) -> None:
+        # System and user Applications directories by default
+        if app_dirs is None:
+            app_dirs = [Path("/Applications"), Path("~/Applications").expanduser()]
+        self.app_dirs = app_dirs
+        # Bundle records keyed by path, valid while their Info.plist is unchanged
+        self.cache = cache
+        # Bundles that need parsing are sharded across a process pool in chunks
+        # of chunk_size once there are at least parallel_threshold of them
+        self.parallel = parallel
+        self.parallel_threshold = parallel_threshold
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
     def scan(self) -> Dict[str, Any]:
         """Scan for manually installed applications."""
-        apps = []
+        entries: List[Tuple[Path, bool]] = []
+        scanned_directories = []
+
+        for apps_dir in self.app_dirs:
+            if apps_dir.exists():
+                entries.extend(self._scan_applications_directory(apps_dir))
+                scanned_directories.append(str(apps_dir))
+            else:
+                scanned_directories.append(f"{apps_dir} (not found)")
 
-        # Scan system Applications directory
-        system_apps_dir = Path("/Applications")
-        if system_apps_dir.exists():
-            apps.extend(self._scan_applications_directory(system_apps_dir))
+        bundles = self._load_bundles(entries)
 
-        # Scan user Applications directory
-        user_apps_dir = Path("~/Applications").expanduser()
-        if user_apps_dir.exists():
-            apps.extend(self._scan_applications_directory(user_apps_dir))
+        if self.cache is not None:
+            self._prune_cache(bundles)
+            self.cache.save()
 
         # Filter out App Store apps and Homebrew casks
         manual_apps = []
-        for app in apps:
-            if not self._is_app_store_app(app["path"]) and not self._is_homebrew_app(
-                app
-            ):
-                manual_apps.append(app)
+        for bundle in bundles:
+            if not self._is_app_store_app(bundle) and not self._is_homebrew_app(bundle):
+                manual_apps.append(bundle["app_info"])
 
         return {
             "apps": manual_apps,
             "total_count": len(manual_apps),
-            "all_apps_count": len(apps),
-            "scanned_directories": [
-                (
-                    str(system_apps_dir)
-                    if system_apps_dir.exists()
-                    else f"{system_apps_dir} (not found)"
-                ),
-                (
-                    str(user_apps_dir)
-                    if user_apps_dir.exists()
-                    else f"{user_apps_dir} (not found)"
-                ),
-            ],
+            "all_apps_count": len(bundles),
+            "scanned_directories": scanned_directories,
         }
 
-    def _scan_applications_directory(self, directory: Path) -> List[Dict[str, Any]]:
-        """Scan an Applications directory for .app bundles."""
-        apps = []
+    def _scan_applications_directory(self, directory: Path) -> List[Tuple[Path, bool]]:
+        """List the .app bundles of an Applications directory in path order.
+
+        Returns (bundle path, is symlink) pairs taken from the directory listing.
+        """
+        bundles = []
 
         try:
-            for app_path in directory.glob("*.app"):
-                if app_path.is_dir():
-                    app_info = self._get_app_info(app_path)
-                    if app_info:
-                        apps.append(app_info)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".app"):
+                        continue
+                    try:
+                        if not entry.is_dir():
+                            continue
+                        is_symlink = entry.is_symlink()
+                    except OSError:
+                        continue
+
+                    bundles.append((Path(entry.path), is_symlink))
         except PermissionError:
             # Skip directories that can't be accessed
             pass
 
-        return apps
+        return sorted(bundles)
 
-    def _get_app_info(self, app_path: Path) -> Optional[Dict[str, Any]]:
-        """Extract information from an application bundle."""
-        try:
-            # Read Info.plist
+    def _load_bundles(self, entries: List[Tuple[Path, bool]]) -> List[Dict[str, Any]]:
+        """Return bundle records, from the cache when their Info.plist is unchanged.
+
+        An unchanged bundle costs a single stat of its Info.plist, and only the
+        remaining bundles are inspected.
+        """
+        records: List[Optional[Dict[str, Any]]] = []
+        misses: List[Tuple[int, Path, bool, List[int]]] = []
+
+        for app_path, is_symlink in entries:
             info_plist_path = app_path / "Contents" / "Info.plist"
-            if not info_plist_path.exists():
-                return None
-
-            with open(info_plist_path, "rb") as f:
-                plist_data = plistlib.load(f)
-
-            # Extract basic information
-            bundle_name = plist_data.get("CFBundleName", app_path.stem)
-            bundle_id = plist_data.get("CFBundleIdentifier", "unknown")
-            version = plist_data.get("CFBundleShortVersionString", "unknown")
-
-            return {
-                "name": bundle_name,
-                "path": str(app_path),
-                "bundle_id": bundle_id,
-                "version": version,
-                "display_name": plist_data.get("CFBundleDisplayName", bundle_name),
-            }
-
-        except (OSError, plistlib.InvalidFileException, KeyError):
-            # Return basic info if plist can't be read
-            return {
-                "name": app_path.stem,
-                "path": str(app_path),
-                "bundle_id": "unknown",
-                "version": "unknown",
-                "display_name": app_path.stem,
-            }
-
-    def _is_app_store_app(self, app_path: str) -> bool:
-        """Check if an app was installed from the App Store."""
-        app_path_obj = Path(app_path)
+            fingerprint = file_fingerprint(str(info_plist_path))
+            if fingerprint is None:
+                # No readable Info.plist, not an application bundle we report
+                records.append(None)
+                continue
 
-        # Check for App Store receipt
-        receipt_path = app_path_obj / "Contents" / "_MASReceipt" / "receipt"
-        if receipt_path.exists():
-            return True
+            bundle = None
+            if self.cache is not None:
+                bundle = self.cache.get(str(app_path), fingerprint)
+            if isinstance(bundle, dict):
+                records.append(bundle)
+            else:
+                records.append(None)
+                misses.append((len(records) - 1, app_path, is_symlink, fingerprint))
 
-        # Check for sandboxed apps (usually from App Store)
-        info_plist_path = app_path_obj / "Contents" / "Info.plist"
-        if info_plist_path.exists():
-            try:
-                with open(info_plist_path, "rb") as f:
-                    plist_data = plistlib.load(f)
+        inspected = self._inspect_bundles(
+            [(app_path, is_symlink) for _, app_path, is_symlink, _ in misses]
+        )
+        for (position, app_path, _, fingerprint), bundle in zip(misses, inspected):
+            records[position] = bundle
+            if bundle is not None and self.cache is not None:
+                self.cache.put(str(app_path), fingerprint, bundle)
 
-                # Check for sandbox entitlements
-                if plist_data.get("com.apple.security.app-sandbox"):
-                    return True
+        return [bundle for bundle in records if bundle is not None]
 
-            except (OSError, plistlib.InvalidFileException):
+    def _inspect_bundles(
+        self, entries: List[Tuple[Path, bool]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Inspect bundles, in a process pool when there are enough of them."""
+        if self.parallel and len(entries) >= self.parallel_threshold:
+            try:
+                return self._inspect_bundles_parallel(entries)
+            except (OSError, BrokenProcessPool):
+                # Process pools can be unavailable (sandboxes, resource
+                # limits); the serial path gives the same answer
                 pass
 
-        return False
+        return [
+            self._inspect_bundle(app_path, is_symlink)
+            for app_path, is_symlink in entries
+        ]
 
-    def _is_homebrew_app(self, app_info: Dict[str, Any]) -> bool:
-        """Check if an app was installed via Homebrew Cask."""
-        app_path = Path(app_info["path"])
+    def _inspect_bundles_parallel(
+        self, entries: List[Tuple[Path, bool]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Inspect bundles across a process pool, keeping the input order."""
+        # Plain strings pickle cheaply, and submitting whole chunks amortises
+        # the round trip to the worker processes
+        items = [(str(app_path), is_symlink) for app_path, is_symlink in entries]
+        chunks = [
+            items[start : start + self.chunk_size]
+            for start in range(0, len(items), self.chunk_size)
+        ]
+
+        results: List[Optional[Dict[str, Any]]] = []
+        # Spawned workers are safe to start from the backup's scanner threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=context
+        ) as executor:
+            for chunk_results in executor.map(_inspect_bundle_chunk, chunks):
+                results.extend(chunk_results)
+
+        return results
+
+    def _prune_cache(self, bundles: List[Dict[str, Any]]) -> None:
+        """Evict cached bundles that no longer exist in the scanned directories."""
+        if self.cache is None:
+            return
+
+        seen = {bundle["app_info"]["path"] for bundle in bundles}
+        scanned = {str(apps_dir) for apps_dir in self.app_dirs}
+        self.cache.retain(
+            key
+            for key in self.cache.keys()
+            if key in seen or os.path.dirname(key) not in scanned
+        )
+
+    def _inspect_bundle(
+        self, app_path: Path, is_symlink: bool
+    ) -> Optional[Dict[str, Any]]:
+        """Read and classify an application bundle in a single pass.
+
+        The returned record holds the public app_info together with everything
+        the filters need (receipt, sandbox flag, symlink target), so no bundle
+        is parsed or stat'ed more than once.
+        """
+        plist_data = self._read_info_plist(app_path)
+        if plist_data is None:
+            return None
 
-        # Check if the app is a symlink (common for Homebrew casks)
-        if app_path.is_symlink():
-            # Check if it points to a Homebrew location
+        app_info = self._get_app_info(app_path, plist_data)
+        sandboxed = bool(plist_data.get("com.apple.security.app-sandbox"))
+
+        # The receipt only matters when the sandbox flag didn't already decide
+        receipt = False
+        if not sandboxed:
+            receipt_path = app_path / "Contents" / "_MASReceipt" / "receipt"
+            receipt = os.path.exists(receipt_path)
+
+        symlink_target = None
+        if is_symlink:
             try:
-                real_path = app_path.resolve()
-                if "/opt/homebrew/" in str(real_path) or "/usr/local/" in str(
-                    real_path
-                ):
-                    return True
+                symlink_target = os.path.realpath(app_path)
             except OSError:
                 pass
 
-        # Check for common Homebrew cask bundle identifiers
-        bundle_id = app_info.get("bundle_id", "")
-        homebrew_indicators = ["org.homebrew.", "homebrew."]
+        return {
+            "app_info": app_info,
+            "bundle_id": app_info["bundle_id"],
+            "receipt": receipt,
+            "sandboxed": sandboxed,
+            "symlink_target": symlink_target,
+        }
 
-        for indicator in homebrew_indicators:
+    def _read_info_plist(self, app_path: Path) -> Optional[Dict[str, Any]]:
+        """Parse a bundle's Info.plist, or return None if it has none.
+
+        A plist that exists but can't be parsed yields an empty dict, so the
+        bundle is still reported with basic information.
+        """
+        info_plist_path = app_path / "Contents" / "Info.plist"
+        try:
+            return read_plist_keys(info_plist_path, self.INFO_PLIST_KEYS)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except (OSError, plistlib.InvalidFileException, ValueError):
+            return {}
+
+    def _get_app_info(
+        self, app_path: Path, plist_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Extract information from parsed Info.plist data."""
+        bundle_name = plist_data.get("CFBundleName", app_path.stem)
+        bundle_id = plist_data.get("CFBundleIdentifier", "unknown")
+        version = plist_data.get("CFBundleShortVersionString", "unknown")
+
+        return {
+            "name": bundle_name,
+            "path": str(app_path),
+            "bundle_id": bundle_id,
+            "version": version,
+            "display_name": plist_data.get("CFBundleDisplayName", bundle_name),
+        }
+
+    def _is_app_store_app(self, bundle: Dict[str, Any]) -> bool:
+        """Check if an app was installed from the App Store."""
+        # App Store receipt, or sandboxed apps (usually from App Store)
+        return bool(bundle["receipt"] or bundle["sandboxed"])
+
+    def _is_homebrew_app(self, bundle: Dict[str, Any]) -> bool:
+        """Check if an app was installed via Homebrew Cask."""
+        # Symlinks into a Homebrew location are common for Homebrew casks
+        symlink_target = bundle.get("symlink_target")
+        if symlink_target:
+            for prefix in self.HOMEBREW_PREFIXES:
+                if prefix in symlink_target:
+                    return True
+
+        # Check for common Homebrew cask bundle identifiers
+        bundle_id = bundle.get("bundle_id", "")
+        for indicator in self.HOMEBREW_BUNDLE_ID_INDICATORS:
             if indicator in bundle_id:
                 return True
 
         return False
+
+
+def _inspect_bundle_chunk(
+    items: List[Tuple[str, bool]],
+) -> List[Optional[Dict[str, Any]]]:
+    """Inspect a chunk of bundles inside a worker process."""
+    scanner = ManualAppScanner(app_dirs=[], parallel=False)
+    return [
+        scanner._inspect_bundle(Path(app_path), is_symlink)
+        for app_path, is_symlink in items
+    ]
@@ -0,0 +1,235 @@
+"""Selective-key reader for property list files.
+
+Application scanning only needs a handful of top-level keys from each
+Info.plist, while some bundles ship plists of hundreds of kilobytes (large
+document type arrays and the like). The reader below extracts just the
+requested top-level keys from XML and binary plists without building the
+rest of the object tree, and falls back to plistlib for anything it doesn't
+understand, so it never returns something plistlib wouldn't.
+"""
+
+import plistlib
+import struct
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from xml.parsers import expat
+
+BINARY_MAGIC = b"bplist00"
+
+
+class _Unsupported(Exception):
+    """Raised when the fast path can't handle a plist and plistlib must."""
+
+
+class _Done(Exception):
+    """Raised to stop XML parsing once every wanted key has been read."""
+
+
+def read_plist_keys(path: Path, keys: Iterable[str]) -> Dict[str, Any]:
+    """Read the given top-level keys from a plist file.
+
+    Keys that are absent from the plist are absent from the result. Errors
+    are reported exactly like plistlib.load would report them.
+    """
+    wanted = set(keys)
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        if data.startswith(BINARY_MAGIC):
+            return _read_binary_keys(data, wanted)
+        return _read_xml_keys(data, wanted)
+    except _Unsupported:
+        pass
+
+    plist_data = plistlib.loads(data)
+    if not isinstance(plist_data, dict):
+        return {}
+    return {key: value for key, value in plist_data.items() if key in wanted}
+
+
+def _read_xml_keys(data: bytes, wanted: Set[str]) -> Dict[str, Any]:
+    """Extract top-level keys from an XML plist with a streaming parser."""
+    parser = expat.ParserCreate()
+    # Deliver text in one callback per run instead of one per line
+    parser.buffer_text = True
+    result: Dict[str, Any] = {}
+
+    # Element depth: 1 is <plist>, 2 the top-level <dict>, 3 its children
+    depth = 0
+    current_key: Optional[str] = None
+    capture: Optional[str] = None
+    text: List[str] = []
+
+    converters: Dict[str, Callable[[str], Any]] = {
+        "string": str,
+        "integer": _parse_xml_integer,
+        "real": float,
+    }
+
+    def start_element(name: str, attrs: Dict[str, str]) -> None:
+        nonlocal depth, capture
+        depth += 1
+
+        if depth == 1 and name != "plist":
+            raise _Unsupported(f"unexpected root element {name}")
+        if depth == 2 and name != "dict":
+            raise _Unsupported("top-level object is not a dict")
+        if depth != 3:
+            return
+
+        if name == "key":
+            capture = "key"
+            text.clear()
+        elif current_key in wanted:
+            if name in converters:
+                capture = name
+                text.clear()
+            elif name in ("true", "false"):
+                result[current_key] = name == "true"
+            else:
+                # Dates, data and containers are left to plistlib
+                raise _Unsupported(f"unsupported value type {name}")
+
+    def end_element(name: str) -> None:
+        nonlocal depth, capture, current_key
+        depth -= 1
+
+        if depth != 2:
+            return
+
+        if capture == "key":
+            current_key = "".join(text)
+        else:
+            if capture is not None and current_key is not None:
+                try:
+                    result[current_key] = converters[capture]("".join(text))
+                except ValueError as e:
+                    raise _Unsupported(str(e)) from e
+
+                if wanted.issubset(result):
+                    raise _Done()
+
+            # The value for current_key has been consumed
+            current_key = None
+
+        capture = None
+
+    def character_data(data: str) -> None:
+        if capture is not None:
+            text.append(data)
+
+    def entity_decl(*args: Any) -> None:
+        # Same protection against entity expansion as plistlib
+        raise _Unsupported("entity declarations are not supported")
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    parser.EntityDeclHandler = entity_decl
+
+    try:
+        parser.Parse(data, True)
+    except _Done:
+        pass
+    except expat.ExpatError as e:
+        raise _Unsupported(str(e)) from e
+
+    return result
+
+
+def _parse_xml_integer(text: str) -> int:
+    """Parse an XML plist integer the way plistlib does."""
+    text = text.strip()
+    if text.startswith(("0x", "0X")):
+        return int(text, 16)
+    return int(text)
+
+
+def _read_binary_keys(data: bytes, wanted: Set[str]) -> Dict[str, Any]:
+    """Extract top-level keys from a binary plist by following offsets."""
+    if len(data) < len(BINARY_MAGIC) + 32:
+        raise _Unsupported("truncated binary plist")
+
+    offset_size, ref_size, num_objects, top_object, table_offset = struct.unpack(
+        ">6xBBQQQ", data[-32:]
+    )
+    if offset_size == 0 or ref_size == 0 or top_object >= num_objects:
+        raise _Unsupported("invalid binary plist trailer")
+    if table_offset + num_objects * offset_size > len(data) - 32:
+        raise _Unsupported("invalid binary plist offset table")
+
+    def object_offset(ref: int) -> int:
+        if ref >= num_objects:
+            raise _Unsupported("object reference out of range")
+        start = table_offset + ref * offset_size
+        return int.from_bytes(data[start : start + offset_size], "big")
+
+    def read_length(offset: int, info: int) -> Tuple[int, int]:
+        """Return (length, offset of the payload) for a marker at offset."""
+        if info != 0xF:
+            return info, offset + 1
+        marker = data[offset + 1]
+        if marker >> 4 != 0x1:
+            raise _Unsupported("invalid length marker")
+        size = 1 << (marker & 0xF)
+        start = offset + 2
+        return int.from_bytes(data[start : start + size], "big"), start + size
+
+    def read_object(ref: int) -> Any:
+        offset = object_offset(ref)
+        marker = data[offset]
+        kind, info = marker >> 4, marker & 0xF
+
+        if marker == 0x08:
+            return False
+        if marker == 0x09:
+            return True
+        if kind == 0x1 and info <= 3:
+            size = 1 << info
+            # 8-byte integers are signed, shorter ones unsigned, as in plistlib
+            signed = size == 8
+            start = offset + 1
+            return int.from_bytes(data[start : start + size], "big", signed=signed)
+        if kind == 0x2 and info in (2, 3):
+            fmt = ">f" if info == 2 else ">d"
+            size = 1 << info
+            return struct.unpack(fmt, data[offset + 1 : offset + 1 + size])[0]
+        if kind == 0x5:
+            length, start = read_length(offset, info)
+            return data[start : start + length].decode("ascii")
+        if kind == 0x6:
+            length, start = read_length(offset, info)
+            return data[start : start + length * 2].decode("utf-16be")
+
+        raise _Unsupported(f"unsupported object marker {marker:#x}")
+
+    try:
+        offset = object_offset(top_object)
+        marker = data[offset]
+        if marker >> 4 != 0xD:
+            raise _Unsupported("top-level object is not a dict")
+
+        count, refs_start = read_length(offset, marker & 0xF)
+        values_start = refs_start + count * ref_size
+
+        result: Dict[str, Any] = {}
+        for index in range(count):
+            key_start = refs_start + index * ref_size
+            key_ref = int.from_bytes(data[key_start : key_start + ref_size], "big")
+            key = read_object(key_ref)
+            if not isinstance(key, str):
+                raise _Unsupported("non-string dict key")
+            if key not in wanted:
+                continue
+
+            value_start = values_start + index * ref_size
+            value_ref = int.from_bytes(
+                data[value_start : value_start + ref_size], "big"
+            )
+            result[key] = read_object(value_ref)
+    except (IndexError, UnicodeDecodeError, struct.error) as e:
+        raise _Unsupported(str(e)) from e
+
+    return result
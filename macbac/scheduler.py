@@ -0,0 +1,126 @@
+"""Running dependent jobs concurrently.
+
+Each job runs as soon as the jobs it depends on have finished, so
+independent jobs overlap. Jobs whose dependencies failed are skipped.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class JobResult:
+    """How a job ended: OK, FAILED or SKIPPED, with its error and duration."""
+
+    def __init__(
+        self,
+        name: str,
+        status: str,
+        error: Optional[str] = None,
+        duration: float = 0.0,
+        value: Any = None,
+    ) -> None:
+        self.name = name
+        self.status = status
+        self.error = error
+        self.duration = duration
+        # What the job returned
+        self.value = value
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+    def __repr__(self) -> str:
+        return f"JobResult({self.name!r}, {self.status!r})"
+
+
+class Scheduler:
+    """Runs jobs on a thread pool in an order respecting their dependencies."""
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self.max_workers = max_workers
+        self._jobs: Dict[str, Callable[[], Any]] = {}
+        self._dependencies: Dict[str, List[str]] = {}
+
+    def add(self, name: str, job: Callable[[], Any], after: Iterable[str] = ()) -> None:
+        """Add a job that runs once the jobs named in after have succeeded."""
+        if name in self._jobs:
+            raise ValueError(f"Job already added: {name}")
+        self._jobs[name] = job
+        self._dependencies[name] = list(after)
+
+    def order(self) -> List[str]:
+        """Return the jobs in an order they could run in one at a time.
+
+        Raises ValueError for dependencies on unknown jobs and for cycles.
+        """
+        for name, dependencies in self._dependencies.items():
+            for dependency in dependencies:
+                if dependency not in self._jobs:
+                    raise ValueError(f"{name} depends on unknown job {dependency}")
+
+        ordered: List[str] = []
+        done: Set[str] = set()
+        while len(ordered) < len(self._jobs):
+            ready = [
+                name
+                for name in self._jobs
+                if name not in done
+                and all(dependency in done for dependency in self._dependencies[name])
+            ]
+            if not ready:
+                cycle = sorted(name for name in self._jobs if name not in done)
+                raise ValueError(f"Jobs depend on each other: {', '.join(cycle)}")
+            ordered.extend(ready)
+            done.update(ready)
+        return ordered
+
+    def run(self) -> Dict[str, JobResult]:
+        """Run every job, returning their results in the order they were added.
+
+        A job raising an exception fails, and the jobs depending on it,
+        directly or not, are skipped. The others still run.
+        """
+        self.order()
+        results: Dict[str, JobResult] = {}
+        running: Dict["Future[Any]", str] = {}
+        started: Dict[str, float] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers or max(1, len(self._jobs)),
+            thread_name_prefix="macbac-job",
+        ) as executor:
+            while len(results) < len(self._jobs):
+                for name in self._jobs:
+                    if name in results or name in started:
+                        continue
+                    dependencies = [results.get(d) for d in self._dependencies[name]]
+                    failed = [r.name for r in dependencies if r and not r.ok]
+                    if failed:
+                        results[name] = JobResult(
+                            name, SKIPPED, f"{', '.join(failed)} did not succeed"
+                        )
+                    elif all(dependencies):
+                        started[name] = time.monotonic()
+                        running[executor.submit(self._jobs[name])] = name
+
+                if not running:
+                    # Newly skipped jobs may have unblocked others
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    duration = time.monotonic() - started[name]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        results[name] = JobResult(name, FAILED, str(e), duration)
+                    else:
+                        results[name] = JobResult(name, OK, None, duration, value)
+
+        return {name: results[name] for name in self._jobs}
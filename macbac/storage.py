@@ -1,67 +1,279 @@
 """Storage management for backup data."""
 
+import io
 import json
-import shutil
-import subprocess
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .archive import ArchiveWriter
+from .delta import describe_changes, diff_manifests
+from .host_facts import HostFacts
+from .manifest import (
+    FONT_HASHES_NAME,
+    INVENTORY_NAME,
+    MANIFEST_NAME,
+    encode_manifest,
+    load_backup_manifest,
+    write_manifest,
+)
+from .object_store import OBJECTS_DIR_NAME, ObjectStore
+from .verify import checksum_entry, write_checksums
 
 
 class StorageManager:
     """Manages storage of backup data and generation of inventory files."""
 
-    def __init__(self) -> None:
+    # Scanner whose data fills each manifest section
+    SECTION_SOURCES = {
+        "appstore": "appstore",
+        "homebrew": "homebrew",
+        "fonts": "fonts",
+        "font_hashes": "fonts",
+        "manual_apps": "manual_apps",
+        "dev_tools": "dev_env",
+        "dev_tool_versions": "dev_env",
+    }
+
+    def __init__(self, copy_workers: int = 8) -> None:
         self.backup_dir: Path | None = None
+        # Number of font files stored concurrently
+        self.copy_workers = copy_workers
+        self.object_store: Optional[ObjectStore] = None
+        # Set for incremental backups, which only record changes against it
+        self.parent_backup: Optional[Path] = None
+        self.changes: Optional[Dict[str, Dict[str, List[Any]]]] = None
+        # Snapshot of the host shared by the manifest and the inventory
+        self.host_facts: Optional[HostFacts] = None
+        # Digest and size of each file written to the backup directory
+        self.checksums: Dict[str, Dict[str, Any]] = {}
 
     def set_backup_dir(self, backup_dir: Path) -> None:
-        """Set the backup directory."""
+        """Set the backup directory.
+
+        Font contents are kept in an object store shared by every backup in
+        the same output directory.
+        """
         self.backup_dir = backup_dir
+        self.object_store = ObjectStore(backup_dir.parent / OBJECTS_DIR_NAME)
+        self.checksums = {}
+
+    def set_parent_backup(self, parent_backup: Optional[Path]) -> None:
+        """Make the next backup incremental on top of parent_backup."""
+        self.parent_backup = parent_backup
+
+    def set_host_facts(self, host_facts: HostFacts) -> None:
+        """Set the host snapshot the next backup's files are written from."""
+        self.host_facts = host_facts
+
+    def _get_host_facts(self) -> HostFacts:
+        """Return the host snapshot, taking it now if none was set."""
+        if self.host_facts is None:
+            self.host_facts = HostFacts.collect()
+        return self.host_facts
+
+    def store_backup_data(
+        self,
+        backup_data: Dict[str, Any],
+        on_font_stored: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        """Store backup data to appropriate directories and generate the manifest.
 
-    def store_backup_data(self, backup_data: Dict[str, Any]) -> None:
-        """Store backup data to appropriate directories and generate manifest.json."""
+        on_font_stored is called with the size of each font as it is stored.
+        """
         if not self.backup_dir:
             raise ValueError("Backup directory not set")
 
+        # Incremental backups are compared with the full view of their parent
+        parent_manifest = None
+        if self.parent_backup is not None:
+            parent_manifest, _ = load_backup_manifest(self.parent_backup)
+
         # Create subdirectories
         fonts_dir = self.backup_dir / "fonts"
         fonts_dir.mkdir(exist_ok=True)
 
         # Store font files
-        if "fonts" in backup_data and "font_files" in backup_data["fonts"]:
-            for font_file in backup_data["fonts"]["font_files"]:
-                src_path = Path(font_file["path"])
-                if src_path.exists():
-                    dst_path = fonts_dir / src_path.name
-                    shutil.copy2(src_path, dst_path)
+        parent_hashes = (parent_manifest or {}).get("font_hashes", {})
+        font_hashes = self._store_fonts(
+            backup_data, fonts_dir, parent_hashes, on_font_stored
+        )
+
+        # Generate the manifest
+        self._generate_manifest(backup_data, font_hashes, parent_manifest)
+
+    def _store_fonts(
+        self,
+        backup_data: Dict[str, Any],
+        fonts_dir: Path,
+        parent_hashes: Optional[Dict[str, str]] = None,
+        on_font_stored: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, str]:
+        """Store font files in the object store and link them into fonts_dir.
+
+        Returns the content digest of every stored font keyed by its name in
+        the backup. Fonts keep their path relative to the scanned font
+        directory, so same-named files from different subdirectories don't
+        overwrite each other. Fonts whose digest matches parent_hashes are
+        already part of the parent backup and aren't linked again. Fonts are
+        stored copy_workers at a time.
+        """
+        font_hashes: Dict[str, str] = {}
+        if "fonts" not in backup_data or "font_files" not in backup_data["fonts"]:
+            return font_hashes
+
+        if self.object_store is None:
+            raise ValueError("Object store not set")
+
+        font_files = backup_data["fonts"]["font_files"]
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.copy_workers), thread_name_prefix="macbac-font"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self._store_font, font_file, fonts_dir, parent_hashes or {}
+                )
+                for font_file in font_files
+            ]
+            for future in as_completed(futures):
+                stored = future.result()
+                if stored is None:
+                    continue
+                font_name, digest, size = stored
+                font_hashes[font_name] = digest
+                if (parent_hashes or {}).get(font_name) != digest:
+                    # The blob is the stored content, so it needn't be hashed again
+                    self.checksums[f"fonts/{font_name}"] = {
+                        "sha256": digest,
+                        "size": self.object_store.object_path(digest).stat().st_size,
+                    }
+                if on_font_stored is not None:
+                    on_font_stored(size)
+
+        self.object_store.save()
+        # Keep the manifest independent of the order copies finished in
+        return {
+            name: font_hashes[name]
+            for name in map(self._font_name, font_files)
+            if name in font_hashes
+        }
+
+    def _store_font(
+        self,
+        font_file: Dict[str, Any],
+        fonts_dir: Path,
+        parent_hashes: Dict[str, str],
+    ) -> Optional[Tuple[str, str, int]]:
+        """Store one font, returning its name, digest and size.
+
+        Returns None if the font disappeared since it was scanned.
+        """
+        if self.object_store is None:
+            raise ValueError("Object store not set")
+        src_path = Path(font_file["path"])
+        font_name = self._font_name(font_file)
 
-        # Generate manifest.json
-        self._generate_manifest(backup_data)
+        try:
+            digest = self.object_store.add_file(src_path)
+        except FileNotFoundError:
+            return None
+
+        size = int(font_file.get("size_bytes") or 0)
+        if parent_hashes.get(font_name) == digest:
+            return font_name, digest, size
+
+        dst_path = fonts_dir / font_name
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        self.object_store.link_to(digest, dst_path)
+        return font_name, digest, size
+
+    def _font_name(self, font_file: Dict[str, Any]) -> str:
+        """Return the name a font is stored under in the backup."""
+        return str(font_file.get("relative_path") or font_file["name"])
+
+    def _generate_manifest(
+        self,
+        backup_data: Dict[str, Any],
+        font_hashes: Optional[Dict[str, str]] = None,
+        parent_manifest: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Generate the machine-readable manifest.
 
-    def _generate_manifest(self, backup_data: Dict[str, Any]) -> None:
-        """Generate machine-readable manifest.json file."""
+        With a parent manifest only the changes against it are written, as a
+        delta manifest that references the parent backup.
+        """
         if not self.backup_dir:
             raise ValueError("Backup directory not set")
 
-        # Get macOS version
-        try:
-            macos_version = subprocess.run(
-                ["sw_vers", "-productVersion"],
-                capture_output=True,
-                text=True,
-                check=True,
-            ).stdout.strip()
-        except subprocess.CalledProcessError:
-            macos_version = "Unknown"
-
+        manifest = self._build_manifest(backup_data, font_hashes)
+
+        if parent_manifest is not None and self.parent_backup is not None:
+            # A failed scanner says nothing about what changed, so its
+            # sections are carried over from the parent instead of emptied
+            for section, scanner_name in self.SECTION_SOURCES.items():
+                if "error" in backup_data.get(scanner_name, {}):
+                    if section in parent_manifest:
+                        manifest[section] = parent_manifest[section]
+
+            self.changes = describe_changes(parent_manifest, manifest)
+            manifest = diff_manifests(parent_manifest, manifest)
+            manifest["backup_info"]["incremental"] = True
+            manifest["backup_info"]["parent"] = self.parent_backup.name
+
+        # Write the sectioned manifest
+        data = write_manifest(self.backup_dir / MANIFEST_NAME, manifest)
+        self.checksums[MANIFEST_NAME] = checksum_entry(data)
+
+    def write_archive(
+        self,
+        backup_data: Dict[str, Any],
+        archive: ArchiveWriter,
+        on_font_stored: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        """Stream the backup into an archive instead of a backup directory.
+
+        The manifest and inventory come first so they can be read without
+        going through the fonts, which are then streamed straight from their
+        source files one at a time. Each font is hashed as it is streamed,
+        so its digest can't disagree with the archived bytes; the digests
+        follow the fonts in a member of their own instead of the manifest.
+        """
+        font_files = backup_data.get("fonts", {}).get("font_files", [])
+
+        manifest = self._build_manifest(backup_data, None)
+        del manifest["font_hashes"]
+        archive.add_bytes(MANIFEST_NAME, encode_manifest(manifest))
+
+        inventory = io.StringIO()
+        self._write_inventory(inventory, backup_data)
+        archive.add_bytes(INVENTORY_NAME, inventory.getvalue().encode("utf-8"))
+
+        font_hashes: Dict[str, str] = {}
+        for font_file in font_files:
+            font_name = self._font_name(font_file)
+            try:
+                size, digest = archive.add_file(
+                    f"fonts/{font_name}", Path(font_file["path"])
+                )
+            except FileNotFoundError:
+                continue
+            font_hashes[font_name] = digest
+            if on_font_stored is not None:
+                on_font_stored(size)
+
+        archive.add_bytes(
+            FONT_HASHES_NAME,
+            json.dumps(font_hashes, indent=2, ensure_ascii=False).encode("utf-8"),
+        )
+
+    def _build_manifest(
+        self, backup_data: Dict[str, Any], font_hashes: Optional[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """Build the full manifest data from the scanner results."""
         # Build manifest data
-        manifest: Dict[str, Any] = {
-            "backup_info": {
-                "date": datetime.now().isoformat(),
-                "macos_version": macos_version,
-                "macbac_version": "0.2.0",
-            }
-        }
+        backup_info = self._get_host_facts().to_dict()
+        backup_info["macbac_version"] = "0.2.0"
+        manifest: Dict[str, Any] = {"backup_info": backup_info}
 
         # App Store apps
         if "appstore" in backup_data and "apps" in backup_data["appstore"]:
@@ -80,69 +292,119 @@ class StorageManager:
         # Fonts
         if "fonts" in backup_data and "font_files" in backup_data["fonts"]:
             manifest["fonts"] = [
-                font["name"] for font in backup_data["fonts"]["font_files"]
+                self._font_name(font) for font in backup_data["fonts"]["font_files"]
             ]
         else:
             manifest["fonts"] = []
 
+        # Content digests of the stored fonts, keys of the object store
+        manifest["font_hashes"] = font_hashes or {}
+
         # Manual apps
         if "manual_apps" in backup_data and "apps" in backup_data["manual_apps"]:
             manifest["manual_apps"] = backup_data["manual_apps"]["apps"]
         else:
             manifest["manual_apps"] = []
 
-        # Dev tools (list installed tools)
+        # Dev tools (list installed tools and their versions)
         if "dev_env" in backup_data and "installed_tools" in backup_data["dev_env"]:
-            manifest["dev_tools"] = [
-                tool["name"] for tool in backup_data["dev_env"]["installed_tools"]
-            ]
+            installed_tools = backup_data["dev_env"]["installed_tools"]
+            manifest["dev_tools"] = [tool["name"] for tool in installed_tools]
+            manifest["dev_tool_versions"] = {
+                tool["name"]: tool.get("version_info") for tool in installed_tools
+            }
         else:
             manifest["dev_tools"] = []
+            manifest["dev_tool_versions"] = {}
 
-        # Write manifest.json
-        manifest_path = self.backup_dir / "manifest.json"
-        with open(manifest_path, "w", encoding="utf-8") as f:
-            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return manifest
 
     def generate_inventory(self, backup_data: Dict[str, Any]) -> None:
         """Generate inventory.md file with backup summary."""
         if not self.backup_dir:
             raise ValueError("Backup directory not set")
 
-        inventory_path = self.backup_dir / "inventory.md"
+        inventory = io.StringIO()
+        self._write_inventory(inventory, backup_data)
+        data = inventory.getvalue().encode("utf-8")
+        with open(self.backup_dir / INVENTORY_NAME, "wb") as f:
+            f.write(data)
+        self.checksums[INVENTORY_NAME] = checksum_entry(data)
 
-        # Get macOS version
-        try:
-            macos_version = subprocess.run(
-                ["sw_vers", "-productVersion"],
-                capture_output=True,
-                text=True,
-                check=True,
-            ).stdout.strip()
-        except subprocess.CalledProcessError:
-            macos_version = "Unknown"
+    def write_checksums(self) -> None:
+        """Record the digest and size of every file written to the backup."""
+        if not self.backup_dir:
+            raise ValueError("Backup directory not set")
+        write_checksums(self.backup_dir, self.checksums)
+
+    def _write_inventory(self, f: Any, backup_data: Dict[str, Any]) -> None:
+        """Write the inventory to a text stream."""
+        host_facts = self._get_host_facts()
+
+        f.write("# macbac Backup Inventory\n\n")
+        backup_date = host_facts.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        f.write(f"- **Backup Date:** {backup_date}\n")
+        f.write(f"- **macOS Version:** {host_facts.os_version}\n")
+        f.write(
+            f"- **Host:** {host_facts.hostname} "
+            f"({host_facts.model}, {host_facts.architecture})\n"
+        )
+        if self.changes is not None and self.parent_backup is not None:
+            f.write(f"- **Incremental Backup Of:** {self.parent_backup.name}\n")
+        f.write("\n---\n\n")
 
-        with open(inventory_path, "w", encoding="utf-8") as f:
-            f.write("# macbac Backup Inventory\n\n")
-            backup_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"- **Backup Date:** {backup_date}\n")
-            f.write(f"- **macOS Version:** {macos_version}\n\n")
-            f.write("---\n\n")
+        # Incremental backups only list what changed
+        if self.changes is not None:
+            self._write_changes_section(f, backup_data, self.changes)
+            return
+
+        # App Store applications
+        self._write_appstore_section(f, backup_data.get("appstore", {}))
+
+        # Homebrew section
+        self._write_homebrew_section(f, backup_data.get("homebrew", {}))
 
-            # App Store applications
-            self._write_appstore_section(f, backup_data.get("appstore", {}))
+        # Development environment
+        self._write_dev_env_section(f, backup_data.get("dev_env", {}))
 
-            # Homebrew section
-            self._write_homebrew_section(f, backup_data.get("homebrew", {}))
+        # Custom fonts
+        self._write_fonts_section(f, backup_data.get("fonts", {}))
 
-            # Development environment
-            self._write_dev_env_section(f, backup_data.get("dev_env", {}))
+        # Manual applications
+        self._write_manual_apps_section(f, backup_data.get("manual_apps", {}))
+
+    def _write_changes_section(
+        self,
+        f: Any,
+        backup_data: Dict[str, Any],
+        changes: Dict[str, Dict[str, List[Any]]],
+    ) -> None:
+        """Write the changes of an incremental backup."""
+        f.write("## 🔄 Changes Since Parent Backup\n\n")
+
+        for scanner_name, data in backup_data.items():
+            if isinstance(data, dict) and "error" in data:
+                f.write(
+                    f"⚠️ {scanner_name} scan failed, kept the parent backup's data: "
+                    f"{data['error']}\n\n"
+                )
+
+        if not changes:
+            f.write("No changes.\n")
+            return
 
-            # Custom fonts
-            self._write_fonts_section(f, backup_data.get("fonts", {}))
+        for section, section_changes in changes.items():
+            f.write(f"### {section}\n\n")
+            for marker, kind in (("+", "added"), ("-", "removed"), ("~", "changed")):
+                for item in section_changes.get(kind, []):
+                    f.write(f"- `{marker}` {self._describe_item(item)}\n")
+            f.write("\n")
 
-            # Manual applications
-            self._write_manual_apps_section(f, backup_data.get("manual_apps", {}))
+    def _describe_item(self, item: Any) -> str:
+        """Return a short description of a manifest item."""
+        if isinstance(item, dict):
+            return str(item.get("name") or json.dumps(item, ensure_ascii=False))
+        return str(item)
 
     def _write_appstore_section(self, f: Any, appstore_data: Dict[str, Any]) -> None:
         """Write App Store applications section."""
@@ -215,7 +477,7 @@ class StorageManager:
         font_files = fonts_data.get("font_files", [])
         if font_files:
             for font in font_files:
-                f.write(f"- `{font['name']}`\n")
+                f.write(f"- `{self._font_name(font)}`\n")
         else:
             f.write("No custom fonts found.\n")
 
@@ -0,0 +1,218 @@
+"""Checking that a backup directory is intact.
+
+Backups record the SHA-256 digest and size of every file they hold in
+checksums.json, as the files are written. Verifying a backup re-hashes its
+files in parallel and reports those that are missing, unexpected or
+corrupt. Unexpected files are only warned about unless verifying strictly,
+and metadata that Finder or a NAS leaves behind is ignored.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .manifest import CHECKSUMS_NAME, FONT_HASHES_NAME, open_backup_manifest
+
+CHECKSUMS_FORMAT = "macbac-checksums"
+CHECKSUMS_VERSION = 1
+
+# Bytes hashed per update, so huge files don't hold one mapping slice long
+MMAP_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Files that may appear in a backup directory after it was made
+UNCHECKED_NAMES = {CHECKSUMS_NAME, "restore.log"}
+
+# Metadata files and directories macOS and NAS devices create in folders they
+# browse or index; AppleDouble files ("._*") are matched by prefix
+METADATA_NAMES = {
+    ".DS_Store",
+    ".localized",
+    ".AppleDouble",
+    ".Spotlight-V100",
+    ".TemporaryItems",
+    ".Trashes",
+    ".fseventsd",
+    "@eaDir",
+    "#recycle",
+    ".@__thumb",
+    "Thumbs.db",
+    "desktop.ini",
+}
+APPLEDOUBLE_PREFIX = "._"
+
+
+def checksum_entry(data: bytes) -> Dict[str, Any]:
+    """Return the checksum entry of content held in memory."""
+    return {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+
+
+def write_checksums(backup_dir: Path, files: Dict[str, Dict[str, Any]]) -> None:
+    """Write the checksums of a backup's files, keyed by relative path."""
+    checksums = {
+        "format": CHECKSUMS_FORMAT,
+        "version": CHECKSUMS_VERSION,
+        "files": dict(sorted(files.items())),
+    }
+    with open(backup_dir / CHECKSUMS_NAME, "w", encoding="utf-8") as f:
+        json.dump(checksums, f, indent=2, ensure_ascii=False)
+
+
+def read_checksums(backup_dir: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Return a backup's recorded checksums, or None if it has none."""
+    path = backup_dir / CHECKSUMS_NAME
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checksums = json.load(f)
+    except ValueError as e:
+        raise ValueError(f"Invalid checksums file: {e}") from e
+    if not isinstance(checksums, dict) or checksums.get("format") != CHECKSUMS_FORMAT:
+        raise ValueError(f"Invalid checksums file: {path}")
+    files = checksums.get("files", {})
+    return files if isinstance(files, dict) else {}
+
+
+def hash_file_mmap(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file, reading it through mmap."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        # Empty files can't be mapped
+        if size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, MMAP_CHUNK_SIZE):
+                    digest.update(view[offset : offset + MMAP_CHUNK_SIZE])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+class VerifyReport:
+    """The outcome of verifying one backup directory."""
+
+    def __init__(self, backup_dir: Path, strict: bool = False) -> None:
+        self.backup_dir = backup_dir
+        # Whether unexpected files make the backup fail verification
+        self.strict = strict
+        self.verified = 0
+        self.verified_bytes = 0
+        self.missing: List[str] = []
+        self.extra: List[str] = []
+        # (path, problem) pairs
+        self.corrupt: List[Tuple[str, str]] = []
+        # Backups made before checksums were recorded only have font digests
+        self.legacy = False
+
+    @property
+    def ok(self) -> bool:
+        if self.strict and self.extra:
+            return False
+        return not (self.missing or self.corrupt)
+
+
+def is_metadata_file(relative: str) -> bool:
+    """Check whether a path in a backup is Finder or NAS metadata."""
+    return any(
+        part in METADATA_NAMES or part.startswith(APPLEDOUBLE_PREFIX)
+        for part in relative.split("/")
+    )
+
+
+def expected_files(backup_dir: Path) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+    """Return the checksums a backup's files should have, and if it is legacy.
+
+    Backups without checksums.json fall back to the font digests in their
+    manifest, or in font_hashes.json for extracted archives, for the fonts
+    they hold.
+    """
+    files = read_checksums(backup_dir)
+    if files is not None:
+        return files, False
+
+    manifest, _ = open_backup_manifest(backup_dir)
+    font_hashes = manifest.get("font_hashes")
+    if font_hashes is None and (backup_dir / FONT_HASHES_NAME).is_file():
+        with open(backup_dir / FONT_HASHES_NAME, "r", encoding="utf-8") as f:
+            font_hashes = json.load(f)
+    font_hashes = font_hashes or {}
+    expected = {
+        f"fonts/{name}": {"sha256": digest}
+        for name, digest in font_hashes.items()
+        # Incremental backups only hold the fonts that changed
+        if (backup_dir / "fonts" / name).exists()
+    }
+    return expected, True
+
+
+def verify_backup(
+    backup_dir: Path,
+    max_workers: int = 8,
+    on_file: Optional[Callable[[int], None]] = None,
+    strict: bool = False,
+) -> VerifyReport:
+    """Re-hash a backup's files, max_workers at a time.
+
+    on_file is called with the size of each file as it is checked. With
+    strict, unexpected files make the backup fail verification.
+    """
+    report = VerifyReport(backup_dir, strict)
+    expected, report.legacy = expected_files(backup_dir)
+
+    present = set()
+    for root, _, names in os.walk(backup_dir):
+        for name in names:
+            relative = (Path(root) / name).relative_to(backup_dir).as_posix()
+            present.add(relative)
+    if report.legacy:
+        # Only fonts are known, so nothing else counts as unexpected
+        present = {path for path in present if path.startswith("fonts/")}
+    report.extra = sorted(
+        path
+        for path in present - set(expected) - UNCHECKED_NAMES
+        if not is_metadata_file(path)
+    )
+    report.missing = sorted(set(expected) - present)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_workers), thread_name_prefix="macbac-verify"
+    ) as executor:
+        futures = {
+            executor.submit(_check_file, backup_dir / relative, entry): relative
+            for relative, entry in sorted(expected.items())
+            if relative in present
+        }
+        for future in as_completed(futures):
+            size, problem = future.result()
+            if problem is None:
+                report.verified += 1
+                report.verified_bytes += size
+            else:
+                report.corrupt.append((futures[future], problem))
+            if on_file is not None:
+                on_file(size)
+
+    report.corrupt.sort()
+    return report
+
+
+def _check_file(path: Path, entry: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    """Check one file, returning its size and what is wrong with it, if any."""
+    try:
+        size = path.stat().st_size
+        expected_size = entry.get("size")
+        # A size mismatch is found without reading the file
+        if expected_size is not None and size != expected_size:
+            return size, f"size is {size} bytes, expected {expected_size}"
+        if hash_file_mmap(path) != entry.get("sha256"):
+            return size, "checksum mismatch"
+    except OSError as e:
+        return 0, f"unreadable: {e}"
+    return size, None
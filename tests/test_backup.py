@@ -1,11 +1,35 @@
 """Tests for backup functionality."""
 
+import hashlib
+import io
+import json
+import os
+import tarfile
 import tempfile
+import threading
+from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 from unittest.mock import Mock, patch
 
+import pytest
+
+from macbac.archive import ArchiveWriter, compression_for
 from macbac.backup import BackupManager
+from macbac.delta import describe_changes, diff_manifests
+from macbac.host_facts import HostFacts
+from macbac.manifest import (
+    BackupManifest,
+    ManifestFile,
+    encode_manifest,
+    find_latest_backup,
+    load_backup_manifest,
+    read_manifest,
+    write_manifest,
+)
+from macbac.object_store import ObjectStore
+from macbac.restore import RestoreManager
+from macbac.scanners.font_scanner import FontScanner
 from macbac.storage import StorageManager
 
 
@@ -77,3 +101,533 @@ class TestBackupManager:
             # Storage methods should still be called
             manager.storage_manager.store_backup_data.assert_called_once()
             manager.storage_manager.generate_inventory.assert_called_once()
+
+    @patch("macbac.backup.console")
+    def test_start_backup_runs_scanners_concurrently(self, mock_console: Any) -> None:
+        """Test that scanners overlap instead of running one after another."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = BackupManager(Path(temp_dir))
+            barrier = threading.Barrier(len(manager.scanners), timeout=5)
+
+            # Every scanner waits for all the others, which only succeeds
+            # when they are running at the same time
+            def wait_for_all() -> Dict[str, Any]:
+                barrier.wait()
+                return {}
+
+            for scanner in manager.scanners.values():
+                scanner.scan = Mock(side_effect=wait_for_all)  # type: ignore
+
+            manager.storage_manager.store_backup_data = Mock()  # type: ignore
+            manager.storage_manager.generate_inventory = Mock()  # type: ignore
+
+            manager.start_backup()
+
+            backup_data = manager.storage_manager.store_backup_data.call_args[0][0]
+            assert list(backup_data) == list(manager.scanners)
+            assert all(data == {} for data in backup_data.values())
+
+    @patch("macbac.backup.console")
+    def test_start_backup_sequential_keeps_errors(self, mock_console: Any) -> None:
+        """Test that a single worker still records per-scanner errors."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = BackupManager(Path(temp_dir), max_workers=1)
+
+            for name, scanner in manager.scanners.items():
+                scanner.scan = Mock(return_value={"name": name})  # type: ignore
+            manager.scanners["fonts"].scan = Mock(  # type: ignore
+                side_effect=Exception("Test error")
+            )
+
+            manager.storage_manager.store_backup_data = Mock()  # type: ignore
+            manager.storage_manager.generate_inventory = Mock()  # type: ignore
+
+            manager.start_backup()
+
+            backup_data = manager.storage_manager.store_backup_data.call_args[0][0]
+            assert backup_data["fonts"] == {"error": "Test error"}
+            assert backup_data["homebrew"] == {"name": "homebrew"}
+
+    @patch("macbac.backup.console")
+    def test_start_backup_shares_one_host_snapshot(self, mock_console: Any) -> None:
+        """Test that the manifest and inventory come from one host snapshot."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = BackupManager(Path(temp_dir), use_cache=False)
+            for scanner in manager.scanners.values():
+                scanner.scan = Mock(return_value={})  # type: ignore
+
+            facts = HostFacts(datetime(2025, 1, 7, 10, 30), os_version="15.2")
+            with patch.object(HostFacts, "collect", return_value=facts) as collect:
+                backup_dir = manager.start_backup()
+
+            collect.assert_called_once()
+            manifest = read_manifest(backup_dir / "manifest.jsonl")
+            assert manifest["backup_info"]["date"] == "2025-01-07T10:30:00"
+            assert manifest["backup_info"]["macos_version"] == "15.2"
+            inventory = (backup_dir / "inventory.md").read_text(encoding="utf-8")
+            assert "- **Backup Date:** 2025-01-07 10:30:00" in inventory
+            assert "- **macOS Version:** 15.2" in inventory
+
+    def test_host_facts_without_macos_tools(self) -> None:
+        """Test that missing system tools leave facts unknown."""
+        with (
+            patch("macbac.host_facts.platform.mac_ver", return_value=("", (), "")),
+            patch("macbac.host_facts.subprocess.run", side_effect=FileNotFoundError()),
+        ):
+            facts = HostFacts.collect()
+
+        assert facts.os_version == "Unknown"
+        assert facts.model == "Unknown"
+        assert facts.to_dict()["date"] == facts.timestamp.isoformat()
+
+    def test_init_rejects_invalid_worker_count(self) -> None:
+        """Test that a worker count below one is rejected."""
+        with pytest.raises(ValueError, match="max_workers"):
+            BackupManager(Path("/tmp"), max_workers=0)
+
+
+class TestStorageManager:
+    """Test cases for StorageManager."""
+
+    def setup_method(self) -> None:
+        """Set up a font library and an output directory."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+        # Caches and journals go to the temporary directory, not the user's
+        self.env = patch.dict(
+            os.environ,
+            {
+                "XDG_CACHE_HOME": str(self.temp_dir / "cache"),
+                "XDG_STATE_HOME": str(self.temp_dir / "state"),
+            },
+        )
+        self.env.start()
+        self.output_dir = self.temp_dir / "backups"
+        self.output_dir.mkdir()
+
+        fonts_dir = self.temp_dir / "Fonts"
+        (fonts_dir / "Family").mkdir(parents=True)
+        (fonts_dir / "Font.ttf").write_bytes(b"regular font data")
+        (fonts_dir / "Family" / "Font.ttf").write_bytes(b"family font data")
+        (fonts_dir / "Copy.otf").write_bytes(b"regular font data")
+        self.backup_data = {"fonts": FontScanner(font_dirs=[fonts_dir]).scan()}
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        self.env.stop()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _store(self, name: str, parent: Optional[Path] = None) -> Path:
+        backup_dir = self.output_dir / name
+        backup_dir.mkdir()
+        storage_manager = StorageManager()
+        storage_manager.set_backup_dir(backup_dir)
+        storage_manager.set_parent_backup(parent)
+        with patch("macbac.host_facts.subprocess.run") as mock_run:
+            mock_run.return_value = Mock(stdout="15.0.0\n")
+            storage_manager.store_backup_data(self.backup_data)
+            storage_manager.generate_inventory(self.backup_data)
+        return backup_dir
+
+    def test_fonts_are_deduplicated_across_backups(self) -> None:
+        """Test that fonts are stored once and hardlinked into each backup."""
+        first = self._store("macbac_backup_1")
+        with patch("macbac.object_store.copy_file") as mock_copy:
+            second = self._store("macbac_backup_2")
+        assert mock_copy.call_count == 0
+
+        for backup_dir in (first, second):
+            assert (backup_dir / "fonts" / "Font.ttf").read_bytes() == (
+                b"regular font data"
+            )
+            assert (backup_dir / "fonts" / "Family" / "Font.ttf").read_bytes() == (
+                b"family font data"
+            )
+
+        assert (first / "fonts" / "Font.ttf").stat().st_ino == (
+            second / "fonts" / "Copy.otf"
+        ).stat().st_ino
+        blobs = [
+            path
+            for path in (self.output_dir / "objects").rglob("*")
+            if path.is_file() and path.name != "index.json"
+        ]
+        assert len(blobs) == 2
+
+    def test_fonts_are_stored_concurrently(self) -> None:
+        """Test that fonts are copied on worker threads and reported."""
+        backup_dir = self.output_dir / "macbac_backup_1"
+        backup_dir.mkdir()
+        storage_manager = StorageManager(copy_workers=3)
+        storage_manager.set_backup_dir(backup_dir)
+
+        object_store = storage_manager.object_store
+        assert object_store is not None
+        threads = set()
+        add_file = object_store.add_file
+
+        def recording_add_file(src: Path) -> str:
+            threads.add(threading.current_thread().name)
+            return add_file(src)
+
+        sizes = []
+        with (
+            patch.object(object_store, "add_file", recording_add_file),
+            patch("macbac.host_facts.subprocess.run") as mock_run,
+        ):
+            mock_run.return_value = Mock(stdout="15.0.0\n")
+            storage_manager.store_backup_data(self.backup_data, sizes.append)
+
+        assert all(name.startswith("macbac-font") for name in threads)
+        assert sorted(sizes) == sorted(
+            font["size_bytes"] for font in self.backup_data["fonts"]["font_files"]
+        )
+        assert (backup_dir / "fonts" / "Family" / "Font.ttf").read_bytes() == (
+            b"family font data"
+        )
+
+    def test_known_content_is_not_copied_again(self) -> None:
+        """Test that stored content is found by its digest before any copy."""
+        object_store = ObjectStore(self.output_dir / "objects")
+        font_path = self.temp_dir / "Fonts" / "Font.ttf"
+        digest = object_store.add_file(font_path)
+        os.utime(font_path, ns=(0, 0))
+
+        with patch(
+            "macbac.object_store.tempfile.mkstemp",
+            side_effect=AssertionError("stored content was copied again"),
+        ):
+            # A duplicate and a touched file hash to a stored blob
+            copy_path = self.temp_dir / "Fonts" / "Copy.otf"
+            assert object_store.add_file(copy_path) == digest
+            assert object_store.add_file(font_path) == digest
+
+        assert digest == hashlib.sha256(b"regular font data").hexdigest()
+        assert object_store.object_path(digest).read_bytes() == b"regular font data"
+        assert len(list((self.output_dir / "objects").rglob(".incoming-*"))) == 0
+
+    def test_manifest_records_font_hashes(self) -> None:
+        """Test that the manifest references fonts by relative name and digest."""
+        backup_dir = self._store("macbac_backup_1")
+
+        manifest = read_manifest(backup_dir / "manifest.jsonl")
+
+        assert sorted(manifest["fonts"]) == ["Copy.otf", "Family/Font.ttf", "Font.ttf"]
+        digest = manifest["font_hashes"]["Font.ttf"]
+        assert digest == hashlib.sha256(b"regular font data").hexdigest()
+        assert manifest["font_hashes"]["Copy.otf"] == digest
+        assert (self.output_dir / "objects" / digest[:2] / digest).exists()
+
+    def test_incremental_backup_records_only_changes(self) -> None:
+        """Test that an incremental backup stores a delta against its parent."""
+        self.backup_data.update(
+            {
+                "appstore": {"apps": [{"id": "1", "name": "Xcode"}]},
+                "homebrew": {"brewfile_content": 'tap "a/b"\nbrew "git"'},
+                "dev_env": {
+                    "installed_tools": [
+                        {"name": "git", "description": "Git", "version_info": "git 2.0"}
+                    ]
+                },
+            }
+        )
+        parent = self._store("macbac_backup_1")
+
+        # Unchanged data gives an empty delta and links no fonts
+        unchanged = self._store("macbac_backup_2", parent=parent)
+        delta = read_manifest(unchanged / "manifest.jsonl")
+        assert delta["delta"] == {}
+        assert delta["backup_info"]["parent"] == "macbac_backup_1"
+        assert list((unchanged / "fonts").iterdir()) == []
+
+        # Change every kind of section, and fail one scanner
+        fonts_dir = self.temp_dir / "Fonts"
+        (fonts_dir / "Copy.otf").unlink()
+        (fonts_dir / "Font.ttf").write_bytes(b"new regular font data")
+        self.backup_data["fonts"] = FontScanner(font_dirs=[fonts_dir]).scan()
+        self.backup_data["appstore"]["apps"].append({"id": "2", "name": "Pages"})
+        self.backup_data["homebrew"]["brewfile_content"] = 'tap "a/b"\nbrew "wget"'
+        self.backup_data["dev_env"] = {"error": "probe failed"}
+        changed = self._store("macbac_backup_3", parent=unchanged)
+
+        manifest, chain = load_backup_manifest(changed)
+        assert chain == [changed, unchanged, parent]
+        assert manifest["appstore"] == [
+            {"id": "1", "name": "Xcode"},
+            {"id": "2", "name": "Pages"},
+        ]
+        assert manifest["homebrew"] == {"brewfile": 'tap "a/b"\nbrew "wget"'}
+        assert sorted(manifest["fonts"]) == ["Family/Font.ttf", "Font.ttf"]
+        # The failed scanner keeps the parent's data
+        assert manifest["dev_tool_versions"] == {"git": "git 2.0"}
+        assert [path.name for path in (changed / "fonts").iterdir()] == ["Font.ttf"]
+
+        inventory = (changed / "inventory.md").read_text(encoding="utf-8")
+        assert "- `+` Pages" in inventory
+        assert '- `-` brew "git"' in inventory
+        assert "dev_env scan failed" in inventory
+
+        # Restore resolves unchanged fonts through the parent chain
+        restore_manager = RestoreManager(changed)
+        assert restore_manager.manifest_data == manifest
+        font_source = restore_manager._font_source("Family/Font.ttf")
+        assert font_source == parent / "fonts" / "Family" / "Font.ttf"
+        font_source = restore_manager._font_source("Font.ttf")
+        assert font_source == changed / "fonts" / "Font.ttf"
+
+    @pytest.mark.parametrize("compression", ["gz", "xz", "bz2", "none"])
+    def test_archive_streams_backup(self, compression: str) -> None:
+        """Test that an archive holds the manifest, inventory and fonts."""
+        output = io.BytesIO()
+        sizes: List[int] = []
+        with patch("macbac.host_facts.subprocess.run") as mock_run:
+            mock_run.return_value = Mock(stdout="15.0.0\n")
+            with ArchiveWriter(output, "macbac_backup_1", compression, 1) as archive:
+                StorageManager().write_archive(self.backup_data, archive, sizes.append)
+
+        assert len(sizes) == 3
+        assert list(self.output_dir.iterdir()) == []
+
+        output.seek(0)
+        with tarfile.open(fileobj=output, mode="r:*") as tar:
+            names = tar.getnames()
+            assert names[:2] == [
+                "macbac_backup_1/manifest.jsonl",
+                "macbac_backup_1/inventory.md",
+            ]
+            assert sorted(names[2:-1]) == [
+                "macbac_backup_1/fonts/Copy.otf",
+                "macbac_backup_1/fonts/Family/Font.ttf",
+                "macbac_backup_1/fonts/Font.ttf",
+            ]
+            # Digests follow the fonts they were taken of
+            assert names[-1] == "macbac_backup_1/font_hashes.json"
+            font = tar.extractfile("macbac_backup_1/fonts/Family/Font.ttf")
+            assert font is not None and font.read() == b"family font data"
+            manifest_file = tar.extractfile("macbac_backup_1/manifest.jsonl")
+            assert manifest_file is not None
+            manifest = ManifestFile.from_bytes(manifest_file.read()).to_dict()
+            hashes_file = tar.extractfile("macbac_backup_1/font_hashes.json")
+            assert hashes_file is not None
+            font_hashes = json.loads(hashes_file.read())
+
+        assert "font_hashes" not in manifest
+        assert font_hashes["Family/Font.ttf"] == (
+            hashlib.sha256(b"family font data").hexdigest()
+        )
+
+    def test_archive_digests_match_archived_bytes(self) -> None:
+        """Test that a font changing while it is archived keeps a true digest."""
+        output = io.BytesIO()
+        font_path = Path(self.backup_data["fonts"]["font_files"][0]["path"])
+        original = font_path.read_bytes()
+        add_file = ArchiveWriter.add_file
+
+        def changing_add_file(
+            archive: ArchiveWriter, name: str, path: Path
+        ) -> Tuple[int, str]:
+            # The font is rewritten between the scan and archiving
+            if path == font_path:
+                path.write_bytes(original.upper())
+            return add_file(archive, name, path)
+
+        with (
+            patch("macbac.host_facts.subprocess.run") as mock_run,
+            patch.object(ArchiveWriter, "add_file", changing_add_file),
+        ):
+            mock_run.return_value = Mock(stdout="15.0.0\n")
+            with ArchiveWriter(output, "macbac_backup_1", "none") as archive:
+                StorageManager().write_archive(self.backup_data, archive)
+
+        output.seek(0)
+        with tarfile.open(fileobj=output, mode="r:") as tar:
+            hashes_file = tar.extractfile("macbac_backup_1/font_hashes.json")
+            assert hashes_file is not None
+            font_hashes = json.loads(hashes_file.read())
+            for name, digest in font_hashes.items():
+                member = tar.extractfile(f"macbac_backup_1/fonts/{name}")
+                assert member is not None
+                assert hashlib.sha256(member.read()).hexdigest() == digest
+
+        # Restores read the digests from the end of the archive
+        archive_path = self.temp_dir / "backup.tar"
+        archive_path.write_bytes(output.getvalue())
+        restore_manager = RestoreManager(archive_path)
+        try:
+            assert restore_manager._font_hashes() == font_hashes
+        finally:
+            restore_manager.close()
+
+    def test_archive_rejects_invalid_compression_level(self) -> None:
+        """Test that levels outside the compressor's range are refused."""
+        with pytest.raises(ValueError):
+            ArchiveWriter(io.BytesIO(), "backup", "bz2", 0)
+
+    def test_archive_compression_from_extension(self) -> None:
+        """Test that the compression follows the archive's file name."""
+        assert compression_for("backup.tar.xz") == "xz"
+        assert compression_for("backup.TGZ") == "gz"
+        assert compression_for("backup.tar") == "none"
+        assert compression_for("-") == "gz"
+
+
+class TestManifestDelta:
+    """Test cases for manifest deltas."""
+
+    def test_round_trip(self) -> None:
+        """Test that a delta read on top of its parent reproduces the child."""
+        parent = {
+            "backup_info": {"date": "1"},
+            "appstore": [{"id": "1", "name": "A"}, {"id": "2", "name": "B"}],
+            "homebrew": {"brewfile": 'tap "x"\nbrew "a"\nbrew "b"'},
+            "fonts": ["a.ttf"],
+            "font_hashes": {"a.ttf": "1"},
+            "legacy": True,
+        }
+        child = {
+            "backup_info": {"date": "2"},
+            "appstore": [{"id": "2", "name": "B 2.0"}, {"id": "3", "name": "C"}],
+            "homebrew": {"brewfile": 'tap "x"\nbrew "b"\ncask "c"'},
+            "fonts": ["a.ttf"],
+            "font_hashes": {"a.ttf": "2"},
+            "dev_tools": ["git"],
+        }
+
+        delta = diff_manifests(parent, child)
+
+        assert "fonts" not in delta["delta"]
+        assert delta["removed_sections"] == ["legacy"]
+        # Restores resolve each section through the manifest chain
+        manifest = BackupManifest(
+            [
+                ManifestFile.from_bytes(encode_manifest(delta)),
+                ManifestFile.from_bytes(encode_manifest(parent)),
+            ]
+        )
+        assert manifest.to_dict() == child
+
+    def test_describe_changes_reports_upgrades(self) -> None:
+        """Test that upgraded apps and tools are changes, not an add and remove."""
+        parent = {
+            "backup_info": {"date": "1"},
+            "manual_apps": [
+                {"name": "Foo", "path": "/Applications/Foo.app", "version": "1.0"},
+                {"name": "Bar", "path": "/Applications/Bar.app", "version": "3.1"},
+            ],
+            "homebrew": {"brewfile": 'brew "a"\nbrew "b"'},
+            "dev_tool_versions": {"git": "git version 2.40.0", "node": "v20"},
+        }
+        child = {
+            "backup_info": {"date": "2"},
+            "manual_apps": [
+                {"name": "Foo", "path": "/Applications/Foo.app", "version": "2.0"},
+                {"name": "Baz", "path": "/Applications/Baz.app", "version": "1.0"},
+            ],
+            "homebrew": {"brewfile": 'brew "a"\nbrew "c"'},
+            "dev_tool_versions": {"git": "git version 2.41.0", "go": "go1.22"},
+        }
+
+        changes = describe_changes(parent, child)
+
+        assert changes["manual_apps"] == {
+            "added": [child["manual_apps"][1]],
+            "removed": [parent["manual_apps"][1]],
+            "changed": ["Foo: version 1.0 → 2.0"],
+        }
+        assert changes["dev_tool_versions"] == {
+            "added": ["go"],
+            "removed": ["node"],
+            "changed": ["git: git version 2.40.0 → git version 2.41.0"],
+        }
+        # Only multi-line strings such as the Brewfile are compared by line
+        assert changes["homebrew"] == {
+            "added": ['brew "c"'],
+            "removed": ['brew "b"'],
+            "changed": [],
+        }
+
+    def test_find_latest_backup(self) -> None:
+        """Test that the newest backup with a manifest is found."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = Path(temp_dir)
+            for name in ("macbac_backup_20250101_000000", "macbac_backup_20250301"):
+                (output_dir / name).mkdir()
+                (output_dir / name / "manifest.json").write_text("{}")
+            (output_dir / "macbac_backup_20251231_000000").mkdir()
+
+            latest = find_latest_backup(output_dir)
+            assert latest == output_dir / "macbac_backup_20250301"
+            assert find_latest_backup(output_dir, exclude=latest) == (
+                output_dir / "macbac_backup_20250101_000000"
+            )
+
+
+class TestSectionedManifest:
+    """Test cases for the sectioned manifest format."""
+
+    def setup_method(self) -> None:
+        """Set up a manifest with several sections."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+        # Caches and journals go to the temporary directory, not the user's
+        self.env = patch.dict(
+            os.environ,
+            {
+                "XDG_CACHE_HOME": str(self.temp_dir / "cache"),
+                "XDG_STATE_HOME": str(self.temp_dir / "state"),
+            },
+        )
+        self.env.start()
+        self.manifest: Dict[str, Any] = {
+            "backup_info": {"date": "2025-01-07T10:30:00", "macos_version": "15.0"},
+            "appstore": [{"id": "1", "name": "Xcode"}, {"id": "2", "name": "Pages"}],
+            "homebrew": {"brewfile": 'tap "a/b"\nbrew "git"\n'},
+            "fonts": ["Font.ttf"],
+            "manual_apps": [],
+        }
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        self.env.stop()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_round_trip(self) -> None:
+        """Test that full and delta manifests decode to what was encoded."""
+        path = self.temp_dir / "manifest.jsonl"
+        data = write_manifest(path, self.manifest)
+        assert data == path.read_bytes() == encode_manifest(self.manifest)
+        assert ManifestFile.from_bytes(data).to_dict() == self.manifest
+
+        child = dict(self.manifest, fonts=[], backup_info={"parent": "p"})
+        delta = diff_manifests(self.manifest, child)
+        assert ManifestFile.from_bytes(encode_manifest(delta)).to_dict() == delta
+
+    def test_summary_reads_only_the_header(self) -> None:
+        """Test that the restore summary doesn't decode any section."""
+        write_manifest(self.temp_dir / "manifest.jsonl", self.manifest)
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with patch("macbac.restore.console"):
+            restore_manager.show_backup_summary()
+
+        manifest = restore_manager.manifest_data
+        assert manifest.count("appstore") == 2
+        assert manifest.count("homebrew") == 2
+        assert manifest.manifests[0]._sections == {}
+        assert manifest["fonts"] == ["Font.ttf"]
+        assert list(manifest.manifests[0]._sections) == ["fonts"]
+
+    def test_corrupt_section_is_detected(self) -> None:
+        """Test that a section not matching its checksum is rejected."""
+        path = self.temp_dir / "manifest.jsonl"
+        write_manifest(path, self.manifest)
+        path.write_bytes(path.read_bytes().replace(b"Xcode", b"Xcodf"))
+
+        manifest = ManifestFile.open(path)
+        assert manifest.section("fonts") == ["Font.ttf"]
+        with pytest.raises(ValueError, match="appstore"):
+            manifest.section("appstore")
@@ -0,0 +1,89 @@
+"""Tests for the persistent cache module."""
+
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from macbac.cache import PersistentCache, file_fingerprint
+
+
+class TestPersistentCache:
+    """Test cases for PersistentCache."""
+
+    def setup_method(self) -> None:
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cache_path = self.temp_dir / "cache.json"
+        self.tracked_file = self.temp_dir / "tracked"
+        self.tracked_file.write_text("v1")
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_round_trip(self) -> None:
+        """Test that saved entries are returned by a new cache instance."""
+        fingerprint = file_fingerprint(str(self.tracked_file))
+        cache = PersistentCache(self.cache_path)
+        cache.put("key", fingerprint, {"version": "1.0"})
+        cache.save()
+
+        reloaded = PersistentCache(self.cache_path)
+        assert reloaded.get("key", fingerprint) == {"version": "1.0"}
+
+    def test_changed_fingerprint_invalidates(self) -> None:
+        """Test that an entry is dropped once its file changes."""
+        cache = PersistentCache(self.cache_path)
+        cache.put("key", file_fingerprint(str(self.tracked_file)), "value")
+
+        self.tracked_file.write_text("version two")
+
+        assert cache.get("key", file_fingerprint(str(self.tracked_file))) is None
+        assert len(cache) == 0
+
+    def test_max_age_expires_entries(self) -> None:
+        """Test that entries older than max_age are not returned."""
+        cache = PersistentCache(self.cache_path, max_age=60)
+        with patch("time.time", return_value=1000.0):
+            cache.put("key", [1, 2, 3], "value")
+        with patch("time.time", return_value=1061.0):
+            assert cache.get("key", [1, 2, 3]) is None
+
+    def test_lru_eviction(self) -> None:
+        """Test that the least recently used entry is evicted first."""
+        cache = PersistentCache(self.cache_path, max_entries=2)
+        cache.put("a", [1], "a")
+        cache.put("b", [1], "b")
+        assert cache.get("a", [1]) == "a"
+
+        cache.put("c", [1], "c")
+
+        assert cache.get("b", [1]) is None
+        assert cache.get("a", [1]) == "a"
+        assert cache.get("c", [1]) == "c"
+
+    def test_hits_do_not_rewrite_the_file(self) -> None:
+        """Test that saving after only cache hits leaves the file alone."""
+        cache = PersistentCache(self.cache_path)
+        cache.put("key", [1], "value")
+        cache.save()
+
+        reloaded = PersistentCache(self.cache_path)
+        assert reloaded.get("key", [1]) == "value"
+        with patch("macbac.cache.os.replace") as replace:
+            reloaded.save()
+        replace.assert_not_called()
+
+    def test_corrupt_file_starts_empty(self) -> None:
+        """Test that an unreadable cache file is ignored."""
+        self.cache_path.write_text("not json")
+        cache = PersistentCache(self.cache_path)
+        assert len(cache) == 0
+
+        cache.put("key", [1], "value")
+        cache.save()
+        data = json.loads(self.cache_path.read_text())
+        assert data["entries"]["key"]["value"] == "value"
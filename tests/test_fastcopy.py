@@ -0,0 +1,97 @@
+"""Tests for the fastcopy module."""
+
+import errno
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from macbac.fastcopy import copy_file
+
+
+class TestCopyFile:
+    """Test cases for copy_file."""
+
+    def setup_method(self) -> None:
+        """Set up a source file with distinctive metadata."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.src = self.temp_dir / "src.ttf"
+        self.src.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+        os.chmod(self.src, 0o640)
+        os.utime(self.src, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+        self.dst = self.temp_dir / "dst.ttf"
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _assert_copied(self) -> None:
+        assert self.dst.read_bytes() == self.src.read_bytes()
+        src_stat = self.src.stat()
+        dst_stat = self.dst.stat()
+        assert dst_stat.st_mode == src_stat.st_mode
+        assert dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+    def test_copies_data_and_metadata(self) -> None:
+        """Test that contents, permissions and timestamps are preserved."""
+        self.dst.write_bytes(b"stale contents that are longer than nothing")
+
+        assert copy_file(self.src, self.dst) == self.src.stat().st_size
+        self._assert_copied()
+
+    def test_falls_back_when_kernel_copy_is_unsupported(self) -> None:
+        """Test the fallbacks when reflinks and copy_file_range aren't usable."""
+        unsupported = OSError(errno.EXDEV, "cross-device")
+        with (
+            patch("macbac.fastcopy._clone_file", return_value=False),
+            patch("macbac.fastcopy.os.copy_file_range", side_effect=unsupported),
+        ):
+            copy_file(self.src, self.dst)
+        self._assert_copied()
+
+        self.dst.unlink()
+        with (
+            patch("macbac.fastcopy._clone_file", return_value=False),
+            patch("macbac.fastcopy.os.copy_file_range", side_effect=unsupported),
+            patch("macbac.fastcopy.os.sendfile", side_effect=unsupported),
+        ):
+            copy_file(self.src, self.dst)
+        self._assert_copied()
+
+    def test_macos_falls_back_to_copyfile_when_clonefile_fails(self) -> None:
+        """Test that a failed clonefile on macOS ends in shutil.copyfile."""
+        import shutil
+
+        # clonefile fails across volumes, and macOS sendfile only writes to
+        # sockets
+        clonefile = Mock(return_value=-1)
+        not_a_socket = OSError(errno.ENOTSOCK, "Socket operation on non-socket")
+        with (
+            patch("macbac.fastcopy.sys.platform", "darwin"),
+            patch("macbac.fastcopy._macos_clonefile", return_value=clonefile),
+            patch("macbac.fastcopy.os.sendfile", side_effect=not_a_socket),
+            patch(
+                "macbac.fastcopy.shutil.copyfile", wraps=shutil.copyfile
+            ) as mock_copyfile,
+        ):
+            copy_file(self.src, self.dst)
+
+        clonefile.assert_called_once()
+        mock_copyfile.assert_called_once_with(self.src, self.dst)
+        self._assert_copied()
+
+    def test_real_errors_are_raised(self) -> None:
+        """Test that failures other than missing support aren't masked."""
+        with (
+            patch("macbac.fastcopy._clone_file", return_value=False),
+            patch(
+                "macbac.fastcopy.os.copy_file_range",
+                side_effect=OSError(errno.ENOSPC, "No space left on device"),
+            ),
+            pytest.raises(OSError),
+        ):
+            copy_file(self.src, self.dst)
@@ -0,0 +1,94 @@
+"""Tests for the journal module."""
+
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from macbac.journal import RestoreJournal, journal_path
+
+
+class TestRestoreJournal:
+    """Test cases for RestoreJournal."""
+
+    def setup_method(self) -> None:
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / "journals" / "backup.jsonl"
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_actions_survive_reopening(self) -> None:
+        """Test that a new journal sees what an earlier one recorded."""
+        journal = RestoreJournal(self.path)
+        journal.record("homebrew", 'brew "git"')
+        journal.record("appstore", "497799835")
+        journal.record("homebrew", 'brew "git"')
+        journal.close()
+
+        reopened = RestoreJournal(self.path)
+        assert len(reopened) == 2
+        assert reopened.is_done("homebrew", 'brew "git"')
+        assert reopened.is_done("appstore", "497799835")
+        assert not reopened.is_done("appstore", 'brew "git"')
+        assert len(self.path.read_text().splitlines()) == 2
+
+    def test_recorded_lines_are_flushed_immediately(self) -> None:
+        """Test that a killed restore still leaves its actions on disk."""
+        journal = RestoreJournal(self.path, sync_every=1000, sync_interval=3600)
+        journal.record("homebrew", 'cask "firefox"')
+
+        # Not closed, as if the process had been killed
+        assert RestoreJournal(self.path).is_done("homebrew", 'cask "firefox"')
+        journal.close()
+
+    def test_syncs_are_batched(self) -> None:
+        """Test that the journal is synced once per batch of actions."""
+        journal = RestoreJournal(self.path, sync_every=3, sync_interval=3600)
+        with patch("macbac.journal.os.fsync") as mock_fsync:
+            for i in range(7):
+                journal.record("homebrew", f"entry {i}")
+            assert mock_fsync.call_count == 2
+            journal.close()
+            assert mock_fsync.call_count == 3
+
+    def test_truncated_last_line_is_ignored(self) -> None:
+        """Test that a line cut short by a crash doesn't break loading."""
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text('{"category": "appstore", "item": "1"}\n{"category": "app')
+
+        journal = RestoreJournal(self.path)
+
+        assert len(journal) == 1
+        assert journal.is_done("appstore", "1")
+
+        # Actions recorded afterwards start on a line of their own
+        journal.record("appstore", "2")
+        journal.close()
+        assert RestoreJournal(self.path).is_done("appstore", "2")
+
+    def test_reset_starts_over(self) -> None:
+        """Test that resetting forgets every action."""
+        journal = RestoreJournal(self.path)
+        journal.record("appstore", "1")
+        journal.reset()
+        journal.record("appstore", "2")
+        journal.close()
+
+        reopened = RestoreJournal(self.path)
+        assert not reopened.is_done("appstore", "1")
+        assert reopened.is_done("appstore", "2")
+
+    def test_journal_path_is_per_backup(self) -> None:
+        """Test that each backup gets its own journal in the state dir."""
+        with patch.dict(os.environ, {"XDG_STATE_HOME": str(self.temp_dir)}):
+            first = journal_path(self.temp_dir / "a" / "macbac_backup_1")
+            second = journal_path(self.temp_dir / "b" / "macbac_backup_1")
+
+        assert first != second
+        assert first.parent == self.temp_dir / "macbac" / "journals"
+        assert first.name.startswith("macbac_backup_1-")
@@ -0,0 +1,129 @@
+"""Tests for the process module."""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from macbac.process import (
+    ProcessLog,
+    ProcessResult,
+    _split_lines,
+    parse_progress,
+    run_streaming,
+)
+
+
+def python(code: str) -> List[str]:
+    return [sys.executable, "-c", code]
+
+
+class TestRunStreaming:
+    """Test cases for run_streaming."""
+
+    def setup_method(self) -> None:
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_lines_arrive_while_running(self) -> None:
+        """Test that each line is handled before the command exits."""
+        marker = self.temp_dir / "done"
+        seen: List[bool] = []
+        code = (
+            "import sys, time, pathlib\n"
+            "print('first', flush=True)\n"
+            "time.sleep(0.3)\n"
+            f"pathlib.Path({str(marker)!r}).touch()\n"
+            "print('second', flush=True)\n"
+        )
+
+        result = run_streaming(
+            python(code), on_line=lambda line: seen.append(marker.exists())
+        )
+
+        assert result.returncode == 0
+        assert result.tail == ["first", "second"]
+        # The first line was seen before the command got to its second
+        assert seen == [False, True]
+
+    def test_tail_is_bounded(self) -> None:
+        """Test that only the last lines of long output are kept."""
+        code = "import sys\nfor i in range(10000):\n    print(i)\nsys.exit(3)"
+
+        result = run_streaming(python(code), tail_lines=5)
+
+        assert result.tail == ["9995", "9996", "9997", "9998", "9999"]
+        assert result.error == "9999"
+
+    def test_stderr_and_carriage_returns(self) -> None:
+        """Test that stderr is read and progress redraws end lines."""
+        code = (
+            "import sys\n"
+            "sys.stdout.write('10%\\r50%\\r100%\\n')\n"
+            "sys.stdout.flush()\n"
+            "sys.stderr.write('\\x1b[31mError: failed\\x1b[0m\\n')\n"
+            "sys.exit(1)"
+        )
+
+        result = run_streaming(python(code))
+
+        assert sorted(result.tail) == sorted(["10%", "50%", "100%", "Error: failed"])
+        assert result.tail[:3] == ["10%", "50%", "100%"]
+
+    def test_error_without_output(self) -> None:
+        """Test the error reported for a silent failure."""
+        result = run_streaming(python("import sys; sys.exit(2)"))
+
+        assert result.error == "exit status 2"
+        assert ProcessResult(["true"], 0, ["noise"]).error is None
+
+    def test_timeout_kills_command(self) -> None:
+        """Test that a command running too long is killed."""
+        code = "import time\nprint('started', flush=True)\ntime.sleep(30)"
+
+        with pytest.raises(subprocess.TimeoutExpired) as excinfo:
+            run_streaming(python(code), timeout=0.5)
+
+        assert excinfo.value.output == "started"
+
+    def test_log_records_full_output(self) -> None:
+        """Test that the log holds every line, not only the tail."""
+        log = ProcessLog(self.temp_dir / "restore.log")
+        command = python("for i in range(3): print(i)")
+
+        run_streaming(command, log=log, tail_lines=1)
+        log.close()
+
+        lines = (self.temp_dir / "restore.log").read_text().splitlines()
+        assert lines[0] == f"$ {' '.join(command)}"
+        assert [line.rsplit(" ", 1)[-1] for line in lines[1:4]] == ["0", "1", "2"]
+        assert lines[-1].endswith("exit status 0")
+
+
+class TestParsing:
+    """Test cases for splitting and parsing output."""
+
+    def test_split_lines_keeps_unfinished_rest(self) -> None:
+        """Test that partial lines wait for the rest of their data."""
+        assert _split_lines(b"one\ntwo\r\nthr") == ([b"one", b"two"], b"thr")
+        # "\r" may be followed by "\n" in the next read
+        assert _split_lines(b"one\r") == ([], b"one\r")
+        assert _split_lines(b"one\r\n") == ([b"one"], b"")
+
+    def test_parse_progress(self) -> None:
+        """Test that steps and percentages are picked out of output."""
+        assert parse_progress("==> Pouring git--2.45.bottle.tar.gz") == (
+            "Pouring git--2.45.bottle.tar.gz",
+            None,
+        )
+        assert parse_progress("######   45.5%") == (None, 45.5)
+        assert parse_progress("Installed 3 packages") == (None, None)
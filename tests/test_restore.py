@@ -1,15 +1,30 @@
 """Tests for the restore module."""
 
+import hashlib
 import json
+import os
 import subprocess
 import tempfile
+import threading
+import zipfile
 from pathlib import Path
-from typing import Any
-from unittest.mock import Mock, patch
+from typing import Any, Dict, List
+from unittest.mock import ANY, Mock, patch
 
 import pytest
 
-from macbac.restore import RestoreManager
+from macbac.archive import (
+    ArchiveReader,
+    ArchiveWriter,
+    TarArchiveReader,
+    ZipArchiveReader,
+)
+from macbac.brewfile import install_command, parse_brewfile, render_brewfile
+from macbac.journal import RestoreJournal
+from macbac.process import ProcessResult
+from macbac.restore import MissingToolError, RestoreManager
+from macbac.restore_plan import HostState, plan_appstore, plan_fonts, plan_homebrew
+from macbac.scheduler import FAILED, SKIPPED
 
 
 class TestRestoreManager:
@@ -20,6 +35,16 @@ class TestRestoreManager:
         # Create a temporary directory for testing
         self.temp_dir = Path(tempfile.mkdtemp())
 
+        # Caches and journals go to the temporary directory, not the user's
+        self.env = patch.dict(
+            os.environ,
+            {
+                "XDG_CACHE_HOME": str(self.temp_dir / "cache"),
+                "XDG_STATE_HOME": str(self.temp_dir / "state"),
+            },
+        )
+        self.env.start()
+
         # Create a sample manifest.json
         self.manifest_data = {
             "backup_info": {
@@ -54,6 +79,7 @@ class TestRestoreManager:
 
     def teardown_method(self) -> None:
         """Clean up test fixtures."""
+        self.env.stop()
         import shutil
 
         shutil.rmtree(self.temp_dir, ignore_errors=True)
@@ -86,15 +112,20 @@ class TestRestoreManager:
         with pytest.raises(ValueError, match="Invalid manifest file"):
             RestoreManager(invalid_dir)
 
+    @patch("macbac.restore.run_streaming")
     @patch("subprocess.run")
-    def test_restore_appstore_apps_success(self, mock_run: Mock) -> None:
+    def test_restore_appstore_apps_success(
+        self, mock_run: Mock, mock_stream: Mock
+    ) -> None:
         """Test successful App Store apps restoration."""
-        # Mock mas command availability and installation
+        # Mock mas command availability and the list of installed apps
         mock_run.side_effect = [
             Mock(returncode=0),  # which mas
-            Mock(returncode=0),  # mas install Xcode
-            Mock(returncode=0),  # mas install GoodNotes
+            Mock(returncode=0, stdout=""),  # mas list
         ]
+        mock_stream.side_effect = lambda command, **kwargs: ProcessResult(
+            command, 0, []
+        )
 
         restore_manager = RestoreManager(self.temp_dir)
 
@@ -102,14 +133,16 @@ class TestRestoreManager:
         restore_manager.restore_appstore_apps()
 
         # Verify mas commands were called
-        assert mock_run.call_count == 3
+        assert mock_run.call_count == 2
         mock_run.assert_any_call(["which", "mas"], check=True, capture_output=True)
-        mock_run.assert_any_call(
-            ["mas", "install", "497799835"], check=True, capture_output=True, text=True
-        )
-        mock_run.assert_any_call(
-            ["mas", "install", "1444383602"], check=True, capture_output=True, text=True
-        )
+        assert mock_stream.call_count == 2
+        for app_id in ("497799835", "1444383602"):
+            mock_stream.assert_any_call(
+                ["mas", "install", app_id],
+                on_line=ANY,
+                log=None,
+                timeout=1800,
+            )
 
     @patch("subprocess.run")
     def test_restore_appstore_apps_mas_not_installed(self, mock_run: Mock) -> None:
@@ -119,28 +152,73 @@ class TestRestoreManager:
 
         restore_manager = RestoreManager(self.temp_dir)
 
-        # This should not raise an exception but should print error message
-        restore_manager.restore_appstore_apps()
+        # Missing mas fails the restore, so nothing depending on it runs
+        with pytest.raises(MissingToolError, match="mas-cli is not installed"):
+            restore_manager.restore_appstore_apps()
 
         # Only the 'which mas' command should be called
         assert mock_run.call_count == 1
 
+    @patch("macbac.restore.time.sleep")
+    @patch("macbac.restore.run_streaming")
     @patch("subprocess.run")
-    @patch("tempfile.NamedTemporaryFile")
-    def test_restore_homebrew_success(
-        self, mock_tempfile: Mock, mock_run: Mock
+    def test_restore_appstore_apps_retries_transient_failures(
+        self, mock_run: Mock, mock_stream: Mock, mock_sleep: Mock
     ) -> None:
-        """Test successful Homebrew restoration."""
-        # Mock temporary file
-        mock_file = Mock()
-        mock_file.name = "/tmp/test_brewfile"
-        mock_tempfile.return_value.__enter__.return_value = mock_file
+        """Test that only transient install failures are retried."""
+        attempts: Dict[str, int] = {}
+
+        def stream(command: List[str], **kwargs: Any) -> ProcessResult:
+            app_id = command[2]
+            attempts[app_id] = attempts.get(app_id, 0) + 1
+            if app_id == "497799835" and attempts[app_id] == 1:
+                raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+            if app_id == "1444383602":
+                return ProcessResult(
+                    command, 1, ["Error: No apps found in the Mac App Store"]
+                )
+            return ProcessResult(command, 0, [])
+
+        mock_run.return_value = Mock(returncode=0, stdout="")
+        mock_stream.side_effect = stream
 
-        # Mock brew command availability and bundle execution
-        mock_run.side_effect = [
-            Mock(returncode=0),  # which brew
-            Mock(returncode=0, stderr=""),  # brew bundle
-        ]
+        restore_manager = RestoreManager(self.temp_dir)
+        restore_manager.restore_appstore_apps(timeout=60, retries=2, backoff=1)
+
+        assert attempts == {"497799835": 2, "1444383602": 1}
+        mock_sleep.assert_called_once_with(1)
+
+    @patch("macbac.restore.run_streaming")
+    @patch("subprocess.run")
+    def test_restore_appstore_apps_runs_concurrently(
+        self, mock_run: Mock, mock_stream: Mock
+    ) -> None:
+        """Test that installs overlap up to the requested parallelism."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def stream(command: List[str], **kwargs: Any) -> ProcessResult:
+            barrier.wait()
+            kwargs["on_line"]("==> Downloading Xcode")
+            kwargs["on_line"]("42.0% Downloading")
+            return ProcessResult(command, 0, [])
+
+        mock_run.return_value = Mock(returncode=0, stdout="")
+        mock_stream.side_effect = stream
+
+        restore_manager = RestoreManager(self.temp_dir)
+        restore_manager.restore_appstore_apps(max_workers=2, retries=0)
+
+        assert mock_stream.call_count == 2
+
+    @patch("macbac.restore.run_streaming")
+    @patch("subprocess.run")
+    def test_restore_homebrew_success(self, mock_run: Mock, mock_stream: Mock) -> None:
+        """Test successful Homebrew restoration."""
+        # Nothing is installed yet, and every command succeeds
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+        mock_stream.side_effect = lambda command, **kwargs: ProcessResult(
+            command, 0, []
+        )
 
         restore_manager = RestoreManager(self.temp_dir)
 
@@ -148,47 +226,162 @@ class TestRestoreManager:
         restore_manager.restore_homebrew()
 
         # Verify brew commands were called
-        assert mock_run.call_count == 2
         mock_run.assert_any_call(["which", "brew"], check=True, capture_output=True)
-        mock_run.assert_any_call(
-            ["brew", "bundle", "--file", "/tmp/test_brewfile"],
-            capture_output=True,
-            text=True,
-        )
+        for command in (
+            ["brew", "fetch", "--formula", "git"],
+            ["brew", "fetch", "--cask", "visual-studio-code"],
+            ["brew", "tap", "homebrew/bundle"],
+            ["brew", "install", "--formula", "git"],
+            ["brew", "install", "--cask", "visual-studio-code"],
+        ):
+            mock_stream.assert_any_call(command, on_line=ANY, log=None)
+
+    @patch("macbac.restore.run_streaming")
+    @patch("subprocess.run")
+    def test_restore_homebrew_installs_in_order(
+        self, mock_run: Mock, mock_stream: Mock
+    ) -> None:
+        """Test that taps come first and downloads finish before installs."""
+        self.manifest_data["homebrew"] = {
+            "brewfile": 'cask "firefox"\n'
+            'mas "Xcode", id: 497799835\n'
+            'brew "jq"\n'
+            'brew "mysql", restart_service: true\n'
+            'tap "homebrew/cask-fonts"\n'
+        }
+        with open(self.temp_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest_data, f)
+        commands: List[List[str]] = []
+        brewfiles: List[str] = []
+
+        def stream(command: List[str], **kwargs: Any) -> ProcessResult:
+            commands.append(command)
+            if command[:2] == ["brew", "bundle"]:
+                brewfiles.append(Path(command[3]).read_text())
+            if command == ["brew", "install", "--formula", "jq"]:
+                return ProcessResult(command, 1, ["Error: no bottle"])
+            return ProcessResult(command, 0, [])
+
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+        mock_stream.side_effect = stream
 
-    @patch("shutil.copy2")
-    def test_restore_fonts_success(self, mock_copy: Mock) -> None:
+        restore_manager = RestoreManager(self.temp_dir)
+        restore_manager.restore_homebrew(fetch_workers=2)
+
+        actions = commands
+        assert actions[0] == ["brew", "tap", "homebrew/cask-fonts"]
+        assert sorted(c[-1] for c in actions[1:4]) == ["firefox", "jq", "mysql"]
+        assert all(c[1] == "fetch" for c in actions[1:4])
+        assert actions[4:] == [
+            ["brew", "install", "--formula", "jq"],
+            actions[5],
+            ["brew", "install", "--cask", "firefox"],
+            ["mas", "install", "497799835"],
+        ]
+        assert actions[5][:3] == ["brew", "bundle", "--file"]
+        assert brewfiles == ['brew "mysql", restart_service: true\n']
+
+    def test_restore_fonts_success(self) -> None:
         """Test successful font restoration."""
+        home = self.temp_dir / "home"
+
         restore_manager = RestoreManager(self.temp_dir)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            restore_manager.restore_fonts(max_workers=2)
 
-        # Mock the target directory to avoid actual file operations
-        with patch("pathlib.Path.expanduser") as mock_expanduser:
-            # Create a mock Path object that supports / operator
-            mock_target_dir = Mock(spec=Path)
-            mock_target_dir.__truediv__ = Mock(
-                side_effect=lambda x: Path(f"/tmp/mock_fonts/{x}")
-            )
-            mock_expanduser.return_value = mock_target_dir
-
-            # Mock file existence checks
-            def mock_exists(self: Path) -> bool:
-                path_str = str(self)
-                # Fonts backup directory exists
-                if path_str.endswith("fonts"):
-                    return True
-                # Source font files exist
-                if path_str.endswith((".ttf", ".otf")) and "mock_fonts" not in path_str:
-                    return True
-                # Target files don't exist
-                if "mock_fonts" in path_str:
-                    return False
-                return True
-
-            with patch.object(Path, "exists", mock_exists):
-                restore_manager.restore_fonts()
-
-                # Verify copy operations were attempted
-                assert mock_copy.call_count == 2
+        fonts_dir = home / "Library" / "Fonts"
+        assert sorted(os.listdir(fonts_dir)) == ["AnotherFont.otf", "MyCustomFont.ttf"]
+        assert (fonts_dir / "MyCustomFont.ttf").read_text() == "fake font data"
+
+    def _write_font_hashes(self, hashes: Dict[str, str]) -> None:
+        self.manifest_data["font_hashes"] = hashes
+        with open(self.temp_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest_data, f)
+
+    def test_restore_fonts_replaces_changed_fonts(self) -> None:
+        """Test that a stale font with the same name is replaced."""
+        digest = hashlib.sha256(b"fake font data").hexdigest()
+        self._write_font_hashes({"MyCustomFont.ttf": digest, "AnotherFont.otf": digest})
+        home = self.temp_dir / "home"
+        fonts_dir = home / "Library" / "Fonts"
+        fonts_dir.mkdir(parents=True)
+        (fonts_dir / "MyCustomFont.ttf").write_text("truncated")
+        (fonts_dir / "AnotherFont.otf").write_text("fake font data")
+        mtime = (fonts_dir / "AnotherFont.otf").stat().st_mtime_ns
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            plan = restore_manager.plan(["fonts"])["fonts"]
+            restore_manager.restore_fonts()
+
+        assert plan.replacing == ["MyCustomFont.ttf"]
+        assert (fonts_dir / "MyCustomFont.ttf").read_text() == "fake font data"
+        # The up to date font was left alone
+        assert (fonts_dir / "AnotherFont.otf").stat().st_mtime_ns == mtime
+
+    def test_restore_fonts_rejects_corrupt_copies(self) -> None:
+        """Test that a font not matching its digest isn't installed."""
+        self._write_font_hashes(
+            {
+                "MyCustomFont.ttf": hashlib.sha256(b"fake font data").hexdigest(),
+                "AnotherFont.otf": hashlib.sha256(b"other data").hexdigest(),
+            }
+        )
+        home = self.temp_dir / "home"
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            restore_manager.restore_fonts()
+
+        # Neither the corrupt font nor its temporary file is left behind
+        assert os.listdir(home / "Library" / "Fonts") == ["MyCustomFont.ttf"]
+
+    def test_restore_fonts_refuses_paths_outside_fonts_dir(self) -> None:
+        """Test that font names leading out of ~/Library/Fonts aren't restored."""
+        (self.temp_dir / "evil.ttf").write_text("evil")
+        self.manifest_data["fonts"] = [
+            "../evil.ttf",
+            "/tmp/evil.ttf",
+            "MyCustomFont.ttf",
+        ]
+        with open(self.temp_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest_data, f)
+        home = self.temp_dir / "home"
+        fonts_dir = home / "Library" / "Fonts"
+        fonts_dir.mkdir(parents=True)
+        # A symlink in the fonts directory mustn't be followed out of it
+        (fonts_dir / "Escape").symlink_to(self.temp_dir / "outside", True)
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            restore_manager.restore_fonts()
+            with pytest.raises(ValueError, match="Unsafe path"):
+                restore_manager._restore_font("Escape/evil.ttf", fonts_dir, None)
+
+        assert sorted(os.listdir(fonts_dir)) == ["Escape", "MyCustomFont.ttf"]
+        assert not (home / "Library" / "evil.ttf").exists()
+        assert not (self.temp_dir / "outside").exists()
+
+    def test_archive_reader_refuses_unsafe_names(self) -> None:
+        """Test that archive members can't be addressed outside the backup."""
+        archive_path = self.temp_dir / "backup.tar"
+        self._write_archive(archive_path, "none")
+
+        with TarArchiveReader(archive_path) as reader:
+            for name in ("../manifest.json", "/etc/passwd", "fonts/../../x"):
+                with pytest.raises(ValueError, match="Unsafe path"):
+                    reader.read(name)
+            assert reader.has("fonts/AnotherFont.otf")
+
+    def test_incomplete_archive_reader_is_refused(self) -> None:
+        """Test that a reader missing member lookups can't be created."""
+
+        class IncompleteReader(ArchiveReader):
+            def _find_manifest(self) -> str:
+                return "manifest.jsonl"
+
+        with pytest.raises(TypeError):
+            IncompleteReader(self.temp_dir / "backup.tar")  # type: ignore[abstract]
 
     def test_restore_fonts_no_fonts(self) -> None:
         """Test font restoration when no fonts are in backup."""
@@ -212,3 +405,371 @@ class TestRestoreManager:
 
         # We can't easily test rich output, but we can ensure no exceptions
         # The actual output testing would require more complex mocking
+
+    def test_font_cache_is_opened_for_fonts_only(self) -> None:
+        """Test that the installed font cache is only loaded to plan fonts."""
+        self._write_font_hashes(
+            {"MyCustomFont.ttf": hashlib.sha256(b"fake font data").hexdigest()}
+        )
+        restore_manager = RestoreManager(self.temp_dir)
+        cache_path = self.temp_dir / "cache" / "installed_fonts.json"
+        restore_manager.host_state.font_cache_path = cache_path
+
+        restore_manager.show_backup_summary()
+        assert restore_manager.host_state.font_cache is None
+
+        with patch.dict(os.environ, {"HOME": str(self.temp_dir / "home")}):
+            restore_manager.plan(["fonts"])
+        assert restore_manager.host_state.font_cache is not None
+
+    def _write_archive(self, archive_path: Path, compression: str = "gz") -> None:
+        with open(archive_path, "wb") as output:
+            with ArchiveWriter(output, "macbac_backup_1", compression) as archive:
+                archive.add_bytes(
+                    "manifest.json", json.dumps(self.manifest_data).encode("utf-8")
+                )
+                for font_name in self.manifest_data["fonts"]:
+                    archive.add_file(
+                        f"fonts/{font_name}", self.temp_dir / "fonts" / font_name
+                    )
+
+    @pytest.mark.parametrize("compression", ["gz", "none"])
+    def test_summary_from_tar_reads_only_manifest(self, compression: str) -> None:
+        """Test that loading a tar archive stops at the manifest member."""
+        archive_path = self.temp_dir / "backup.tar"
+        self._write_archive(archive_path, compression)
+
+        restore_manager = RestoreManager(archive_path)
+        try:
+            assert restore_manager.manifest_data == self.manifest_data
+            reader = restore_manager.archive
+            assert isinstance(reader, TarArchiveReader)
+            assert list(reader._index) == ["macbac_backup_1/manifest.json"]
+            restore_manager.show_backup_summary()
+        finally:
+            restore_manager.close()
+
+    def test_restore_fonts_from_tar(self) -> None:
+        """Test that fonts are streamed out of a tar archive."""
+        archive_path = self.temp_dir / "backup.tar.gz"
+        self._write_archive(archive_path)
+        home = self.temp_dir / "home"
+
+        restore_manager = RestoreManager(archive_path)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            restore_manager.restore_fonts()
+        restore_manager.close()
+
+        target = home / "Library" / "Fonts" / "AnotherFont.otf"
+        assert target.read_text() == "fake font data"
+        source = self.temp_dir / "fonts" / "AnotherFont.otf"
+        assert int(target.stat().st_mtime) == int(source.stat().st_mtime)
+
+    def test_restore_fonts_from_zip(self) -> None:
+        """Test that fonts are read from a zip archive's members."""
+        archive_path = self.temp_dir / "backup.zip"
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr(
+                "macbac_backup_1/manifest.json", json.dumps(self.manifest_data)
+            )
+            archive.write(
+                self.temp_dir / "fonts" / "MyCustomFont.ttf",
+                "macbac_backup_1/fonts/MyCustomFont.ttf",
+            )
+        home = self.temp_dir / "home"
+
+        restore_manager = RestoreManager(archive_path)
+        assert isinstance(restore_manager.archive, ZipArchiveReader)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            restore_manager.restore_fonts()
+        restore_manager.close()
+
+        fonts_dir = home / "Library" / "Fonts"
+        assert (fonts_dir / "MyCustomFont.ttf").read_text() == "fake font data"
+        assert not (fonts_dir / "AnotherFont.otf").exists()
+
+    @patch("macbac.restore.run_streaming")
+    @patch("subprocess.run")
+    def test_restore_appstore_apps_skips_installed(
+        self, mock_run: Mock, mock_stream: Mock
+    ) -> None:
+        """Test that apps already on this machine aren't installed again."""
+
+        def run(command: List[str], **kwargs: Any) -> Mock:
+            if command == ["mas", "list"]:
+                return Mock(returncode=0, stdout="497799835  Xcode  (15.0)\n")
+            return Mock(returncode=0, stdout="")
+
+        mock_run.side_effect = run
+        mock_stream.side_effect = lambda command, **kwargs: ProcessResult(
+            command, 0, []
+        )
+
+        restore_manager = RestoreManager(self.temp_dir)
+        restore_manager.restore_appstore_apps()
+
+        installs = [c.args[0] for c in mock_stream.call_args_list]
+        assert installs == [["mas", "install", "1444383602"]]
+
+    @patch("subprocess.run")
+    def test_show_plan_changes_nothing(self, mock_run: Mock) -> None:
+        """Test that a dry run only lists the installed software."""
+        mock_run.return_value = Mock(returncode=0, stdout="git\nhomebrew/bundle\n")
+        home = self.temp_dir / "home"
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with patch.dict(os.environ, {"HOME": str(home)}):
+            plans = restore_manager.plan()
+            restore_manager.show_plan()
+
+        assert [entry.line for entry in plans["homebrew"].actions] == [
+            'cask "visual-studio-code"'
+        ]
+        assert len(plans["appstore"].actions) == 2
+        assert plans["fonts"].actions == ["MyCustomFont.ttf", "AnotherFont.otf"]
+        assert plans["fonts"].work_bytes == 2 * len("fake font data")
+        for call in mock_run.call_args_list:
+            assert "install" not in call.args[0]
+            assert "bundle" not in call.args[0]
+        assert not home.exists()
+
+    def test_restore_all_overlaps_independent_categories(self) -> None:
+        """Test that fonts copy during Homebrew, and mas apps wait for it."""
+        fonts_started = threading.Event()
+        homebrew_done = threading.Event()
+        order: List[str] = []
+
+        def restore_homebrew(progress: Any = None) -> None:
+            # Finishes only once fonts are copying alongside it
+            assert fonts_started.wait(timeout=5)
+            order.append("homebrew")
+            homebrew_done.set()
+
+        def restore_appstore_apps(progress: Any = None) -> None:
+            assert homebrew_done.is_set()
+            order.append("appstore")
+
+        def restore_fonts(progress: Any = None) -> None:
+            fonts_started.set()
+            raise OSError("disk full")
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with (
+            patch.object(restore_manager, "restore_homebrew", restore_homebrew),
+            patch.object(
+                restore_manager, "restore_appstore_apps", restore_appstore_apps
+            ),
+            patch.object(restore_manager, "restore_fonts", restore_fonts),
+        ):
+            results = restore_manager.restore_all()
+
+        assert order == ["homebrew", "appstore"]
+        assert results["homebrew"].ok and results["appstore"].ok
+        assert results["fonts"].error == "disk full"
+
+    @patch("subprocess.run")
+    def test_restore_all_fails_categories_without_their_tool(
+        self, mock_run: Mock
+    ) -> None:
+        """Test that a missing brew fails Homebrew and skips the App Store."""
+        mock_run.side_effect = subprocess.CalledProcessError(1, "which")
+        appstore = Mock()
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with (
+            patch.object(restore_manager, "restore_appstore_apps", appstore),
+            patch.object(restore_manager, "restore_fonts"),
+        ):
+            results = restore_manager.restore_all()
+
+        assert results["homebrew"].status == FAILED
+        assert results["homebrew"].error == "Homebrew is not installed"
+        assert results["appstore"].status == SKIPPED
+        appstore.assert_not_called()
+        assert results["fonts"].ok
+
+    def test_restore_all_shares_one_progress_display(self) -> None:
+        """Test that every category draws on the same progress display."""
+        displays: List[Any] = []
+
+        def record(progress: Any = None) -> None:
+            displays.append(progress)
+
+        restore_manager = RestoreManager(self.temp_dir)
+        with (
+            patch.object(restore_manager, "restore_homebrew", record),
+            patch.object(restore_manager, "restore_appstore_apps", record),
+            patch.object(restore_manager, "restore_fonts", record),
+        ):
+            restore_manager.restore_all()
+
+        assert len(displays) == 3
+        assert displays[0] is not None
+        assert all(display is displays[0] for display in displays)
+
+    @patch("macbac.restore.run_streaming")
+    @patch("subprocess.run")
+    def test_interrupted_restore_resumes(
+        self, mock_run: Mock, mock_stream: Mock
+    ) -> None:
+        """Test that a rerun skips what an interrupted restore completed."""
+        journal_file = self.temp_dir / "journal.jsonl"
+        installed: List[str] = []
+
+        def interrupted(command: List[str], **kwargs: Any) -> ProcessResult:
+            if command == ["brew", "install", "--cask", "visual-studio-code"]:
+                raise KeyboardInterrupt
+            installed.append(command[-1])
+            return ProcessResult(command, 0, [])
+
+        def resumed(command: List[str], **kwargs: Any) -> ProcessResult:
+            installed.append(command[-1])
+            return ProcessResult(command, 0, [])
+
+        # brew list and mas list show nothing, so only the journal helps
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+        mock_stream.side_effect = interrupted
+        restore_manager = RestoreManager(
+            self.temp_dir, journal=RestoreJournal(journal_file)
+        )
+        with pytest.raises(KeyboardInterrupt):
+            restore_manager.restore_homebrew()
+        restore_manager.close()
+
+        installed.clear()
+        mock_stream.side_effect = resumed
+        restore_manager = RestoreManager(
+            self.temp_dir, journal=RestoreJournal(journal_file)
+        )
+        plan = restore_manager.plan(["homebrew"])["homebrew"]
+        restore_manager.restore_homebrew()
+        restore_manager.close()
+
+        assert [item.line for item, reason in plan.skipped] == [
+            'tap "homebrew/bundle"',
+            'brew "git"',
+        ]
+        assert {reason for _, reason in plan.skipped} == {"restored earlier"}
+        # Only the cask is downloaded and installed again
+        assert installed == ["visual-studio-code", "visual-studio-code"]
+
+
+class TestBrewfile:
+    """Test cases for Brewfile parsing."""
+
+    def test_parse_brewfile(self) -> None:
+        """Test that entries, names and options are parsed."""
+        entries = parse_brewfile(
+            "# Taps\n"
+            'tap "homebrew/cask-fonts"\n'
+            "\n"
+            'brew "homebrew/core/git"\n'
+            'brew "mysql", restart_service: true, link: false\n'
+            'cask "firefox"\n'
+            'mas "Xcode", id: 497799835\n'
+            "not an entry\n"
+        )
+
+        assert [(e.kind, e.short_name) for e in entries] == [
+            ("tap", "cask-fonts"),
+            ("brew", "git"),
+            ("brew", "mysql"),
+            ("cask", "firefox"),
+            ("mas", "Xcode"),
+        ]
+        assert entries[2].options == {"restart_service": "true", "link": "false"}
+        assert entries[4].mas_id == "497799835"
+        assert render_brewfile(entries[:2]) == (
+            'tap "homebrew/cask-fonts"\nbrew "homebrew/core/git"\n'
+        )
+
+    def test_entries_with_hash_options_go_through_brew_bundle(self) -> None:
+        """Test that an entry whose options aren't plain values keeps them."""
+        cask, plain = parse_brewfile(
+            'cask "firefox", args: { appdir: "~/Applications" }\ncask "iterm2"\n'
+        )
+
+        assert cask.option_text == 'args: { appdir: "~/Applications" }'
+        assert install_command(cask) is None
+        assert install_command(plain) == ["brew", "install", "--cask", "iterm2"]
+
+
+class TestRestorePlan:
+    """Test cases for planning restores against the installed state."""
+
+    def setup_method(self) -> None:
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.target_dir = self.temp_dir / "Fonts"
+        self.target_dir.mkdir()
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_plan_fonts_matches_installed_content(self) -> None:
+        """Test that fonts are compared by content, not by name."""
+        (self.target_dir / "Renamed.ttf").write_bytes(b"installed")
+        (self.target_dir / "Same.ttf").write_bytes(b"different")
+        installed = hashlib.sha256(b"installed").hexdigest()
+        font_hashes = {
+            "Installed.ttf": installed,
+            "Same.ttf": hashlib.sha256(b"new").hexdigest(),
+            "New.ttf": hashlib.sha256(b"new").hexdigest(),
+        }
+
+        plan = plan_fonts(
+            ["Installed.ttf", "Same.ttf", "New.ttf", "Missing.ttf"],
+            font_hashes,
+            self.target_dir,
+            HostState(),
+            lambda name: name != "Missing.ttf",
+            lambda name: 10,
+        )
+
+        assert plan.actions == ["Same.ttf", "New.ttf"]
+        assert plan.replacing == ["Same.ttf"]
+        assert plan.skipped == [
+            ("Installed.ttf", "already installed"),
+            ("Missing.ttf", "not found in backup"),
+        ]
+        assert plan.work_bytes == 20
+
+    def test_plan_fonts_without_digests_compares_names(self) -> None:
+        """Test that fonts of older backups are skipped if the name is taken."""
+        (self.target_dir / "Old.ttf").write_bytes(b"anything")
+
+        plan = plan_fonts(
+            ["Old.ttf", "New.ttf"],
+            {},
+            self.target_dir,
+            HostState(),
+            lambda name: True,
+            lambda name: 0,
+        )
+
+        assert plan.actions == ["New.ttf"]
+        assert plan.skipped == [("Old.ttf", "already exists")]
+
+    @patch("subprocess.run")
+    def test_host_state_is_gathered_once(self, mock_run: Mock) -> None:
+        """Test that planning twice doesn't list installed software twice."""
+        mock_run.return_value = Mock(returncode=0, stdout="git\n")
+        state = HostState()
+
+        for _ in range(2):
+            plan = plan_homebrew('brew "git"\nbrew "node"\n', state)
+            assert [entry.name for entry in plan.actions] == ["node"]
+
+        assert mock_run.call_count == 1
+
+    @patch("subprocess.run")
+    def test_host_state_tolerates_missing_tools(self, mock_run: Mock) -> None:
+        """Test that a failing listing command means nothing is installed."""
+        mock_run.side_effect = FileNotFoundError("mas")
+
+        plan = plan_appstore([{"id": 1, "name": "App"}], HostState())
+
+        assert plan.actions == [{"id": 1, "name": "App"}]
@@ -0,0 +1,465 @@
+"""Tests for the scanner modules."""
+
+import os
+import plistlib
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest.mock import Mock, patch
+
+import pytest
+
+from macbac.cache import PersistentCache
+from macbac.scanners.dev_env_scanner import DevEnvScanner
+from macbac.scanners.font_scanner import FontScanner
+from macbac.scanners.manual_app_scanner import ManualAppScanner
+from macbac.scanners.plist_reader import read_plist_keys
+
+
+def _make_executables(directory: Path, names: List[str]) -> None:
+    """Create executable stub scripts that print a version line."""
+    for name in names:
+        script = directory / name
+        script.write_text(f"#!/bin/sh\necho '{name} 1.0'\n")
+        script.chmod(0o755)
+
+
+class TestDevEnvScanner:
+    """Test cases for DevEnvScanner."""
+
+    def setup_method(self) -> None:
+        """Set up a PATH directory holding every tool binary."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.binaries = [tool["command"].split()[0] for tool in DevEnvScanner.DEV_TOOLS]
+        _make_executables(self.temp_dir, self.binaries)
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch("subprocess.run")
+    def test_scan_probes_tools_concurrently(self, mock_run: Mock) -> None:
+        """Test that version commands overlap and keep DEV_TOOLS order."""
+        scanner = DevEnvScanner(max_workers=len(DevEnvScanner.DEV_TOOLS))
+        barrier = threading.Barrier(len(DevEnvScanner.DEV_TOOLS), timeout=5)
+
+        def run(command: List[str], **kwargs: Any) -> Mock:
+            barrier.wait()
+            name = os.path.basename(command[0])
+            if name == "go":
+                return Mock(returncode=1, stdout="", stderr="")
+            return Mock(returncode=0, stdout=f"{name} 1.0\nextra", stderr="")
+
+        mock_run.side_effect = run
+
+        with patch.dict(os.environ, {"PATH": str(self.temp_dir)}):
+            result = scanner.scan()
+
+        names = [tool["name"] for tool in result["installed_tools"]]
+        expected = [tool["name"] for tool in DevEnvScanner.DEV_TOOLS]
+        expected.remove("go")
+        assert names == expected
+        assert result["missing_tools"][0]["name"] == "go"
+        assert result["installed_tools"][0]["version_info"] == "git 1.0"
+        assert result["total_count"] == len(DevEnvScanner.DEV_TOOLS)
+
+    @patch("subprocess.run")
+    def test_scan_respects_overall_deadline(self, mock_run: Mock) -> None:
+        """Test that probes share one deadline and late tools are missing."""
+        scanner = DevEnvScanner(max_workers=1, probe_timeout=5, deadline=0.2)
+        timeouts: List[float] = []
+
+        def run(command: List[str], timeout: float, **kwargs: Any) -> Mock:
+            timeouts.append(timeout)
+            time.sleep(0.15)
+            raise subprocess.TimeoutExpired(command, timeout)
+
+        mock_run.side_effect = run
+
+        started = time.monotonic()
+        with patch.dict(os.environ, {"PATH": str(self.temp_dir)}):
+            result = scanner.scan()
+
+        assert time.monotonic() - started < 1
+        assert result["installed_count"] == 0
+        assert result["missing_count"] == len(DevEnvScanner.DEV_TOOLS)
+        assert len(timeouts) < len(DevEnvScanner.DEV_TOOLS)
+        assert all(timeout <= 0.2 for timeout in timeouts)
+
+    def test_scan_skips_tools_not_on_path(self) -> None:
+        """Test that only tools found on PATH are spawned, by absolute path."""
+        lean_dir = self.temp_dir / "lean"
+        lean_dir.mkdir()
+        _make_executables(lean_dir, ["git"])
+        # Not executable, so it must not count as installed
+        (lean_dir / "node").write_text("not a program")
+
+        scanner = DevEnvScanner()
+        with (
+            patch.dict(os.environ, {"PATH": f"{lean_dir}{os.pathsep}/nonexistent"}),
+            patch("subprocess.run", wraps=subprocess.run) as mock_run,
+        ):
+            result = scanner.scan()
+
+        assert mock_run.call_count == 1
+        assert mock_run.call_args[0][0] == [str(lean_dir / "git"), "--version"]
+        assert [tool["name"] for tool in result["installed_tools"]] == ["git"]
+        assert result["installed_tools"][0]["path"] == str(lean_dir / "git")
+        assert result["installed_tools"][0]["version_info"] == "git 1.0"
+        assert all(tool["path"] is None for tool in result["missing_tools"])
+
+    def test_scan_reuses_cached_versions(self) -> None:
+        """Test that unchanged binaries are answered from the cache."""
+        cache = PersistentCache(self.temp_dir / "cache" / "dev_tools.json")
+        scanner = DevEnvScanner(cache=cache)
+
+        with patch.dict(os.environ, {"PATH": str(self.temp_dir)}):
+            first = scanner.scan()
+
+            # A fresh cache object reads what the first scan saved
+            scanner.cache = PersistentCache(cache.path)
+            with patch("subprocess.run") as mock_run:
+                second = scanner.scan()
+            assert mock_run.call_count == 0
+            assert second["installed_tools"] == first["installed_tools"]
+
+            # Rewriting a binary changes its identity and forces a new probe
+            git = self.temp_dir / "git"
+            git.write_text("#!/bin/sh\necho 'git 2.0 (upgraded)'\n")
+            os.utime(git, ns=(0, 1_000_000_000))
+            third = scanner.scan()
+
+        versions = {
+            tool["name"]: tool["version_info"] for tool in third["installed_tools"]
+        }
+        assert versions["git"] == "git 2.0 (upgraded)"
+        assert versions["node"] == "node 1.0"
+
+    def test_scan_does_not_cache_stubs_and_shims(self) -> None:
+        """Test that launchers whose toolchain can change are probed every time."""
+        shims_dir = self.temp_dir / "pyenv" / "shims"
+        shims_dir.mkdir(parents=True)
+        _make_executables(shims_dir, ["python3"])
+        stub_dir = self.temp_dir / "stubs"
+        stub_dir.mkdir()
+        _make_executables(stub_dir, ["git"])
+        cache = PersistentCache(self.temp_dir / "cache" / "dev_tools.json")
+        scanner = DevEnvScanner(cache=cache)
+
+        with (
+            patch.dict(os.environ, {"PATH": f"{shims_dir}{os.pathsep}{stub_dir}"}),
+            patch.object(DevEnvScanner, "STUB_DIRS", [str(stub_dir)]),
+        ):
+            scanner.scan()
+            with patch("subprocess.run", wraps=subprocess.run) as mock_run:
+                result = scanner.scan()
+
+        assert mock_run.call_count == 2
+        assert len(cache) == 0
+        assert result["installed_count"] == 2
+
+
+def _make_app(
+    apps_dir: Path,
+    name: str,
+    plist: Optional[Dict[str, Any]] = None,
+    receipt: bool = False,
+    fmt: plistlib.PlistFormat = plistlib.FMT_XML,
+) -> Path:
+    """Create a fake .app bundle with an optional Info.plist and receipt."""
+    app_path = apps_dir / f"{name}.app"
+    contents = app_path / "Contents"
+    contents.mkdir(parents=True)
+    if plist is not None:
+        with open(contents / "Info.plist", "wb") as f:
+            plistlib.dump(plist, f, fmt=fmt)
+    if receipt:
+        (contents / "_MASReceipt").mkdir()
+        (contents / "_MASReceipt" / "receipt").write_bytes(b"receipt")
+    return app_path
+
+
+class TestManualAppScanner:
+    """Test cases for ManualAppScanner."""
+
+    def setup_method(self) -> None:
+        """Set up an Applications directory with assorted bundles."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.apps_dir = self.temp_dir / "Applications"
+        self.apps_dir.mkdir()
+        self.cellar_dir = self.temp_dir / "Caskroom"
+        self.cellar_dir.mkdir()
+
+        _make_app(
+            self.apps_dir,
+            "Sublime Text",
+            {
+                "CFBundleName": "Sublime Text",
+                "CFBundleIdentifier": "com.sublimetext.4",
+                "CFBundleShortVersionString": "4.0",
+            },
+        )
+        _make_app(self.apps_dir, "Xcode", {"CFBundleName": "Xcode"}, receipt=True)
+        _make_app(
+            self.apps_dir,
+            "Sandboxed",
+            {"CFBundleName": "Sandboxed", "com.apple.security.app-sandbox": True},
+            fmt=plistlib.FMT_BINARY,
+        )
+        _make_app(
+            self.apps_dir,
+            "Brewed",
+            {"CFBundleName": "Brewed", "CFBundleIdentifier": "org.homebrew.brewed"},
+        )
+        # A cask symlinked from a Homebrew location
+        cask = _make_app(self.cellar_dir, "Cask", {"CFBundleName": "Cask"})
+        (self.apps_dir / "Cask.app").symlink_to(cask)
+        # No Info.plist at all: not reported
+        _make_app(self.apps_dir, "Broken")
+        # Unparsable Info.plist: reported with basic information
+        garbled = _make_app(self.apps_dir, "Garbled")
+        (garbled / "Contents" / "Info.plist").write_bytes(b"garbage")
+        (self.apps_dir / "README.txt").write_text("not an app")
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _scan(self, cache: Optional[PersistentCache] = None) -> Dict[str, Any]:
+        scanner = ManualAppScanner(
+            app_dirs=[self.apps_dir, self.temp_dir / "missing"], cache=cache
+        )
+        with patch.object(
+            ManualAppScanner, "HOMEBREW_PREFIXES", [f"{self.cellar_dir}/"]
+        ):
+            return scanner.scan()
+
+    def test_scan_classifies_bundles(self) -> None:
+        """Test that App Store, sandboxed and Homebrew bundles are filtered."""
+        result = self._scan()
+
+        apps = sorted(result["apps"], key=lambda app: app["path"])
+        assert [app["name"] for app in apps] == ["Garbled", "Sublime Text"]
+        assert apps[0] == {
+            "name": "Garbled",
+            "path": str(self.apps_dir / "Garbled.app"),
+            "bundle_id": "unknown",
+            "version": "unknown",
+            "display_name": "Garbled",
+        }
+        assert apps[1]["bundle_id"] == "com.sublimetext.4"
+        assert apps[1]["version"] == "4.0"
+        assert result["all_apps_count"] == 6
+        assert result["scanned_directories"] == [
+            str(self.apps_dir),
+            f"{self.temp_dir / 'missing'} (not found)",
+        ]
+
+    def test_scan_parses_each_plist_once(self) -> None:
+        """Test that every Info.plist is parsed a single time."""
+        with patch(
+            "macbac.scanners.manual_app_scanner.read_plist_keys",
+            wraps=read_plist_keys,
+        ) as mock_read:
+            self._scan()
+
+        assert mock_read.call_count == 6
+
+    def test_scan_reuses_cached_bundles(self) -> None:
+        """Test that only changed bundles are parsed again and deleted ones evicted."""
+        cache_path = self.temp_dir / "cache" / "app_bundles.json"
+        first = self._scan(cache=PersistentCache(cache_path))
+
+        with patch(
+            "macbac.scanners.manual_app_scanner.read_plist_keys",
+            wraps=read_plist_keys,
+        ) as mock_read:
+            second = self._scan(cache=PersistentCache(cache_path))
+        assert mock_read.call_count == 0
+        assert second == first
+
+        # Upgrade one app and delete another
+        with open(self.apps_dir / "Sublime Text.app/Contents/Info.plist", "wb") as f:
+            plistlib.dump({"CFBundleName": "Sublime Text", "CFBundleVersion": "5"}, f)
+        os.utime(self.apps_dir / "Sublime Text.app/Contents/Info.plist", (0, 1))
+        shutil.rmtree(self.apps_dir / "Xcode.app")
+
+        cache = PersistentCache(cache_path)
+        with patch(
+            "macbac.scanners.manual_app_scanner.read_plist_keys",
+            wraps=read_plist_keys,
+        ) as mock_read:
+            third = self._scan(cache=cache)
+        assert mock_read.call_count == 1
+        assert third["all_apps_count"] == 5
+        assert (
+            str(self.apps_dir / "Xcode.app") not in PersistentCache(cache_path).keys()
+        )
+
+    def test_parallel_scan_matches_serial_scan(self) -> None:
+        """Test that the process pool gives the same results in path order."""
+        for index in range(20):
+            _make_app(
+                self.apps_dir,
+                f"Vendor App {index:02d}",
+                {"CFBundleName": f"Vendor {index}", "CFBundleIdentifier": "x"},
+            )
+
+        serial = ManualAppScanner(app_dirs=[self.apps_dir], parallel=False)
+        parallel = ManualAppScanner(
+            app_dirs=[self.apps_dir],
+            parallel_threshold=1,
+            max_workers=2,
+            chunk_size=4,
+        )
+        with patch("macbac.scanners.manual_app_scanner.ProcessPoolExecutor") as pool:
+            serial_result = serial.scan()
+        assert pool.call_count == 0
+
+        with patch.object(
+            ManualAppScanner,
+            "_inspect_bundles_parallel",
+            wraps=parallel._inspect_bundles_parallel,
+        ) as mock_parallel:
+            parallel_result = parallel.scan()
+        assert mock_parallel.call_count == 1
+
+        assert parallel_result == serial_result
+        paths = [app["path"] for app in parallel_result["apps"]]
+        assert paths == sorted(paths)
+        assert parallel_result["total_count"] == 23
+
+
+class TestPlistReader:
+    """Test cases for the selective-key plist reader."""
+
+    KEYS = [
+        "CFBundleName",
+        "CFBundleIdentifier",
+        "CFBundleVersion",
+        "LSMinimumSystemVersion",
+        "com.apple.security.app-sandbox",
+    ]
+
+    def setup_method(self) -> None:
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _check(self, plist: Dict[str, Any]) -> Dict[str, Any]:
+        """Compare the reader with plistlib for both plist formats."""
+        results = []
+        for fmt in (plistlib.FMT_XML, plistlib.FMT_BINARY):
+            path = self.temp_dir / f"Info-{fmt.name}.plist"
+            path.write_bytes(plistlib.dumps(plist, fmt=fmt))
+
+            expected = {k: v for k, v in plist.items() if k in self.KEYS}
+            result = read_plist_keys(path, self.KEYS)
+            assert result == expected
+            assert [type(v) for v in result.values()] == [
+                type(v) for v in expected.values()
+            ]
+            results.append(result)
+        return results[0]
+
+    def test_reads_only_wanted_keys(self) -> None:
+        """Test that scalar keys are read and nested containers skipped."""
+        result = self._check(
+            {
+                "CFBundleDocumentTypes": [
+                    {"CFBundleName": "nested", "LSItemContentTypes": ["a", "b"]}
+                ]
+                * 100,
+                "CFBundleIdentifier": "com.example.app",
+                "CFBundleName": "Ünïcode & <Escaped> 名前",
+                "CFBundleVersion": 1234,
+                "com.apple.security.app-sandbox": True,
+            }
+        )
+        assert result["CFBundleName"] == "Ünïcode & <Escaped> 名前"
+        assert "LSMinimumSystemVersion" not in result
+
+    def test_falls_back_for_unusual_values(self) -> None:
+        """Test that values the fast path doesn't decode still match plistlib."""
+        self._check(
+            {
+                "CFBundleName": "App",
+                "CFBundleVersion": {"nested": ["dict"]},
+                "LSMinimumSystemVersion": b"raw data",
+            }
+        )
+
+    def test_invalid_plist_raises_like_plistlib(self) -> None:
+        """Test that unparsable files raise plistlib's error."""
+        path = self.temp_dir / "Info.plist"
+        path.write_bytes(b"garbage")
+
+        with pytest.raises(plistlib.InvalidFileException):
+            read_plist_keys(path, self.KEYS)
+
+
+class TestFontScanner:
+    """Test cases for FontScanner."""
+
+    def setup_method(self) -> None:
+        """Set up a fonts directory tree."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.fonts_dir = self.temp_dir / "Fonts"
+        nested = self.fonts_dir / "Family" / "Italic"
+        nested.mkdir(parents=True)
+
+        (self.fonts_dir / "Regular.ttf").write_bytes(b"x" * 2048)
+        (self.fonts_dir / "Family" / "Bold.OTF").write_bytes(b"x" * 1024)
+        (nested / "Italic.woff2").write_bytes(b"x" * 512)
+        (self.fonts_dir / "notes.txt").write_text("not a font")
+        (self.fonts_dir / "folder.ttf").mkdir()
+        # Symlinked directories are not descended into
+        outside = self.temp_dir / "Outside"
+        outside.mkdir()
+        (outside / "Elsewhere.ttf").write_bytes(b"x")
+        (self.fonts_dir / "Linked").symlink_to(outside)
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_scan_finds_nested_fonts(self) -> None:
+        """Test that fonts are found recursively with their metadata."""
+        scanner = FontScanner(font_dirs=[self.fonts_dir, self.temp_dir / "missing"])
+        result = scanner.scan()
+
+        fonts = {font["name"]: font for font in result["font_files"]}
+        assert sorted(fonts) == ["Bold.OTF", "Italic.woff2", "Regular.ttf"]
+        assert fonts["Bold.OTF"] == {
+            "name": "Bold.OTF",
+            "path": str(self.fonts_dir / "Family" / "Bold.OTF"),
+            "relative_path": "Family/Bold.OTF",
+            "extension": ".otf",
+            "type": "OpenType Font",
+            "size_bytes": 1024,
+            "size_kb": 1.0,
+        }
+        assert result["total_size_bytes"] == 3584
+        assert sorted(result["fonts_by_type"]) == [
+            "OpenType Font",
+            "TrueType Font",
+            "Web Open Font Format 2",
+        ]
+        assert result["scanned_directories"] == [
+            str(self.fonts_dir),
+            f"{self.temp_dir / 'missing'} (not found)",
+        ]
+
+    def test_scan_directory_is_lazy(self) -> None:
+        """Test that the walker yields records without building a list."""
+        records = FontScanner()._scan_directory(self.fonts_dir)
+
+        assert not isinstance(records, list)
+        assert next(records)["extension"] in FontScanner.FONT_EXTENSIONS
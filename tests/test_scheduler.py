@@ -0,0 +1,90 @@
+"""Tests for the scheduler module."""
+
+import threading
+from typing import List
+
+import pytest
+
+from macbac.scheduler import FAILED, OK, SKIPPED, Scheduler
+
+
+class TestScheduler:
+    """Test cases for Scheduler."""
+
+    def test_independent_jobs_overlap(self) -> None:
+        """Test that jobs without dependencies run at the same time."""
+        barrier = threading.Barrier(2, timeout=5)
+        scheduler = Scheduler()
+        scheduler.add("a", barrier.wait)
+        scheduler.add("b", barrier.wait)
+
+        results = scheduler.run()
+
+        assert [result.status for result in results.values()] == [OK, OK]
+
+    def test_dependencies_run_first(self) -> None:
+        """Test that a job starts only after its dependencies finished."""
+        events: List[str] = []
+        lock = threading.Lock()
+
+        def job(name: str) -> None:
+            with lock:
+                events.append(f"start {name}")
+            with lock:
+                events.append(f"end {name}")
+
+        scheduler = Scheduler()
+        scheduler.add("appstore", lambda: job("appstore"), after=["homebrew"])
+        scheduler.add("homebrew", lambda: job("homebrew"))
+        scheduler.add("fonts", lambda: job("fonts"))
+
+        results = scheduler.run()
+
+        assert list(results) == ["appstore", "homebrew", "fonts"]
+        assert events.index("end homebrew") < events.index("start appstore")
+        assert all(result.ok for result in results.values())
+
+    def test_failure_skips_dependents(self) -> None:
+        """Test that jobs after a failed one are skipped, and others run."""
+
+        def fail() -> None:
+            raise RuntimeError("brew exploded")
+
+        ran: List[str] = []
+        scheduler = Scheduler()
+        scheduler.add("homebrew", fail)
+        scheduler.add("appstore", lambda: ran.append("appstore"), after=["homebrew"])
+        scheduler.add("later", lambda: ran.append("later"), after=["appstore"])
+        scheduler.add("fonts", lambda: ran.append("fonts"))
+
+        results = scheduler.run()
+
+        assert results["homebrew"].status == FAILED
+        assert results["homebrew"].error == "brew exploded"
+        assert results["appstore"].status == SKIPPED
+        assert results["later"].status == SKIPPED
+        assert results["fonts"].ok
+        assert ran == ["fonts"]
+
+    def test_values_are_returned(self) -> None:
+        """Test that a job's return value is kept in its result."""
+        scheduler = Scheduler(max_workers=1)
+        scheduler.add("answer", lambda: 42)
+
+        assert scheduler.run()["answer"].value == 42
+
+    def test_invalid_dependencies(self) -> None:
+        """Test that unknown dependencies and cycles are refused."""
+        scheduler = Scheduler()
+        scheduler.add("a", lambda: None, after=["missing"])
+        with pytest.raises(ValueError, match="unknown job missing"):
+            scheduler.run()
+
+        scheduler = Scheduler()
+        scheduler.add("a", lambda: None, after=["b"])
+        scheduler.add("b", lambda: None, after=["a"])
+        with pytest.raises(ValueError, match="depend on each other: a, b"):
+            scheduler.order()
+
+        with pytest.raises(ValueError, match="already added"):
+            scheduler.add("a", lambda: None)
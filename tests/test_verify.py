@@ -0,0 +1,178 @@
+"""Tests for the verify module."""
+
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from macbac.host_facts import HostFacts
+from macbac.object_store import hash_file
+from macbac.scanners.font_scanner import FontScanner
+from macbac.storage import StorageManager
+from macbac.verify import hash_file_mmap, read_checksums, verify_backup
+
+
+class TestVerifyBackup:
+    """Test cases for backup checksums and verification."""
+
+    def setup_method(self) -> None:
+        """Set up a font library and an output directory."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.output_dir = self.temp_dir / "backups"
+        self.output_dir.mkdir()
+
+        fonts_dir = self.temp_dir / "Fonts"
+        (fonts_dir / "Family").mkdir(parents=True)
+        (fonts_dir / "Font.ttf").write_bytes(b"regular font data")
+        (fonts_dir / "Family" / "Font.ttf").write_bytes(b"family font data")
+        self.backup_data = {"fonts": FontScanner(font_dirs=[fonts_dir]).scan()}
+
+    def teardown_method(self) -> None:
+        """Clean up test fixtures."""
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _store(
+        self, name: str = "macbac_backup_1", parent: Optional[Path] = None
+    ) -> Path:
+        backup_dir = self.output_dir / name
+        backup_dir.mkdir()
+        storage_manager = StorageManager()
+        storage_manager.set_backup_dir(backup_dir)
+        storage_manager.set_parent_backup(parent)
+        storage_manager.set_host_facts(HostFacts(datetime(2025, 1, 7, 10, 30)))
+        storage_manager.store_backup_data(self.backup_data)
+        storage_manager.generate_inventory(self.backup_data)
+        storage_manager.write_checksums()
+        return backup_dir
+
+    def test_checksums_cover_every_written_file(self) -> None:
+        """Test that checksums are recorded for everything in the backup."""
+        backup_dir = self._store()
+
+        checksums = read_checksums(backup_dir)
+
+        assert checksums is not None
+        assert sorted(checksums) == [
+            "fonts/Family/Font.ttf",
+            "fonts/Font.ttf",
+            "inventory.md",
+            "manifest.jsonl",
+        ]
+        for relative, entry in checksums.items():
+            path = backup_dir / relative
+            assert entry == {"sha256": hash_file(path), "size": path.stat().st_size}
+
+    def test_intact_backup(self) -> None:
+        """Test that a freshly made backup verifies."""
+        backup_dir = self._store()
+        sizes: List[int] = []
+
+        report = verify_backup(backup_dir, max_workers=2, on_file=sizes.append)
+
+        assert report.ok
+        assert report.verified == 4
+        assert report.verified_bytes == sum(sizes)
+        assert not report.legacy
+
+    def test_damaged_backup(self) -> None:
+        """Test that missing, unexpected and corrupt files are reported."""
+        backup_dir = self._store()
+        (backup_dir / "fonts" / "Family" / "Font.ttf").unlink()
+        (backup_dir / "fonts" / "Stray.ttf").write_bytes(b"stray")
+        # Same size, different content
+        (backup_dir / "fonts" / "Font.ttf").write_bytes(b"REGULAR font data")
+        with open(backup_dir / "inventory.md", "a", encoding="utf-8") as f:
+            f.write("edited\n")
+        # Written by restores, so not unexpected
+        (backup_dir / "restore.log").write_text("log")
+
+        report = verify_backup(backup_dir)
+
+        assert not report.ok
+        assert report.missing == ["fonts/Family/Font.ttf"]
+        assert report.extra == ["fonts/Stray.ttf"]
+        assert report.corrupt[0] == ("fonts/Font.ttf", "checksum mismatch")
+        assert report.corrupt[1][0] == "inventory.md"
+        assert report.corrupt[1][1].startswith("size is")
+        assert report.verified == 1
+
+    def test_unexpected_files_are_warnings_unless_strict(self) -> None:
+        """Test that stray files only fail strict verification."""
+        backup_dir = self._store()
+        (backup_dir / "fonts" / "Stray.ttf").write_bytes(b"stray")
+
+        report = verify_backup(backup_dir)
+        assert report.ok
+        assert report.extra == ["fonts/Stray.ttf"]
+
+        report = verify_backup(backup_dir, strict=True)
+        assert not report.ok
+        assert report.extra == ["fonts/Stray.ttf"]
+
+    def test_finder_and_nas_metadata_is_ignored(self) -> None:
+        """Test that .DS_Store, AppleDouble and NAS index files are not extras."""
+        backup_dir = self._store()
+        (backup_dir / ".DS_Store").write_bytes(b"finder")
+        (backup_dir / "fonts" / ".DS_Store").write_bytes(b"finder")
+        (backup_dir / "fonts" / "._Font.ttf").write_bytes(b"appledouble")
+        (backup_dir / "fonts" / "@eaDir").mkdir()
+        (backup_dir / "fonts" / "@eaDir" / "Font.ttf").write_bytes(b"index")
+
+        report = verify_backup(backup_dir, strict=True)
+
+        assert report.ok
+        assert report.extra == []
+        assert report.verified == 4
+
+    def test_incremental_backup_checks_its_own_fonts(self) -> None:
+        """Test that an incremental backup only expects the fonts it holds."""
+        first = self._store()
+        (self.temp_dir / "Fonts" / "Font.ttf").write_bytes(b"changed font data")
+        self.backup_data = {
+            "fonts": FontScanner(font_dirs=[self.temp_dir / "Fonts"]).scan()
+        }
+        second = self._store("macbac_backup_2", parent=first)
+
+        report = verify_backup(second)
+
+        assert report.ok
+        checksums = read_checksums(second)
+        assert checksums is not None
+        assert "fonts/Font.ttf" in checksums
+        assert "fonts/Family/Font.ttf" not in checksums
+
+    def test_legacy_backup_checks_fonts_only(self) -> None:
+        """Test that backups without checksums fall back to font digests."""
+        backup_dir = self._store()
+        (backup_dir / "checksums.json").unlink()
+        (backup_dir / "fonts" / "Font.ttf").write_bytes(b"REGULAR font data")
+
+        report = verify_backup(backup_dir)
+
+        assert report.legacy
+        assert report.corrupt == [("fonts/Font.ttf", "checksum mismatch")]
+        assert report.extra == []
+        assert report.verified == 1
+
+    def test_invalid_checksums_file(self) -> None:
+        """Test that a damaged checksums file is reported as invalid."""
+        backup_dir = self._store()
+        (backup_dir / "checksums.json").write_text(json.dumps({"files": {}}))
+
+        with pytest.raises(ValueError, match="Invalid checksums file"):
+            verify_backup(backup_dir)
+
+    def test_hash_file_mmap(self) -> None:
+        """Test that mmap hashing matches hashing by reads."""
+        empty = self.temp_dir / "empty"
+        empty.write_bytes(b"")
+        data = self.temp_dir / "data"
+        data.write_bytes(bytes(range(256)) * 4096)
+
+        for path in (empty, data):
+            assert hash_file_mmap(path) == hash_file(path)